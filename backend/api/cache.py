@@ -0,0 +1,160 @@
+import hashlib
+
+from rest_framework.response import Response
+
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import CacheGeneration, Recipe
+
+
+class RecipeResponseCache:
+    """Кеш ответов списка и страницы рецепта для анонимных пользователей.
+
+    Ключ записи содержит номера поколений её зависимостей: список без
+    фильтров зависит от "all", с фильтром по автору - от "author:<id>",
+    по тегам - от "tag:<slug>", по автору и тегам - от
+    "author:<id>:tag:<slug>", страница рецепта - от "recipe:<id>".
+    Список популярных рецептов дополнительно зависит от "trending",
+    которое сбрасывается при пересчёте рейтинга.
+    Изменение рецепта увеличивает поколения только тех зависимостей,
+    которым он соответствует, поэтому устаревают лишь записи, в которые
+    рецепт мог попасть. Поколения хранятся в базе (CacheGeneration),
+    сами ответы и статистика - в кеше Django.
+
+    Счётчики избранного и корзин меняются без сброса кеша: при попадании
+    они читаются из базы одним запросом и подставляются в ответ.
+    """
+
+    prefix = "recipes"
+    timeout = 300
+    key_params = ("tags", "author", "ordering", "page", "limit", "count")
+    ignored_params = ("is_favorited", "is_in_shopping_cart")
+    counter_fields = ("favorites_count", "shopping_cart_count")
+
+    def get_list_dependencies(self, request):
+        dependencies = self.get_filter_dependencies(request)
+        if request.query_params.get("ordering") == "trending":
+            dependencies.append("trending")
+        return dependencies
+
+    def get_filter_dependencies(self, request):
+        author = request.query_params.get("author")
+        tags = sorted(set(request.query_params.getlist("tags")))
+        if author and tags:
+            return [f"author:{author}:tag:{tag}" for tag in tags]
+        if author:
+            return [f"author:{author}"]
+        if tags:
+            return [f"tag:{tag}" for tag in tags]
+        return ["all"]
+
+    def get_generation_names(self, dependencies):
+        max_length = CacheGeneration._meta.pk.max_length
+        names = []
+        for name in dependencies:
+            name = f"{self.prefix}:{name}"
+            if len(name) > max_length:
+                name = hashlib.md5(name.encode()).hexdigest()
+            names.append(name)
+        return names
+
+    def get_generations(self, dependencies):
+        names = self.get_generation_names(dependencies)
+        generations = CacheGeneration.get_many(names)
+        return [str(generations[name]) for name in names]
+
+    def refresh_counters(self, data):
+        """Подставляет в ответ текущие значения счётчиков рецептов."""
+        items = data.get("results", [data]) if isinstance(data, dict) else data
+        items = [item for item in items if "id" in item]
+        counters = Recipe.objects.filter(
+            pk__in=[item["id"] for item in items]
+        ).values_list("pk", *self.counter_fields)
+        counters = {pk: values for pk, *values in counters}
+        for item in items:
+            if item["id"] in counters:
+                item.update(zip(self.counter_fields, counters[item["id"]]))
+        return data
+
+    def cached_response(self, key, dependencies, get_response):
+        key = ":".join([key, *self.get_generations(dependencies)])
+        data = cache.get(key)
+        if data is not None:
+            self.count("hits")
+            response = Response(self.refresh_counters(data))
+            response["X-Cache"] = "HIT"
+            return response
+        self.count("misses")
+        response = get_response()
+        if response.status_code == 200:
+            cache.set(key, response.data, self.timeout)
+        response["X-Cache"] = "MISS"
+        return response
+
+    def list_response(self, request, get_response):
+        params = request.query_params
+        if any(
+            name not in self.key_params + self.ignored_params
+            for name in params
+        ):
+            return get_response()
+        query = "&".join(
+            f"{name}={','.join(sorted(set(params.getlist(name))))}"
+            for name in self.key_params
+            if name in params
+        )
+        key = f"{self.prefix}:list:{request.get_host()}:{query}"
+        return self.cached_response(
+            key, self.get_list_dependencies(request), get_response
+        )
+
+    def detail_response(self, request, pk, get_response):
+        key = f"{self.prefix}:detail:{request.get_host()}:{pk}"
+        return self.cached_response(key, [f"recipe:{pk}"], get_response)
+
+    def invalidate(self, dependencies):
+        CacheGeneration.bump_many(self.get_generation_names(dependencies))
+        self.count("evictions", len(dependencies))
+
+    def invalidate_recipes(self, recipes):
+        """Сбрасывает записи, зависящие от рецептов из выборки recipes.
+
+        Зависимости вычисляются сразу, по текущему состоянию рецептов,
+        а сброс выполняется после фиксации транзакции.
+        """
+        dependencies = set()
+        rows = Recipe.objects.filter(pk__in=recipes.values("pk")).values_list(
+            "pk", "author_id", "tags__slug"
+        )
+        for pk, author_id, slug in rows:
+            dependencies.update(
+                ("all", f"recipe:{pk}", f"author:{author_id}")
+            )
+            if slug is not None:
+                dependencies.update(
+                    (f"tag:{slug}", f"author:{author_id}:tag:{slug}")
+                )
+        if dependencies:
+            transaction.on_commit(lambda: self.invalidate(dependencies))
+
+    def count(self, name, delta=1):
+        key = f"{self.prefix}:stats:{name}"
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            pass
+
+    def get_stats(self):
+        """Попадания, промахи и сбросы; с кешем в памяти - этого процесса."""
+        names = ("hits", "misses", "evictions")
+        keys = {name: f"{self.prefix}:stats:{name}" for name in names}
+        values = cache.get_many(keys.values())
+        stats = {name: values.get(key, 0) for name, key in keys.items()}
+        requests = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / requests if requests else 0.0
+        return stats
+
+
+recipe_cache = RecipeResponseCache()
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models import Prefetch
+
+from recipes.models import IngredientsInRecipe, Recipe
+
+from .cache import recipe_cache
+
+RECIPE_CARD_PREFETCH = (
+    "tags",
+    Prefetch(
+        "recipeingredient",
+        queryset=IngredientsInRecipe.objects.select_related(
+            "ingredient"
+        ).order_by("ingredient__name"),
+        to_attr="ingredient_amounts",
+    ),
+)
+
+
+def refresh_recipe_cards(recipe_ids, batch_size=500):
+    """Пересобирает карточки рецептов с указанными id.
+
+    Возвращает словарь {id рецепта: карточка}.
+    """
+    from .serializers import RecipeCardSerializer
+
+    recipe_ids = list(recipe_ids)
+    cards = {}
+    for start in range(0, len(recipe_ids), batch_size):
+        end = start + batch_size
+        recipes = list(
+            Recipe.objects.filter(pk__in=recipe_ids[start:end])
+            .select_related("author")
+            .prefetch_related(*RECIPE_CARD_PREFETCH)
+        )
+        for recipe in recipes:
+            recipe.card = cards[recipe.pk] = RecipeCardSerializer(recipe).data
+        Recipe.objects.bulk_update(recipes, ["card"])
+    return cards
+
+
+def schedule_card_refresh(recipe_ids):
+    """Пересобирает карточки рецептов после фиксации транзакции.
+
+    После сборки кеш ответов сбрасывается ещё раз: запрос, пришедший
+    между фиксацией и сборкой, мог закешировать старую карточку.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+
+    def refresh():
+        refresh_recipe_cards(recipe_ids)
+        recipe_cache.invalidate_recipes(
+            Recipe.objects.filter(pk__in=recipe_ids)
+        )
+
+    transaction.on_commit(refresh)
@@ -0,0 +1,83 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from rest_framework.renderers import JSONRenderer
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import parse_etags
+
+from recipes.models import CatalogVersion
+
+
+class CatalogSnapshots:
+    """Готовые JSON-ответы справочников в памяти процесса.
+
+    Снимок хранится по ключу (справочник, версия, параметры запроса),
+    поэтому после изменения справочника старые снимки перестают
+    использоваться и вытесняются. ETag вычисляется по телу ответа.
+
+    Подсказки ингредиентов запрашиваются на каждое нажатие клавиши,
+    поэтому версия справочника читается из базы не чаще раза в
+    version_ttl секунд. Изменения в этом процессе сбрасывают её сразу
+    (forget_version), изменения в других процессах видны с задержкой
+    до version_ttl.
+    """
+
+    max_size = 256
+    ttl = 300
+    version_ttl = 2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()
+        self._versions = {}
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+            self._versions.clear()
+
+    def get_version(self, catalog):
+        cached = self._versions.get(catalog)
+        now = time.monotonic()
+        if cached is None or now - cached[1] > self.version_ttl:
+            cached = (CatalogVersion.get(catalog), now)
+            self._versions[catalog] = cached
+        return cached[0]
+
+    def forget_version(self, catalog):
+        self._versions.pop(catalog, None)
+
+    def get(self, key, render):
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+        if snapshot is None or time.monotonic() - snapshot[2] > self.ttl:
+            content = JSONRenderer().render(render())
+            etag = '"%s"' % hashlib.md5(content).hexdigest()
+            snapshot = (content, etag, time.monotonic())
+            with self._lock:
+                self._snapshots[key] = snapshot
+                while len(self._snapshots) > self.max_size:
+                    self._snapshots.popitem(last=False)
+        return snapshot[0], snapshot[1]
+
+
+catalog_snapshots = CatalogSnapshots()
+
+
+def catalog_response(request, catalog, render):
+    """Ответ со справочником с поддержкой If-None-Match."""
+    version = catalog_snapshots.get_version(catalog)
+    key = (catalog, version, tuple(sorted(request.query_params.items())))
+    content, etag = catalog_snapshots.get(key, lambda: render(version))
+    etags = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in etags or "*" in etags:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = etag
+    return response
@@ -0,0 +1,99 @@
+import csv
+import json
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import F
+
+from recipes.models import ShoppingListItem
+
+from .pdf import StreamingPDF
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: возвращает записанное."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListExport:
+    """Список покупок пользователя в форматах txt, csv, json и pdf.
+
+    Суммы по ингредиентам берутся из сводного списка покупок и
+    читаются итератором, отсортированными по названию и единице
+    измерения, поэтому файл отдаётся частями и расход памяти не зависит
+    от размера корзины.
+    """
+
+    content_types = {
+        "txt": "text/plain; charset=utf-8",
+        "csv": "text/csv; charset=utf-8",
+        "json": "application/json",
+        "pdf": "application/pdf",
+    }
+    chunk_size = 2000
+
+    def __init__(self, user):
+        self.user = user
+        self.title = f"Список покупок {user.get_full_name()}:"
+
+    def get_items(self):
+        return (
+            ShoppingListItem.objects.filter(user=self.user)
+            .values(
+                "amount",
+                name=F("ingredient__name"),
+                measurement_unit=F("ingredient__measurement_unit"),
+            )
+            .order_by("name", "measurement_unit")
+            .iterator(chunk_size=self.chunk_size)
+        )
+
+    def get_lines(self):
+        for item in self.get_items():
+            yield (
+                f"{item['name']} ({item['measurement_unit']}) - "
+                f"{item['amount']}"
+            )
+
+    def render(self, fmt):
+        return getattr(self, f"render_{fmt}")()
+
+    def render_txt(self):
+        yield f"{self.title}\n\n"
+        for line in self.get_lines():
+            yield f"{line}\n"
+
+    def render_csv(self):
+        writer = csv.writer(Echo())
+        yield "\ufeff" + writer.writerow(
+            ("Ингредиент", "Единица измерения", "Количество")
+        )
+        for item in self.get_items():
+            yield writer.writerow(
+                (item["name"], item["measurement_unit"], item["amount"])
+            )
+
+    def render_json(self):
+        yield '{"items": ['
+        groups = groupby(self.get_items(), key=itemgetter("name"))
+        for index, (name, items) in enumerate(groups):
+            group = {
+                "name": name,
+                "amounts": [
+                    {
+                        "measurement_unit": item["measurement_unit"],
+                        "amount": item["amount"],
+                    }
+                    for item in items
+                ],
+            }
+            separator = ",\n" if index else "\n"
+            yield separator + json.dumps(group, ensure_ascii=False)
+        yield "\n]}\n"
+
+    def render_pdf(self):
+        pdf = StreamingPDF(settings.SHOPPING_LIST_FONT)
+        return pdf.render(self.title, self.get_lines())
@@ -0,0 +1,88 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F
+
+from jobs.queue import enqueue
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscribe, User
+
+from .pagination import MergedQuerySet
+
+
+def get_large_authors(author_ids):
+    """Авторы из author_ids, чьи рецепты не раскладываются по лентам."""
+    return set(
+        User.objects.filter(
+            pk__in=author_ids,
+            followers_count__gt=settings.FEED_FANOUT_LIMIT,
+        ).values_list("pk", flat=True)
+    )
+
+
+def fan_out_recipe(recipe_id, batch_size=1000):
+    """Раскладывает рецепт по лентам подписчиков автора пачками.
+
+    Рецепты популярных авторов пропускаются: их подмешивает чтение.
+    Возвращает число лент, в которые добавлен рецепт.
+    """
+    recipe = (
+        Recipe.objects.filter(pk=recipe_id)
+        .values("author_id", "pub_date")
+        .first()
+    )
+    if recipe is None or get_large_authors([recipe["author_id"]]):
+        return 0
+    followers = (
+        Subscribe.objects.filter(author_id=recipe["author_id"])
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    delivered = 0
+    while batch := list(islice(followers, batch_size)):
+        FeedEntry.objects.add_recipe(
+            recipe_id, recipe["author_id"], recipe["pub_date"], batch
+        )
+        delivered += len(batch)
+    return delivered
+
+
+def schedule_fan_out(recipe_ids):
+    """Ставит раскладку рецептов по лентам в очередь фоновых задач."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        enqueue(
+            "recipes.fan_out",
+            *[{"recipe_id": recipe_id} for recipe_id in recipe_ids],
+            key="recipe-feed:{recipe_id}",
+        )
+
+
+def follow(user, author_id):
+    """Добавляет в ленту user рецепты нового автора подписки."""
+    if not get_large_authors([author_id]):
+        FeedEntry.objects.add_author(user, author_id)
+
+
+def get_feed(user):
+    """Лента пользователя: его записи ленты и рецепты популярных авторов.
+
+    Обе выборки упорядочены по (pub_date, recipe_id), читаются по индексу
+    диапазоном после курсора и не пересекаются: записи авторов, ставших
+    популярными после раскладки, берутся из второй выборки.
+    """
+    author_ids = Subscribe.objects.filter(user=user).values_list(
+        "author_id", flat=True
+    )
+    entries = FeedEntry.objects.filter(user=user).only("recipe", "pub_date")
+    large = get_large_authors(author_ids)
+    if not large:
+        return MergedQuerySet(entries)
+    entries = entries.exclude(author_id__in=large)
+    recipes = (
+        Recipe.objects.filter(author_id__in=large)
+        .annotate(recipe_id=F("id"))
+        .only("id", "pub_date")
+    )
+    return MergedQuerySet(entries, recipes)
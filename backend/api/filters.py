@@ -1,17 +1,12 @@
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from django.db.models import F, Value
 
+from recipes.models import Recipe, Tag
 
-class IngredientFilter(FilterSet):
-    name = filters.CharFilter(field_name="name", method="name_filter")
+from .pagination import ChainedQuerySet
 
-    def name_filter(self, queryset, name, value):
-        return queryset.filter(name__istartswith=value)
-
-    class Meta:
-        model = Ingredient
-        fields = ("name",)
+UNRANKED_POSITION = 2**31 - 1
 
 
 class RecipeFilter(FilterSet):
@@ -25,10 +20,19 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method="is_in_shopping_cart_filter"
     )
+    ordering = filters.ChoiceFilter(
+        choices=(("trending", "Популярные"),), method="ordering_filter"
+    )
 
     class Meta:
         model = Recipe
-        fields = ("tags", "author", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "tags",
+            "author",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "ordering",
+        )
 
     def is_favorited_filter(self, queryset, name, value):
         user = self.request.user
@@ -41,3 +45,34 @@ class RecipeFilter(FilterSet):
         if value and not user.is_anonymous:
             return queryset.filter(shopping_cart__user=user)
         return queryset
+
+    def ordering_filter(self, queryset, name, value):
+        # Сортировка делит выборку на части и применяется в
+        # filter_queryset после остальных фильтров.
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.form.cleaned_data.get("ordering") == "trending":
+            return self.trending(queryset)
+        return queryset
+
+    @staticmethod
+    def trending(queryset):
+        """Популярные: рецепты рейтинга по месту, за ними остальные.
+
+        Рецепты рейтинга читаются соединением с RecipeRank в порядке
+        индекса по месту, рецепты вне рейтинга идут отдельным хвостом,
+        новые первыми.
+        """
+        ranked = (
+            queryset.filter(rank__isnull=False)
+            .annotate(trending_position=F("rank__position"))
+            .order_by("trending_position")
+        )
+        unranked = (
+            queryset.filter(rank__isnull=True)
+            .annotate(trending_position=Value(UNRANKED_POSITION))
+            .order_by("-id")
+        )
+        return ChainedQuerySet(ranked, unranked)
@@ -0,0 +1,193 @@
+import io
+import posixpath
+
+from PIL import Image, ImageOps, features
+
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+
+from jobs.queue import enqueue
+from recipes.models import Recipe
+
+from .cache import recipe_cache
+from .cards import refresh_recipe_cards
+
+MAX_SIZE = 2048
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+MAX_UPLOAD_PIXELS = 40_000_000
+WIDTHS = (320, 640, 1280)
+FORMATS = {
+    "avif": ("AVIF", "avif", {"quality": 60}),
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True}),
+}
+
+
+def get_formats():
+    """Форматы вариантов, поддерживаемые установленным Pillow."""
+    return [
+        name
+        for name in FORMATS
+        if name == "jpeg" or features.check(name)
+    ]
+
+
+def check_upload(file):
+    """Проверяет размер и разрешение загруженного изображения.
+
+    Читается только заголовок файла, пиксели не декодируются.
+    Возвращает текст ошибки или None.
+    """
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        return (
+            "Размер изображения больше "
+            f"{MAX_UPLOAD_BYTES // (1024 * 1024)} МБ."
+        )
+    too_large = (
+        "Разрешение изображения больше "
+        f"{MAX_UPLOAD_PIXELS // 1_000_000} Мп."
+    )
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        return too_large
+    except (OSError, ValueError):
+        return None
+    finally:
+        file.seek(0)
+    return too_large if width * height > MAX_UPLOAD_PIXELS else None
+
+
+def needs_processing(recipe):
+    variants = recipe.image_variants or {}
+    return bool(recipe.image) and variants.get("source") != recipe.image.name
+
+
+def encode(image, name, storage, fmt):
+    pil_format, extension, options = FORMATS[fmt]
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return storage.save(f"{name}.{extension}", ContentFile(buffer.getvalue()))
+
+
+def load_image(storage, name):
+    """Открывает изображение, поворачивает по EXIF и приводит к RGB."""
+    with storage.open(name) as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+    image.thumbnail((MAX_SIZE, MAX_SIZE), Image.LANCZOS)
+    return image
+
+
+def build_variants(image, stem, storage):
+    """Сохраняет нормализованный оригинал и варианты изображения.
+
+    Возвращает карту вариантов и список созданных файлов.
+    """
+    created = [encode(image, f"recipes/{stem}", storage, "jpeg")]
+    variants = {"source": created[0]}
+    widths = sorted({min(width, image.width) for width in WIDTHS})
+    for fmt in get_formats():
+        variants[fmt] = {}
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            name = encode(
+                resized, f"recipes/variants/{stem}-{width}", storage, fmt
+            )
+            variants[fmt][str(width)] = name
+            created.append(name)
+    return variants, created
+
+
+def process_recipe_image(recipe_id):
+    """Нормализует изображение рецепта и строит его варианты.
+
+    Оригинал перекодируется в JPEG без метаданных с ограничением
+    стороны MAX_SIZE, затем для каждой ширины из WIDTHS (не больше
+    исходной) сохраняются варианты во всех доступных форматах.
+    Рецепт обновляется, только если его изображение не сменилось за
+    время обработки. Возвращает True, если рецепт обновлён.
+    """
+    recipe = (
+        Recipe.objects.filter(pk=recipe_id)
+        .only("image", "image_variants")
+        .first()
+    )
+    if recipe is None or not recipe.image:
+        return False
+    source = recipe.image.name
+    storage = recipe.image.storage
+    stem = posixpath.splitext(posixpath.basename(source))[0]
+    try:
+        image = load_image(storage, source)
+    except (OSError, ValueError):
+        return False
+
+    variants, created = build_variants(image, stem, storage)
+    with transaction.atomic():
+        updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+            image=variants["source"], image_variants=variants
+        )
+        if updated:
+            refresh_recipe_cards([recipe_id])
+            recipe_cache.invalidate_recipes(
+                Recipe.objects.filter(pk=recipe_id)
+            )
+    if not updated:
+        for name in created:
+            storage.delete(name)
+        return False
+    previous = recipe.image_variants or {}
+    obsolete = [source, previous.get("source")] + [
+        name
+        for fmt, names in previous.items()
+        if fmt != "source"
+        for name in names.values()
+    ]
+    for name in obsolete:
+        if name and name not in created:
+            storage.delete(name)
+    return True
+
+
+def process_in_background(recipe_id):
+    try:
+        return process_recipe_image(recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_image_processing(recipe_ids):
+    """Ставит обработку изображений рецептов в очередь фоновых задач."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        enqueue(
+            "recipes.process_image",
+            *[{"recipe_id": recipe_id} for recipe_id in recipe_ids],
+            key="recipe-image:{recipe_id}",
+        )
+
+
+def image_variant_urls(recipe, request=None):
+    """Словарь {формат: {ширина: url}} вариантов изображения рецепта."""
+    storage = recipe.image.storage
+    urls = {}
+    for fmt, names in (recipe.image_variants or {}).items():
+        if fmt == "source":
+            continue
+        urls[fmt] = {}
+        for width, name in names.items():
+            url = storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[fmt][width] = url
+    return urls
@@ -0,0 +1,219 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField
+
+from django.db import transaction
+from django.db.models import F
+
+from recipes.models import Ingredient, IngredientsInRecipe, Recipe, Tag
+from users.models import User
+
+from .cache import recipe_cache
+from .cards import refresh_recipe_cards
+from .feed import schedule_fan_out
+from .images import schedule_image_processing
+from .pantry import schedule_pantry_update
+from .serializers import ImportRecipeSerializer, RecipeImageField
+from .similar import schedule_similar_refresh
+
+
+class ImportReport:
+    """Итоги импорта: счётчики, ошибки по строкам и скорость."""
+
+    max_errors = 1000
+
+    def __init__(self, start_line=0):
+        self.started = time.monotonic()
+        self.last_line = start_line
+        self.read = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "errors": errors})
+
+    def as_dict(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            "last_line": self.last_line,
+            "read": self.read,
+            "imported": self.imported,
+            "failed": self.failed,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.read / elapsed, 1)
+            if elapsed
+            else 0.0,
+            "errors": self.errors,
+        }
+
+
+class RecipeImporter:
+    """Массовый импорт рецептов из NDJSON.
+
+    Каждая строка - рецепт в формате CreateRecipeSerializer. Строки
+    обрабатываются пачками по batch_size: теги и ингредиенты пачки
+    загружаются двумя запросами, изображения декодируются и сохраняются
+    в пуле из workers потоков, рецепты и их связи вставляются через
+    bulk_create в одной транзакции на пачку. Если транзакция пачки
+    откатывается, сохранённые для неё изображения удаляются. Номер
+    последней сохранённой строки (last_line) позволяет продолжить импорт
+    с места остановки.
+    """
+
+    def __init__(self, author, batch_size=500, workers=4):
+        self.author = author
+        self.batch_size = batch_size
+        self.workers = workers
+
+    def run(self, lines, start_line=0, on_batch=None):
+        report = ImportReport(start_line)
+        numbered = (
+            (number, line)
+            for number, line in enumerate(lines, start=1)
+            if number > start_line
+        )
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                batch = list(islice(numbered, self.batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch, report, pool)
+                report.last_line = batch[-1][0]
+                if on_batch is not None:
+                    on_batch(report)
+        return report
+
+    def parse(self, batch, report):
+        rows = []
+        for number, line in batch:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            if not line.strip():
+                continue
+            report.read += 1
+            try:
+                data = json.loads(line)
+            except ValueError as error:
+                report.add_error(number, {"json": str(error)})
+                continue
+            if not isinstance(data, dict):
+                report.add_error(number, {"json": "Ожидался объект."})
+                continue
+            rows.append((number, data))
+        return rows
+
+    @staticmethod
+    def to_ids(values):
+        ids = set()
+        for value in values if isinstance(values, list) else ():
+            if isinstance(value, dict):
+                value = value.get("id")
+            try:
+                ids.add(int(value))
+            except (TypeError, ValueError):
+                pass
+        return ids
+
+    def get_context(self, rows):
+        tag_ids, ingredient_ids = set(), set()
+        for _, data in rows:
+            tag_ids |= self.to_ids(data.get("tags"))
+            ingredient_ids |= self.to_ids(data.get("ingredients"))
+        return {
+            "tags": Tag.objects.in_bulk(tag_ids),
+            "ingredients": Ingredient.objects.in_bulk(ingredient_ids),
+        }
+
+    def build_recipe(self, item):
+        number, data = item
+        try:
+            image = RecipeImageField().to_internal_value(data["image"])
+        except (ValidationError, ValueError, SkipField) as error:
+            detail = getattr(error, "detail", ["Некорректное изображение."])
+            return number, None, data, {"image": detail}
+        recipe = Recipe(
+            author=self.author,
+            name=data["name"],
+            text=data["text"],
+            cooking_time=data["cooking_time"],
+        )
+        recipe.image.save(image.name, image, save=False)
+        return number, recipe, data, None
+
+    @staticmethod
+    def delete_images(recipes):
+        for recipe in recipes:
+            recipe.image.delete(save=False)
+
+    def import_batch(self, batch, report, pool):
+        rows = self.parse(batch, report)
+        context = self.get_context(rows)
+        valid = []
+        for number, data in rows:
+            serializer = ImportRecipeSerializer(data=data, context=context)
+            if serializer.is_valid():
+                valid.append((number, serializer.validated_data))
+            else:
+                report.add_error(number, serializer.errors)
+
+        built = []
+        for number, recipe, data, errors in pool.map(self.build_recipe, valid):
+            if errors:
+                report.add_error(number, errors)
+            else:
+                built.append((recipe, data))
+        if not built:
+            return
+
+        try:
+            with transaction.atomic():
+                self.save_batch(built)
+        except Exception:
+            self.delete_images(recipe for recipe, _ in built)
+            raise
+        report.imported += len(built)
+
+    def save_batch(self, built):
+        Recipe.objects.bulk_create(
+            [recipe for recipe, _ in built], batch_size=self.batch_size
+        )
+        Recipe.tags.through.objects.bulk_create(
+            [
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+                for recipe, data in built
+                for tag in data["tags"]
+            ],
+            batch_size=self.batch_size,
+        )
+        IngredientsInRecipe.objects.bulk_create(
+            [
+                IngredientsInRecipe(
+                    recipe=recipe,
+                    ingredient=item["ingredient"],
+                    amount=item["amount"],
+                )
+                for recipe, data in built
+                for item in data["ingredients"]
+            ],
+            batch_size=self.batch_size,
+        )
+        recipe_ids = [recipe.pk for recipe, _ in built]
+        # bulk_create не отправляет сигналы post_save.
+        User.objects.filter(pk=self.author.pk).update(
+            recipes_count=F("recipes_count") + len(built)
+        )
+        refresh_recipe_cards(recipe_ids, batch_size=self.batch_size)
+        recipe_cache.invalidate_recipes(
+            Recipe.objects.filter(pk__in=recipe_ids)
+        )
+        schedule_image_processing(recipe_ids)
+        schedule_fan_out(recipe_ids)
+        schedule_similar_refresh(recipe_ids)
+        schedule_pantry_update(recipe_ids)
@@ -0,0 +1,43 @@
+from users.models import Subscribe
+
+
+class SubscriptionsLoader:
+    """Ленивая загрузка подписок текущего пользователя.
+
+    Экземпляр хранится на объекте запроса, поэтому id авторов,
+    на которых подписан пользователь, читаются из базы не более
+    одного раза за запрос, сколько бы пользователей ни сериализовалось.
+    """
+
+    request_attr = "_subscriptions_loader"
+
+    def __init__(self, user):
+        self.user = user
+        self._author_ids = None
+
+    @classmethod
+    def for_request(cls, request):
+        loader = getattr(request, cls.request_attr, None)
+        if loader is None:
+            loader = cls(request.user)
+            setattr(request, cls.request_attr, loader)
+        return loader
+
+    @property
+    def author_ids(self):
+        if self._author_ids is None:
+            if self.user.is_anonymous:
+                self._author_ids = frozenset()
+            else:
+                self._author_ids = frozenset(
+                    Subscribe.objects.filter(user=self.user).values_list(
+                        "author_id", flat=True
+                    )
+                )
+        return self._author_ids
+
+    def is_subscribed(self, author_id):
+        return author_id in self.author_ids
+
+    def reset(self):
+        self._author_ids = None
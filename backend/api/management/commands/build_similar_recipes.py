@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.similar import build_similar_recipes, refresh_similar_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает похожие рецепты. С --recipe обновляет только "
+        "списки, которые могут зависеть от указанных рецептов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipe", type=int, action="append", dest="recipes"
+        )
+
+    def handle(self, *args, **options):
+        if options["recipes"]:
+            saved = refresh_similar_recipes(options["recipes"])
+        else:
+            saved = build_similar_recipes()
+        self.stdout.write(f"Обновлено списков похожих рецептов: {saved}")
@@ -0,0 +1,75 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importers import RecipeImporter
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Импортирует рецепты из NDJSON-файла (один рецепт на строку)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к NDJSON-файлу.")
+        parser.add_argument(
+            "--author", required=True, help="Email или id автора рецептов."
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--checkpoint",
+            help="Файл контрольной точки (по умолчанию <path>.checkpoint).",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Продолжить с последней сохранённой строки.",
+        )
+        parser.add_argument(
+            "--errors", help="Файл для отчёта об ошибках (NDJSON)."
+        )
+
+    def get_author(self, value):
+        lookup = {"pk": value} if value.isdigit() else {"email": value}
+        try:
+            return User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {value} не найден.")
+
+    def handle(self, *args, **options):
+        author = self.get_author(options["author"])
+        checkpoint = options["checkpoint"] or f"{options['path']}.checkpoint"
+        start_line = 0
+        if options["resume"] and os.path.exists(checkpoint):
+            with open(checkpoint, encoding="utf-8") as file:
+                start_line = json.load(file)["last_line"]
+
+        def save_checkpoint(report):
+            with open(checkpoint, "w", encoding="utf-8") as file:
+                json.dump({"last_line": report.last_line}, file)
+            self.stdout.write(
+                f"Строка {report.last_line}: импортировано "
+                f"{report.imported}, ошибок {report.failed}"
+            )
+
+        importer = RecipeImporter(
+            author,
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+        )
+        with open(options["path"], encoding="utf-8") as file:
+            report = importer.run(file, start_line, save_checkpoint)
+        result = report.as_dict()
+        if options["errors"]:
+            with open(options["errors"], "w", encoding="utf-8") as file:
+                for error in result["errors"]:
+                    file.write(json.dumps(error, ensure_ascii=False) + "\n")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Прочитано {result['read']}, импортировано "
+                f"{result['imported']}, ошибок {result['failed']} "
+                f"за {result['seconds']} с "
+                f"({result['rows_per_second']} строк/с)."
+            )
+        )
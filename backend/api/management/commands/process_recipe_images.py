@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from api.images import needs_processing, process_in_background
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Нормализует изображения рецептов (media/recipes/) и строит "
+        "для них варианты."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Обработать и рецепты, у которых варианты уже есть.",
+        )
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        recipes = (
+            Recipe.objects.exclude(image="")
+            .only("image", "image_variants")
+            .order_by("pk")
+        )
+        recipe_ids = [
+            recipe.pk
+            for recipe in recipes.iterator()
+            if options["all"] or needs_processing(recipe)
+        ]
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            results = list(pool.map(process_in_background, recipe_ids))
+        self.stdout.write(
+            f"Обработано изображений: {sum(results)} из {len(recipe_ids)}"
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.trending import rank_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает рейтинг популярных рецептов (ordering=trending) "
+        "по дневной статистике избранного и корзин."
+    )
+
+    def handle(self, *args, **options):
+        ranked = rank_recipes()
+        self.stdout.write(f"Рецептов в рейтинге: {ranked}")
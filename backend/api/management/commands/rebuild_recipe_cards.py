@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import recipe_cache
+from api.cards import refresh_recipe_cards
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Пересобирает карточки (Recipe.card) всех рецептов."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Только рецепты без карточки.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by("pk")
+        if options["missing"]:
+            recipes = recipes.filter(card__isnull=True)
+        recipe_ids = list(recipes.values_list("pk", flat=True))
+        cards = refresh_recipe_cards(
+            recipe_ids, batch_size=options["batch_size"]
+        )
+        recipe_cache.invalidate_recipes(
+            Recipe.objects.filter(pk__in=recipe_ids)
+        )
+        self.stdout.write(f"Обновлено карточек: {len(cards)}")
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe, User
+
+COUNTERS = (
+    (Recipe, "favorites_count", Favorite, "recipe"),
+    (Recipe, "shopping_cart_count", ShoppingCart, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "followers_count", Subscribe, "author"),
+    (User, "following_count", Subscribe, "user"),
+)
+
+
+def count_of(model, field):
+    """Подзапрос: число строк model, ссылающихся на строку через field."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет счётчики рецептов и пользователей с данными и исправляет "
+        "расхождения. С --check только сообщает о них."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только найти расхождения, ничего не меняя.",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, field, related, lookup in COUNTERS:
+            actual = count_of(related, lookup)
+            with transaction.atomic():
+                drift = (
+                    model.objects.select_for_update()
+                    .annotate(actual=actual)
+                    .exclude(**{field: F("actual")})
+                    .values_list("pk", field, "actual")
+                )
+                drift = list(drift)
+                if drift and not options["check"]:
+                    model.objects.filter(
+                        pk__in=[pk for pk, _, _ in drift]
+                    ).update(**{field: actual})
+            for pk, stored, value in drift[:20]:
+                self.stdout.write(
+                    f"{model._meta.model_name}={pk} {field}: "
+                    f"сохранено {stored}, должно быть {value}"
+                )
+            total += len(drift)
+        if options["check"] and total:
+            raise CommandError(f"Расхождений: {total}.")
+        action = "найдено" if options["check"] else "исправлено"
+        self.stdout.write(
+            self.style.SUCCESS(f"Расхождений {action}: {total}.")
+        )
@@ -0,0 +1,359 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+from operator import attrgetter
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import (
+    EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator,
+)
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+class CountlessPaginator(Paginator):
+    """Пагинатор без COUNT(*).
+
+    Запрашивает на одну запись больше размера страницы, чтобы узнать,
+    есть ли следующая страница. Общее количество не вычисляется, поэтому
+    и число страниц известно только после чтения страницы, а последнюю
+    страницу (page=last) запросить нельзя.
+    """
+
+    count = None
+    num_pages = None
+
+    def validate_number(self, number):
+        if number is None:
+            raise InvalidPage("Последняя страница неизвестна без подсчёта.")
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("Номер страницы должен быть числом.")
+        if number < 1:
+            raise EmptyPage("Номер страницы меньше 1.")
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page + 1
+        items = list(self.object_list[bottom:top])
+        if not items and number > 1:
+            raise EmptyPage("Страница не содержит результатов.")
+        has_next = len(items) > self.per_page
+        self.num_pages = number + 1 if has_next else number
+        return Page(items[: self.per_page], number, self)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор с приблизительным количеством записей без фильтров.
+
+    Для выборки без фильтров на PostgreSQL берётся оценка планировщика,
+    на других СУБД - точное количество, кешируемое на
+    count_cache_timeout секунд. Оценка меньше exact_count_threshold
+    тоже заменяется кешированным точным количеством: маленькие таблицы
+    считаются быстро, а ошибка оценки на них заметнее всего.
+    Отфильтрованная выборка всегда считается точно: оценка
+    планировщика для условий с соединениями может ошибаться в разы.
+    """
+
+    count_cache_timeout = 60
+    exact_count_threshold = 1000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or queryset.query.has_filters():
+            return super().count
+        if connections[queryset.db].vendor == "postgresql":
+            estimate = self.planner_estimate(queryset)
+            if estimate >= self.exact_count_threshold:
+                return estimate
+        return cache.get_or_set(
+            f"pagination-count:{queryset.model._meta.label_lower}",
+            queryset.count,
+            self.count_cache_timeout,
+        )
+
+    @staticmethod
+    def planner_estimate(queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]["Plan Rows"]
+
+
+class MergedQuerySet:
+    """Несколько выборок, читаемых как одна упорядоченная.
+
+    Поддерживает только то, что нужно курсорной пагинации: filter,
+    order_by и срез с начала. Выборки не должны пересекаться: из каждой
+    читается не больше среза, результаты сливаются в общем порядке.
+    """
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+        self.ordering = ()
+
+    def clone(self, querysets):
+        merged = type(self)(*querysets)
+        merged.ordering = self.ordering
+        return merged
+
+    def filter(self, *args, **kwargs):
+        return self.clone(
+            [queryset.filter(*args, **kwargs) for queryset in self.querysets]
+        )
+
+    def order_by(self, *fields):
+        merged = self.clone(
+            [queryset.order_by(*fields) for queryset in self.querysets]
+        )
+        merged.ordering = fields
+        return merged
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.start or key.step:
+            raise TypeError("Поддерживается только срез [:stop].")
+        items = [
+            item
+            for queryset in self.querysets
+            for item in queryset[: key.stop]
+        ]
+        for field in reversed(self.ordering):
+            items.sort(
+                key=attrgetter(field.lstrip("-")),
+                reverse=field.startswith("-"),
+            )
+        return items[: key.stop]
+
+
+class ChainedQuerySet(MergedQuerySet):
+    """Несколько выборок, идущих в выдаче одна за другой.
+
+    Все записи следующей выборки идут после записей предыдущей, поэтому
+    постраничный срез читается по очереди из каждой, а COUNT нужен
+    только выборке, пропущенной целиком. После order_by курсорной
+    пагинации выборки читаются как в MergedQuerySet.
+    """
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __getitem__(self, key):
+        if self.ordering:
+            return super().__getitem__(key)
+        if not isinstance(key, slice) or key.step or key.stop is None:
+            raise TypeError("Поддерживается только срез [start:stop].")
+        items, start, stop = [], key.start or 0, key.stop
+        for queryset in self.querysets:
+            part = list(queryset[start:stop])
+            items += part
+            if len(part) == stop - start:
+                break
+            if start and not part:
+                size = queryset.count()
+            else:
+                size = start + len(part)
+            start, stop = max(start - size, 0), stop - size
+        return items
+
+
+class PageLimitPagination(PageNumberPagination):
+    """Постраничная пагинация с параметрами page и limit.
+
+    Значение limit больше max_page_size уменьшается до max_page_size.
+
+    Способ подсчёта общего количества задаётся атрибутом представления
+    count_mode (по умолчанию exact - точный COUNT) и может быть выбран
+    клиентом параметром count: none - без подсчёта (count равен null),
+    estimate - оценка для выборок без фильтров.
+
+    Если у представления задан cursor_ordering, а в запросе передан
+    параметр cursor, выдача переключается в режим курсора: страница
+    выбирается по значениям полей сортировки последней записи
+    (keyset), без OFFSET и без подсчёта общего количества.
+    """
+
+    page_size_query_param = "limit"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Неверный курсор."
+    count_mode = "exact"
+    count_paginator_classes = {
+        "exact": Paginator,
+        "none": CountlessPaginator,
+        "estimate": EstimatedCountPaginator,
+    }
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count_mode = request.query_params.get(self.count_query_param)
+        if count_mode not in self.count_paginator_classes:
+            count_mode = getattr(view, "count_mode", self.count_mode)
+        self.django_paginator_class = self.count_paginator_classes[count_mode]
+        self.cursor_ordering = getattr(view, "cursor_ordering", None)
+        self.cursor_mode = bool(
+            self.cursor_ordering
+            and self.cursor_query_param in request.query_params
+        )
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_by_cursor(queryset, request)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        return self.get_cursor_link(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        return self.get_cursor_link(self.previous_position, reverse=True)
+
+    def paginate_by_cursor(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param),
+            self.get_cursor_fields(queryset),
+        )
+        if reverse:
+            ordering = [
+                field[1:] if field.startswith("-") else f"-{field}"
+                for field in self.cursor_ordering
+            ]
+        else:
+            ordering = list(self.cursor_ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after_position(ordering, position))
+        results = list(queryset.order_by(*ordering)[: page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        self.next_position = self.previous_position = None
+        if results and has_next:
+            self.next_position = self.get_position(results[-1])
+        if results and has_previous:
+            self.previous_position = self.get_position(results[0])
+        return results
+
+    def after_position(self, ordering, position):
+        """Условие «строго после position» в порядке ordering."""
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            step = Q(**{f"{name}__{lookup}": position[index]})
+            for previous, value in zip(ordering[:index], position):
+                step &= Q(**{previous.lstrip("-"): value})
+            condition |= step
+        return condition
+
+    def get_position(self, obj):
+        position = []
+        for field in self.cursor_ordering:
+            value = getattr(obj, field.lstrip("-"))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({"p": position, "r": reverse})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def get_cursor_fields(self, queryset):
+        """Поля модели или аннотации, по которым идёт сортировка."""
+        if isinstance(queryset, MergedQuerySet):
+            queryset = queryset.querysets[0]
+        fields = []
+        for field in self.cursor_ordering:
+            name = field.lstrip("-")
+            annotation = queryset.query.annotations.get(name)
+            if annotation is not None:
+                fields.append(annotation.output_field)
+            else:
+                fields.append(queryset.model._meta.get_field(name))
+        return fields
+
+    @staticmethod
+    def to_position_value(field, value):
+        if value is None:
+            raise ValueError("Пустое значение в курсоре.")
+        value = field.to_python(value)
+        field.run_validators(value)
+        # У автоинкрементных полей нет проверки диапазона.
+        if isinstance(value, int) and value.bit_length() > 63:
+            raise ValueError("Значение вне диапазона.")
+        return value
+
+    def decode_cursor(self, cursor, fields):
+        """Позиция и направление из курсора.
+
+        Значения позиции приводятся к типам полей fields, поэтому
+        подделанный курсор даёт 404, а не ошибку в запросе к базе.
+        """
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position, reverse = payload["p"], bool(payload["r"])
+            if not isinstance(position, list) or len(position) != len(fields):
+                raise ValueError("Неверная длина позиции.")
+            position = [
+                self.to_position_value(field, value)
+                for field, value in zip(fields, position)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_cursor_link(self, position, reverse):
+        if position is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(position, reverse)
+        )
+
+
+class FeedPagination(PageLimitPagination):
+    """Курсорная пагинация ленты: без OFFSET и без подсчёта."""
+
+    cursor_ordering = ("-pub_date", "-recipe_id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = True
+        return self.paginate_by_cursor(queryset, request)
@@ -0,0 +1,260 @@
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from django.db import transaction
+
+from recipes.models import CatalogVersion, IngredientsInRecipe, Recipe
+
+MAX_MISSING = 2
+
+
+class PantrySnapshot:
+    """Состояние индекса рецептов по ингредиентам.
+
+    recipe_ids - отсортированные id рецептов, номер в массиве - строка.
+    postings - {id ингредиента: отсортированный массив строк рецептов}.
+    tags - {слаг тега: маска строк рецептов с этим тегом}.
+    sizes - число ингредиентов в каждом рецепте.
+    alive - маска строк рецептов, которые не удалены.
+    """
+
+    def __init__(self, recipe_ids, postings, tags, sizes, alive):
+        self.recipe_ids = recipe_ids
+        self.postings = postings
+        self.tags = tags
+        self.sizes = sizes
+        self.alive = alive
+
+
+class PantryIndex:
+    """Индекс «что приготовить из продуктов» в памяти процесса.
+
+    Покрытие набора ингредиентов для всех рецептов считается одним
+    np.bincount по спискам рецептов выбранных ингредиентов, фильтр
+    по тегам - объединением масок. Индекс перестраивается при смене
+    версии CatalogVersion.RECIPES, по истечении ttl секунд или после
+    invalidate(). Изменения рецептов, сохранённые в этом процессе,
+    применяются к индексу на месте, без перестройки.
+    """
+
+    ttl = 600
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._built_at = 0.0
+        self._ingredients = {}
+
+    def invalidate(self):
+        self._index = None
+
+    def is_stale(self, index, version):
+        if index is None or time.monotonic() - self._built_at > self.ttl:
+            return True
+        return version is not None and version != self._version
+
+    def get_index(self, version=None):
+        index = self._index
+        if self.is_stale(index, version):
+            with self._lock:
+                index = self._index
+                if self.is_stale(index, version):
+                    index = self.build(version)
+        return index
+
+    @staticmethod
+    def load(recipe_ids):
+        """Ингредиенты и теги рецептов: два словаря {id рецепта: set}."""
+        ingredients, tags = defaultdict(set), defaultdict(set)
+        rows = IngredientsInRecipe.objects.values_list(
+            "recipe_id", "ingredient_id"
+        )
+        tag_rows = Recipe.tags.through.objects.values_list(
+            "recipe_id", "tag__slug"
+        )
+        if recipe_ids is not None:
+            rows = rows.filter(recipe_id__in=recipe_ids)
+            tag_rows = tag_rows.filter(recipe_id__in=recipe_ids)
+        for recipe_id, ingredient_id in rows.iterator():
+            ingredients[recipe_id].add(ingredient_id)
+        for recipe_id, slug in tag_rows.iterator():
+            tags[recipe_id].add(slug)
+        return ingredients, tags
+
+    def build(self, version=None):
+        recipe_ids = np.fromiter(
+            Recipe.objects.order_by("pk").values_list("pk", flat=True),
+            dtype=np.int64,
+        )
+        ingredients, tags = self.load(None)
+        rows = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+        self._ingredients = {
+            rows[recipe_id]: frozenset(items)
+            for recipe_id, items in ingredients.items()
+            if recipe_id in rows
+        }
+        postings = defaultdict(list)
+        sizes = np.zeros(len(recipe_ids), dtype=np.int32)
+        for row, items in sorted(self._ingredients.items()):
+            sizes[row] = len(items)
+            for ingredient_id in items:
+                postings[ingredient_id].append(row)
+        masks = defaultdict(lambda: np.zeros(len(recipe_ids), dtype=bool))
+        for recipe_id, slugs in tags.items():
+            for slug in slugs:
+                if recipe_id in rows:
+                    masks[slug][rows[recipe_id]] = True
+        self._index = PantrySnapshot(
+            recipe_ids,
+            {
+                ingredient_id: np.array(items, dtype=np.int64)
+                for ingredient_id, items in postings.items()
+            },
+            dict(masks),
+            sizes,
+            np.ones(len(recipe_ids), dtype=bool),
+        )
+        self._version = version
+        self._built_at = time.monotonic()
+        return self._index
+
+    def apply_changes(self, recipe_ids):
+        """Отмечает изменение рецептов recipe_ids и обновляет индекс.
+
+        Вызывается после фиксации транзакции. Если с момента построения
+        индекса версию меняли и другие процессы, индекс будет перестроен
+        при следующем поиске.
+        """
+        CatalogVersion.bump(CatalogVersion.RECIPES)
+        version = CatalogVersion.get(CatalogVersion.RECIPES)
+        with self._lock:
+            index = self._index
+            if index is None or self._version != version - 1:
+                return
+            index = self.patch(index, sorted(set(recipe_ids)))
+            if index is None:
+                self._index = None
+                return
+            self._index = index
+            self._version = version
+
+    def patch(self, index, recipe_ids):
+        """Новый снимок с изменёнными рецептами или None для перестройки.
+
+        Новые рецепты дописываются в конец, поэтому их id должны быть
+        больше уже известных.
+        """
+        existing = set(
+            Recipe.objects.filter(pk__in=recipe_ids).values_list(
+                "pk", flat=True
+            )
+        )
+        known = index.recipe_ids
+        positions = np.searchsorted(known, recipe_ids)
+        new = [
+            recipe_id
+            for recipe_id, position in zip(recipe_ids, positions)
+            if recipe_id in existing
+            and (position >= len(known) or known[position] != recipe_id)
+        ]
+        if new and len(known) and new[0] < known[-1]:
+            return None
+        index = self.grow(index, new)
+        ingredients, tags = self.load(recipe_ids)
+        for recipe_id in recipe_ids:
+            row = int(np.searchsorted(index.recipe_ids, recipe_id))
+            if row < len(index.recipe_ids) and (
+                index.recipe_ids[row] == recipe_id
+            ):
+                index.alive[row] = recipe_id in existing
+                self.patch_row(
+                    index,
+                    row,
+                    frozenset(ingredients.get(recipe_id, ())),
+                    tags.get(recipe_id, set()),
+                )
+        return index
+
+    @staticmethod
+    def grow(index, recipe_ids):
+        """Копия снимка с добавленными в конец рецептами recipe_ids."""
+        extra = len(recipe_ids)
+        return PantrySnapshot(
+            np.concatenate(
+                [index.recipe_ids, np.array(recipe_ids, dtype=np.int64)]
+            ),
+            dict(index.postings),
+            {
+                slug: np.concatenate([mask, np.zeros(extra, dtype=bool)])
+                for slug, mask in index.tags.items()
+            },
+            np.concatenate([index.sizes, np.zeros(extra, dtype=np.int32)]),
+            np.concatenate([index.alive, np.ones(extra, dtype=bool)]),
+        )
+
+    def patch_row(self, index, row, ingredients, tags):
+        old = self._ingredients.get(row, frozenset())
+        for ingredient_id in old - ingredients:
+            index.postings[ingredient_id] = np.setdiff1d(
+                index.postings[ingredient_id], [row], assume_unique=True
+            )
+        for ingredient_id in ingredients - old:
+            index.postings[ingredient_id] = np.union1d(
+                index.postings.get(ingredient_id, np.empty(0, np.int64)),
+                [row],
+            )
+        self._ingredients[row] = ingredients
+        index.sizes[row] = len(ingredients)
+        for slug in tags - set(index.tags):
+            index.tags[slug] = np.zeros(len(index.recipe_ids), dtype=bool)
+        for slug, mask in index.tags.items():
+            mask[row] = slug in tags
+
+    def search(self, ingredient_ids, tags=(), version=None):
+        """Рецепты, которые можно приготовить из ingredient_ids.
+
+        Возвращает пары (id рецепта, сколько ингредиентов не хватает)
+        для рецептов, где не хватает не больше MAX_MISSING: сначала
+        полностью покрытые, затем по числу совпавших ингредиентов
+        и от новых к старым.
+        """
+        index = self.get_index(version)
+        lists = [
+            index.postings[ingredient_id]
+            for ingredient_id in set(ingredient_ids)
+            if ingredient_id in index.postings
+        ]
+        if not lists:
+            return []
+        covered = np.bincount(
+            np.concatenate(lists), minlength=len(index.recipe_ids)
+        )
+        missing = index.sizes - covered
+        mask = index.alive & (covered > 0) & (missing <= MAX_MISSING)
+        if tags:
+            empty = np.zeros(len(index.recipe_ids), dtype=bool)
+            mask &= np.logical_or.reduce(
+                [index.tags.get(slug, empty) for slug in tags]
+            )
+        rows = np.flatnonzero(mask)
+        order = np.lexsort(
+            (-index.recipe_ids[rows], -covered[rows], missing[rows])
+        )
+        rows = rows[order]
+        return list(
+            zip(index.recipe_ids[rows].tolist(), missing[rows].tolist())
+        )
+
+
+pantry_index = PantryIndex()
+
+
+def schedule_pantry_update(recipe_ids):
+    """Обновляет индекс продуктов после фиксации транзакции."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: pantry_index.apply_changes(recipe_ids))
@@ -0,0 +1,56 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParser as DjangoParser
+from django.http.multipartparser import MultiPartParserError
+
+from .images import MAX_UPLOAD_BYTES
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загружаемый файл во временный файл, ограничивая его размер."""
+
+    max_size = MAX_UPLOAD_BYTES
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            raise MultiPartParserError(
+                f"файл {self.file_name} больше "
+                f"{self.max_size // (1024 * 1024)} МБ"
+            )
+        return super().receive_data_chunk(raw_data, start)
+
+
+class RecipeMultiPartParser(MultiPartParser):
+    """multipart/form-data для рецептов.
+
+    Файлы потоково пишутся во временные файлы не больше
+    MAX_UPLOAD_BYTES. Остальные поля можно передать одной частью data
+    с JSON рецепта, как в application/json.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context["request"]
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta["CONTENT_TYPE"] = media_type
+        handlers = [LimitedUploadHandler(request)]
+        parser = DjangoParser(meta, stream, handlers, encoding)
+        try:
+            data, files = parser.parse()
+        except MultiPartParserError as exc:
+            raise ParseError(f"Multipart form parse error - {exc}")
+        if "data" not in data:
+            return DataAndFiles(data, files)
+        try:
+            payload = json.loads(data["data"])
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+        if not isinstance(payload, dict):
+            raise ParseError("JSON parse error - ожидался объект.")
+        return DataAndFiles(payload, files)
@@ -0,0 +1,245 @@
+import hashlib
+import io
+import os
+from functools import lru_cache
+from itertools import islice
+
+from fontTools import subset
+from fontTools.ttLib import TTFont
+
+
+class TrueTypeFont:
+    """Метрики TrueType-шрифта для встраивания в PDF.
+
+    Читаются только таблицы, нужные для вывода текста: соответствие
+    символов глифам (cmap), ширины глифов (hmtx) и метрики (head, hhea).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with TTFont(path, lazy=True) as font:
+            head, hhea = font["head"], font["hhea"]
+            self.units = head.unitsPerEm
+            self.bbox = (head.xMin, head.yMin, head.xMax, head.yMax)
+            self.ascent, self.descent = hhea.ascent, hhea.descent
+            metrics = font["hmtx"].metrics
+            self.widths = [
+                metrics[name][0] for name in font.getGlyphOrder()
+            ]
+            self.glyphs = {
+                code: font.getGlyphID(name)
+                for code, name in (font.getBestCmap() or {}).items()
+            }
+        if not self.glyphs:
+            raise ValueError("В шрифте нет таблицы cmap для Unicode.")
+        self.name = "".join(
+            char
+            for char in os.path.splitext(os.path.basename(path))[0]
+            if char.isalnum()
+        )
+
+    def scale(self, value):
+        return round(value * 1000 / self.units)
+
+    def width(self, glyph):
+        widths = self.widths
+        return self.scale(widths[min(glyph, len(widths) - 1)])
+
+    def subset(self, glyphs):
+        """Файл шрифта только с глифами glyphs.
+
+        Номера глифов сохраняются (retain_gids), поэтому коды в тексте
+        страниц и CIDToGIDMap /Identity остаются верными.
+        """
+        options = subset.Options()
+        options.retain_gids = True
+        options.notdef_outline = True
+        options.hinting = False
+        options.layout_features = []
+        options.name_IDs = []
+        options.drop_tables += ["FFTM"]
+        font = TTFont(self.path, lazy=True)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(gids=sorted(set(glyphs) | {0}))
+        subsetter.subset(font)
+        buffer = io.BytesIO()
+        font.save(buffer)
+        font.close()
+        return buffer.getvalue()
+
+
+@lru_cache(maxsize=4)
+def load_font(path):
+    return TrueTypeFont(path)
+
+
+class StreamingPDF:
+    """Потоковая запись простого текстового PDF (A4, один шрифт).
+
+    Страницы формируются по мере чтения строк и сразу отдаются
+    клиенту, в памяти остаётся только текущая страница и набор
+    использованных глифов. Шрифт (Type0, Identity-H) записывается
+    в конце файла подмножеством из использованных глифов, поэтому
+    кириллица отображается без внешних шрифтов, а файл остаётся
+    небольшим.
+    """
+
+    width = 595
+    height = 842
+    margin = 50
+    font_size = 11
+    title_size = 14
+    leading = 15
+
+    def __init__(self, font_path):
+        self.font = load_font(font_path)
+        self.offsets = {}
+        self.position = 0
+        self.used = {}
+
+    def obj(self, number, body):
+        self.offsets[number] = self.position
+        return self.write(f"{number} 0 obj\n{body}\nendobj\n".encode())
+
+    def write(self, data):
+        self.position += len(data)
+        return data
+
+    def stream(self, number, content, extra=""):
+        header = f"{number} 0 obj\n<< /Length {len(content)}{extra} >>\n"
+        self.offsets[number] = self.position
+        return self.write(
+            header.encode() + b"stream\n" + content + b"\nendstream\nendobj\n"
+        )
+
+    def encode(self, text):
+        glyphs = []
+        for char in text:
+            glyph = self.font.glyphs.get(ord(char), 0)
+            self.used.setdefault(glyph, char)
+            glyphs.append(f"{glyph:04X}")
+        return "<" + "".join(glyphs) + ">"
+
+    def page_content(self, lines, title=None):
+        top = self.height - self.margin
+        parts = [f"BT\n{self.margin} {top} Td\n{self.leading} TL"]
+        if title is not None:
+            parts.append(f"/F1 {self.title_size} Tf")
+            parts.append(f"{self.encode(title)} Tj T* T*")
+        parts.append(f"/F1 {self.font_size} Tf")
+        parts.extend(f"{self.encode(line)} Tj T*" for line in lines)
+        parts.append("ET")
+        return "\n".join(parts).encode()
+
+    def font_name(self):
+        """Имя подмножества шрифта с префиксом из шести букв."""
+        digest = hashlib.md5(
+            ",".join(map(str, sorted(self.used))).encode()
+        ).digest()
+        prefix = "".join(chr(ord("A") + byte % 26) for byte in digest[:6])
+        return f"{prefix}+{self.font.name}"
+
+    def font_objects(self, name):
+        font = self.font
+        bbox = " ".join(str(font.scale(value)) for value in font.bbox)
+        yield self.obj(
+            6,
+            f"<< /Type /FontDescriptor /FontName /{name} /Flags 32 "
+            f"/FontBBox [{bbox}] /ItalicAngle 0 "
+            f"/Ascent {font.scale(font.ascent)} "
+            f"/Descent {font.scale(font.descent)} "
+            f"/CapHeight {font.scale(font.ascent)} /StemV 80 "
+            "/FontFile2 7 0 R >>",
+        )
+        data = font.subset(self.used)
+        yield self.stream(7, data, f" /Length1 {len(data)}")
+
+    def closing_objects(self, pages):
+        font = self.font
+        name = self.font_name()
+        yield from self.font_objects(name)
+        kids = " ".join(f"{page} 0 R" for page in pages)
+        yield self.obj(
+            2, f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>"
+        )
+        used = sorted(self.used.items())
+        widths = " ".join(
+            f"{glyph} [{font.width(glyph)}]" for glyph, _ in used
+        )
+        yield self.obj(
+            4,
+            f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{name} "
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) "
+            "/Supplement 0 >> /FontDescriptor 6 0 R "
+            f"/CIDToGIDMap /Identity /W [{widths}] >>",
+        )
+        yield self.stream(5, self.to_unicode(used))
+        yield self.obj(
+            3,
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{name} "
+            "/Encoding /Identity-H /DescendantFonts [4 0 R] "
+            "/ToUnicode 5 0 R >>",
+        )
+        yield self.obj(1, "<< /Type /Catalog /Pages 2 0 R >>")
+
+    def to_unicode(self, used):
+        blocks = []
+        iterator = iter(used)
+        while block := list(islice(iterator, 100)):
+            entries = "\n".join(
+                f"<{glyph:04X}> <{ord(char):04X}>"
+                for glyph, char in block
+                if ord(char) <= 0xFFFF
+            )
+            count = entries.count("\n") + 1 if entries else 0
+            blocks.append(f"{count} beginbfchar\n{entries}\nendbfchar")
+        return (
+            "/CIDInit /ProcSet findresource begin\n12 dict begin\n"
+            "begincmap\n/CIDSystemInfo << /Registry (Adobe) "
+            "/Ordering (UCS) /Supplement 0 >> def\n"
+            "/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+            "1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n"
+            + "\n".join(blocks)
+            + "\nendcmap\nCMapName currentdict /CMapResource "
+            "defineresource pop\nend\nend"
+        ).encode()
+
+    def render(self, title, lines):
+        """Отдаёт PDF по частям: заголовок title и строки lines."""
+        per_page = (self.height - 2 * self.margin) // self.leading
+        yield self.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        lines = iter(lines)
+        pages = []
+        number = 8
+        page_title = title
+        while True:
+            size = per_page - 2 if page_title is not None else per_page
+            batch = list(islice(lines, size))
+            if not batch and pages:
+                break
+            content = self.page_content(batch, page_title)
+            page_title = None
+            yield self.stream(number, content)
+            yield self.obj(
+                number + 1,
+                f"<< /Type /Page /Parent 2 0 R "
+                f"/MediaBox [0 0 {self.width} {self.height}] "
+                f"/Resources << /Font << /F1 3 0 R >> >> "
+                f"/Contents {number} 0 R >>",
+            )
+            pages.append(number + 1)
+            number += 2
+        yield from self.closing_objects(pages)
+        xref = self.position
+        entries = ["0000000000 65535 f "] + [
+            f"{self.offsets[index]:010d} 00000 n "
+            for index in range(1, number)
+        ]
+        yield self.write(
+            (
+                f"xref\n0 {number}\n"
+                + "\n".join(entries)
+                + f"\ntrailer\n<< /Size {number} /Root 1 0 R >>\n"
+                f"startxref\n{xref}\n%%EOF\n"
+            ).encode()
+        )
@@ -0,0 +1,35 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class ExportRenderer(BaseRenderer):
+    """Выбор формата выгрузки по ?format= или Accept.
+
+    Сам файл отдаётся потоковым ответом, поэтому рендерер выводит
+    только сообщения об ошибках.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if not isinstance(data, str):
+            data = json.dumps(data, ensure_ascii=False)
+        return data.encode(self.charset)
+
+
+class TextRenderer(ExportRenderer):
+    media_type = "text/plain"
+    format = "txt"
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class PDFRenderer(ExportRenderer):
+    media_type = "application/pdf"
+    format = "pdf"
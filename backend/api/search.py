@@ -0,0 +1,87 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from operator import itemgetter
+
+from django.db.models import Count
+
+from recipes.models import Ingredient
+
+rank = itemgetter(1, 2)
+
+
+def normalize(text):
+    """Приводит строку к виду для поиска: без регистра, ё заменена на е."""
+    return text.casefold().replace("ё", "е")
+
+
+class IngredientIndex:
+    """Префиксный индекс названий ингредиентов в памяти процесса.
+
+    Записи отсортированы по нормализованному названию, поэтому диапазон
+    совпадений по префиксу находится двоичным поиском. Совпадения
+    ранжируются по числу рецептов с ингредиентом, затем по названию.
+    Индекс перестраивается при первом обращении после invalidate(),
+    при смене версии справочника или по истечении ttl секунд.
+    """
+
+    ttl = 300
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._built_at = 0.0
+
+    def invalidate(self):
+        self._index = None
+
+    def is_stale(self, index, version):
+        if index is None or time.monotonic() - self._built_at > self.ttl:
+            return True
+        return version is not None and version != self._version
+
+    def get_index(self, version=None):
+        index = self._index
+        if self.is_stale(index, version):
+            with self._lock:
+                index = self._index
+                if self.is_stale(index, version):
+                    index = self.build(version)
+        return index
+
+    def build(self, version=None):
+        ingredients = Ingredient.objects.annotate(
+            recipes_count=Count("recipes")
+        ).values("id", "name", "measurement_unit", "recipes_count")
+        entries = sorted(
+            (
+                normalize(item["name"]),
+                -item.pop("recipes_count"),
+                item["name"],
+                item["id"],
+                item,
+            )
+            for item in ingredients
+        )
+        self._index = ([entry[0] for entry in entries], entries)
+        self._version = version
+        self._built_at = time.monotonic()
+        return self._index
+
+    def search(self, prefix="", limit=None, version=None):
+        """Ингредиенты, название которых начинается с prefix."""
+        keys, entries = self.get_index(version)
+        prefix = normalize(prefix)
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + "\uffff", start)
+        matches = entries[start:end]
+        if limit is not None and limit < len(matches):
+            matches = heapq.nsmallest(limit, matches, key=rank)
+        else:
+            matches.sort(key=rank)
+        return [entry[4] for entry in matches]
+
+
+ingredient_index = IngredientIndex()
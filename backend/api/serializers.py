@@ -2,15 +2,26 @@ from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_base64.fields import Base64ImageField
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
+from rest_framework.relations import MANY_RELATION_KWARGS
 
-from django.db.models import F
-from django.shortcuts import get_object_or_404
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.http import Http404
 
 from recipes.models import (
-    Favorite, Ingredient, IngredientsInRecipe, Recipe, ShoppingCart, Tag,
+    Favorite, Ingredient, IngredientsInRecipe, Recipe, ShoppingCart,
+    ShoppingListItem, Tag,
 )
 from users.models import Subscribe, User
 
+from .cache import recipe_cache
+from .cards import schedule_card_refresh
+from .images import MAX_UPLOAD_BYTES, check_upload, image_variant_urls
+from .loaders import SubscriptionsLoader
+from .pantry import schedule_pantry_update
+from .signals import batch_ingredient_changes
+from .similar import schedule_similar_refresh
+
 
 class CreateUserSerializer(UserCreateSerializer):
     class Meta:
@@ -43,7 +54,7 @@ class UserSerializer(UserSerializer):
         request = self.context.get("request")
         if request is None or request.user.is_anonymous:
             return False
-        return Subscribe.objects.filter(user=request.user, author=obj).exists()
+        return SubscriptionsLoader.for_request(request).is_subscribed(obj.pk)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -68,7 +79,7 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
     measurement_unit = serializers.CharField(
         source="ingredient.measurement_unit", read_only=True
     )
-    amount = serializers.IntegerField(source="ingredient_amount")
+    amount = serializers.IntegerField()
 
     class Meta:
         model = IngredientsInRecipe
@@ -84,18 +95,96 @@ class IngredientsInRecipeSerializer(serializers.ModelSerializer):
         fields = ("id", "amount")
 
 
+class RecipeImageField(Base64ImageField):
+    """Изображение в base64 или файлом из multipart/form-data.
+
+    Размер и разрешение проверяются до полного декодирования.
+    """
+
+    default_error_messages = {
+        "too_large": "Размер изображения больше {max_size} МБ.",
+    }
+
+    def to_internal_value(self, data):
+        # Request объединяет JSON из части data с MultiValueDict файлов
+        # через dict.update, поэтому файл приходит списком из одного
+        # элемента.
+        if isinstance(data, list) and len(data) == 1:
+            data = data[0]
+        if isinstance(data, str) and data.startswith("data:"):
+            if len(data) * 3 // 4 > MAX_UPLOAD_BYTES:
+                self.fail(
+                    "too_large", max_size=MAX_UPLOAD_BYTES // (1024 * 1024)
+                )
+        try:
+            data = self._decode(data)
+        except ValueError:
+            self.fail("invalid_image")
+        if hasattr(data, "seek"):
+            error = check_upload(data)
+            if error:
+                raise ValidationError(error)
+        return serializers.ImageField.to_internal_value(self, data)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField(read_only=True)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
 
+    def get_image_variants(self, obj):
+        return image_variant_urls(obj, self.context.get("request"))
 
-class GetRecipeSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
+
+class RecipeAuthorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ("email", "id", "username", "first_name", "last_name")
+
+
+class RecipeCardSerializer(serializers.ModelSerializer):
+    """Не зависящая от пользователя часть рецепта (Recipe.card)."""
+
+    author = RecipeAuthorSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = (
+            "id",
+            "tags",
+            "author",
+            "ingredients",
+            "name",
+            "image",
+            "image_variants",
+            "text",
+            "cooking_time",
+        )
+
+    def get_ingredients(self, obj):
+        ingredients = getattr(obj, "ingredient_amounts", None)
+        if ingredients is None:
+            ingredients = obj.recipeingredient.select_related(
+                "ingredient"
+            ).order_by("ingredient__name")
+        return IngredientRecipeSerializer(ingredients, many=True).data
+
+    def get_image(self, obj):
+        return obj.image.url if obj.image else None
+
+    def get_image_variants(self, obj):
+        return image_variant_urls(obj, self.context.get("request"))
+
+
+class GetRecipeSerializer(RecipeCardSerializer):
+    author = UserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
@@ -111,20 +200,54 @@ class GetRecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
+            "favorites_count",
+            "shopping_cart_count",
         )
 
-    def get_ingredients(self, obj):
-        ingredients = obj.ingredients.values(
-            "id",
-            "name",
-            "measurement_unit",
-            amount=F("ingredientsinrecipe__amount"),
-        )
-        return ingredients
+    def to_representation(self, instance):
+        card = instance.card
+        if not card:
+            return super().to_representation(instance)
+        request = self.context.get("request")
+        image = card["image"]
+        variants = card.get("image_variants", {})
+        if request is not None:
+            if image:
+                image = request.build_absolute_uri(image)
+            variants = {
+                fmt: {
+                    width: request.build_absolute_uri(url)
+                    for width, url in urls.items()
+                }
+                for fmt, urls in variants.items()
+            }
+        author = dict(card["author"], is_subscribed=False)
+        if request is not None and not request.user.is_anonymous:
+            author["is_subscribed"] = SubscriptionsLoader.for_request(
+                request
+            ).is_subscribed(author["id"])
+        return {
+            "id": card["id"],
+            "tags": card["tags"],
+            "author": author,
+            "ingredients": card["ingredients"],
+            "is_favorited": self.get_is_favorited(instance),
+            "is_in_shopping_cart": self.get_is_in_shopping_cart(instance),
+            "name": card["name"],
+            "image": image,
+            "image_variants": variants,
+            "text": card["text"],
+            "cooking_time": card["cooking_time"],
+            "favorites_count": instance.favorites_count,
+            "shopping_cart_count": instance.shopping_cart_count,
+        }
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         return (
             self.context["request"].user.is_authenticated
             and Favorite.objects.filter(
@@ -133,6 +256,8 @@ class GetRecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         return (
             self.context["request"].user.is_authenticated
             and ShoppingCart.objects.filter(
@@ -141,13 +266,49 @@ class GetRecipeSerializer(serializers.ModelSerializer):
         )
 
 
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список первичных ключей, загружаемый одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for item in data:
+            try:
+                if isinstance(item, bool):
+                    raise TypeError
+                pks.append(pk_field.to_python(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                pks.append(None)
+        objects = queryset.in_bulk({pk for pk in pks if pk is not None})
+        for item, pk in zip(data, pks):
+            if pk is None:
+                child.fail("incorrect_type", data_type=type(item).__name__)
+            if pk not in objects:
+                child.fail("does_not_exist", pk_value=item)
+        return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
 class CreateRecipeSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
     author = UserSerializer(read_only=True)
     ingredients = IngredientsInRecipeSerializer(many=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -168,10 +329,12 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             raise ValidationError(
                 {"ingredients": "Необходим хотя бы один ингридиент."}
             )
-        ingredients_list = []
+        existing = self.get_ingredients({item["id"] for item in ingredients})
+        seen = set()
         for item in ingredients:
-            ingredient = get_object_or_404(Ingredient, id=item["id"])
-            if ingredient in ingredients_list:
+            if item["id"] not in existing:
+                raise Http404
+            if item["id"] in seen:
                 raise ValidationError(
                     {"ingredients": "Ингредиенты должны быть уникальными."}
                 )
@@ -179,18 +342,19 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
                 raise ValidationError(
                     {"amount": "Минимальное количество ингредиента - 1."}
                 )
-            ingredients_list.append(ingredient)
+            seen.add(item["id"])
+            item["ingredient"] = existing[item["id"]]
         return value
 
+    def get_ingredients(self, ids):
+        return Ingredient.objects.in_bulk(ids)
+
     def validate_tags(self, value):
         tags = value
         if not tags:
             raise ValidationError({"tags": "Выберите минимум 1 тег."})
-        tags_list = []
-        for tag in tags:
-            if tag in tags_list:
-                raise ValidationError({"tags": "Повторный тег."})
-            tags_list.append(tag)
+        if len(set(tags)) != len(tags):
+            raise ValidationError({"tags": "Повторный тег."})
         return value
 
     def validate_cooking_time(self, value):
@@ -205,7 +369,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         IngredientsInRecipe.objects.bulk_create(
             [
                 IngredientsInRecipe(
-                    ingredient=Ingredient.objects.get(id=ingredient["id"]),
+                    ingredient=ingredient["ingredient"],
                     recipe=recipe,
                     amount=ingredient["amount"],
                 )
@@ -213,24 +377,81 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             ]
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe=recipe, ingredients=ingredients)
+        schedule_similar_refresh([recipe.pk])
+        schedule_pantry_update([recipe.pk])
         return recipe
 
+    def update_ingredients(self, ingredients, recipe):
+        current = {
+            row.ingredient_id: row
+            for row in IngredientsInRecipe.objects.filter(recipe=recipe)
+        }
+        new, changed = [], []
+        for item in ingredients:
+            row = current.pop(item["ingredient"].pk, None)
+            if row is None:
+                new.append(item)
+            elif row.amount != item["amount"]:
+                row.amount = item["amount"]
+                changed.append(row)
+        if current:
+            with batch_ingredient_changes():
+                IngredientsInRecipe.objects.filter(
+                    pk__in=[row.pk for row in current.values()]
+                ).delete()
+        if changed:
+            IngredientsInRecipe.objects.bulk_update(changed, ["amount"])
+        if new:
+            self.create_ingredients(recipe=recipe, ingredients=new)
+        ShoppingListItem.objects.refresh_recipe(
+            recipe.pk,
+            [row.ingredient_id for row in changed]
+            + [item["ingredient"].pk for item in new]
+            + list(current),
+        )
+        if current or changed or new:
+            # Сигналы строк отключены или не отправляются пакетными
+            # запросами, обновления планируются один раз на рецепт.
+            recipe_cache.invalidate_recipes(
+                Recipe.objects.filter(pk=recipe.pk)
+            )
+            schedule_card_refresh([recipe.pk])
+            schedule_similar_refresh([recipe.pk])
+            schedule_pantry_update([recipe.pk])
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop("tags")
-        ingredients = validated_data.pop("ingredients")
-        instance = super().update(instance, validated_data)
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients(recipe=instance, ingredients=ingredients)
-        instance.save()
-        return instance
+        """Применяет изменения к заблокированной до конца транзакции строке.
+
+        Экземпляр instance прочитан до начала транзакции, поэтому поля
+        копируются в свежую копию рецепта и сохраняются только
+        изменённые: параллельное изменение других полей не теряется.
+        """
+        tags = validated_data.pop("tags", None)
+        ingredients = validated_data.pop("ingredients", None)
+        recipe = Recipe.objects.select_for_update().get(pk=instance.pk)
+        changed = []
+        for name, value in validated_data.items():
+            if getattr(recipe, name) != value:
+                setattr(recipe, name, value)
+                changed.append(name)
+        if changed:
+            recipe.save(update_fields=changed)
+        if tags is not None:
+            recipe.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(recipe=recipe, ingredients=ingredients)
+        # Карточку пересоберут сигналы после фиксации транзакции, ответ
+        # строится по самому рецепту.
+        recipe.card = None
+        return recipe
 
     def to_representation(self, instance):
         request = self.context.get("request")
@@ -238,9 +459,79 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         return GetRecipeSerializer(instance, context=context).data
 
 
+class ImportRecipeSerializer(CreateRecipeSerializer):
+    """Проверка рецепта при массовом импорте.
+
+    Теги и ингредиенты берутся из словарей context["tags"] и
+    context["ingredients"], загруженных заранее на всю пачку строк.
+    Изображение проверяется только как строка, его декодирование
+    выполняет импорт.
+    """
+
+    tags = serializers.ListField(child=serializers.IntegerField())
+    image = serializers.CharField()
+
+    def get_ingredients(self, ids):
+        ingredients = self.context["ingredients"]
+        return {pk: ingredients[pk] for pk in ids if pk in ingredients}
+
+    def validate_ingredients(self, value):
+        missing = sorted(
+            {item["id"] for item in value} - self.context["ingredients"].keys()
+        )
+        if missing:
+            raise ValidationError(
+                {"ingredients": f"Ингредиенты не найдены: {missing}."}
+            )
+        return super().validate_ingredients(value)
+
+    def validate_tags(self, value):
+        tags = self.context["tags"]
+        for pk in value:
+            if pk not in tags:
+                raise ValidationError(
+                    serializers.PrimaryKeyRelatedField.default_error_messages[
+                        "does_not_exist"
+                    ].format(pk_value=pk)
+                )
+        return super().validate_tags([tags[pk] for pk in value])
+
+
+class BulkUserRecipesSerializer(serializers.Serializer):
+    """Пакетное изменение избранного или списка покупок.
+
+    Сначала удаляются рецепты remove, затем добавляются add. copy_from
+    добавляет все рецепты другого списка пользователя, move_from
+    переносит их, удаляя из исходного списка.
+    """
+
+    LISTS = ("favorite", "shopping_cart")
+
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), default=list
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), default=list
+    )
+    copy_from = serializers.ChoiceField(choices=LISTS, required=False)
+    move_from = serializers.ChoiceField(choices=LISTS, required=False)
+
+    def validate(self, data):
+        sources = [
+            data[name] for name in ("copy_from", "move_from") if name in data
+        ]
+        if len(sources) > 1:
+            raise ValidationError(
+                "Укажите только один из параметров copy_from и move_from."
+            )
+        if self.context["target"] in sources:
+            raise ValidationError("Нельзя перенести список сам в себя.")
+        return data
+
+
 class SubscriptionsSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(default=0)
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -257,10 +548,12 @@ class SubscriptionsSerializer(UserSerializer):
         read_only_fields = ("email", "username", "first_name", "last_name")
 
     def get_recipes(self, obj):
-        limit = self.context["request"].query_params.get("recipes_limit")
-        recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[: int(limit)]
+        recipes = getattr(obj, "preview_recipes", None)
+        if recipes is None:
+            limit = self.context["request"].query_params.get("recipes_limit")
+            recipes = obj.recipes.all()
+            if limit:
+                recipes = recipes[: int(limit)]
         return RecipeSerializer(recipes, many=True).data
 
     def validate(self, data):
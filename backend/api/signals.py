@@ -0,0 +1,214 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from recipes.models import (
+    CatalogVersion, Favorite, FeedEntry, Ingredient, IngredientsInRecipe,
+    Recipe, ShoppingCart, ShoppingListItem, Tag,
+)
+from users.models import Subscribe
+
+from .cache import recipe_cache
+from .cards import schedule_card_refresh
+from .catalog import catalog_snapshots
+from .feed import follow, schedule_fan_out
+from .images import needs_processing, schedule_image_processing
+from .pantry import schedule_pantry_update
+from .search import ingredient_index
+from .similar import schedule_similar_refresh
+
+User = get_user_model()
+
+AUTHOR_FIELDS = {"username", "email", "first_name", "last_name"}
+
+_batch_ingredient_changes = ContextVar(
+    "batch_ingredient_changes", default=False
+)
+
+
+@contextmanager
+def batch_ingredient_changes():
+    """Отключает построчные сигналы ингредиентов рецепта.
+
+    Вызывающий код сам пересчитывает списки покупок и планирует
+    обновления один раз на всю пачку изменённых строк.
+    """
+    token = _batch_ingredient_changes.set(True)
+    try:
+        yield
+    finally:
+        _batch_ingredient_changes.reset(token)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(**kwargs):
+    CatalogVersion.bump(CatalogVersion.INGREDIENTS)
+    catalog_snapshots.forget_version(CatalogVersion.INGREDIENTS)
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(**kwargs):
+    CatalogVersion.bump(CatalogVersion.TAGS)
+    catalog_snapshots.forget_version(CatalogVersion.TAGS)
+    # Индекс продуктов хранит теги по слагам, его нужно перестроить.
+    transaction.on_commit(
+        lambda: CatalogVersion.bump(CatalogVersion.RECIPES)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(instance, **kwargs):
+    recipes_changed(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(instance, **kwargs):
+    recipe_cache.invalidate_recipes(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_changed(instance, **kwargs):
+    if needs_processing(instance):
+        schedule_image_processing([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if action not in ("pre_remove", "pre_clear", "post_add"):
+        return
+    if not reverse:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+        schedule_similar_refresh([instance.pk])
+        schedule_pantry_update([instance.pk])
+    elif pk_set:
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+    else:
+        recipes = instance.recipes.all()
+    recipes_changed(recipes)
+
+
+@receiver(post_save, sender=IngredientsInRecipe)
+@receiver(post_delete, sender=IngredientsInRecipe)
+def recipe_ingredients_changed(instance, **kwargs):
+    if _batch_ingredient_changes.get():
+        return
+    recipes_changed(Recipe.objects.filter(pk=instance.recipe_id))
+    ingredient_ids = {
+        instance.ingredient_id,
+        getattr(instance, "_previous_ingredient_id", None),
+    }
+    ShoppingListItem.objects.refresh_recipe(
+        instance.recipe_id, ingredient_ids - {None}
+    )
+    schedule_similar_refresh([instance.recipe_id])
+    schedule_pantry_update([instance.recipe_id])
+
+
+@receiver(pre_save, sender=IngredientsInRecipe)
+def remember_previous_ingredient(instance, **kwargs):
+    if instance.pk is not None:
+        instance._previous_ingredient_id = (
+            IngredientsInRecipe.objects.filter(pk=instance.pk)
+            .values_list("ingredient_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_added(instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipes(
+            instance.user, [instance.recipe_id]
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_removed(instance, **kwargs):
+    ShoppingListItem.objects.remove_recipes(
+        instance.user, [instance.recipe_id]
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def user_recipe_added(sender, instance, created, **kwargs):
+    if created:
+        sender.objects.change_counter([instance.recipe_id], 1)
+        sender.objects.record_added([instance.recipe_id])
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def user_recipe_removed(sender, instance, **kwargs):
+    sender.objects.change_counter([instance.recipe_id], -1)
+
+
+def change_user_counter(user_id, field, delta):
+    User.objects.filter(pk=user_id).update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(instance, created, **kwargs):
+    if created:
+        change_user_counter(instance.author_id, "recipes_count", 1)
+        schedule_fan_out([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    change_user_counter(instance.author_id, "recipes_count", -1)
+    schedule_pantry_update([instance.pk])
+
+
+@receiver(post_save, sender=Subscribe)
+def subscribed(instance, created, **kwargs):
+    if created:
+        change_user_counter(instance.author_id, "followers_count", 1)
+        change_user_counter(instance.user_id, "following_count", 1)
+        follow(instance.user, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def unsubscribed(instance, **kwargs):
+    change_user_counter(instance.author_id, "followers_count", -1)
+    change_user_counter(instance.user_id, "following_count", -1)
+    FeedEntry.objects.remove_author(instance.user_id, instance.author_id)
+
+
+def recipes_changed(recipes):
+    """Обновляет карточки рецептов и сбрасывает их кеш после коммита."""
+    recipe_ids = list(recipes.values_list("pk", flat=True))
+    if recipe_ids:
+        schedule_card_refresh(recipe_ids)
+        recipe_cache.invalidate_recipes(recipes)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_recipes_changed(instance, created=False, **kwargs):
+    if not created:
+        recipes_changed(instance.recipes.all())
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_recipes_changed(instance, created=False, **kwargs):
+    if not created:
+        recipes_changed(instance.recipes.all())
+
+
+@receiver(post_save, sender=User)
+def author_changed(instance, created, update_fields, **kwargs):
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    recipes_changed(instance.recipes.all())
@@ -0,0 +1,317 @@
+import threading
+
+import numpy as np
+from scipy import sparse
+
+from django.db import transaction
+from django.db.models import Count, Min
+
+from jobs.queue import enqueue
+from recipes.models import (
+    CatalogVersion, IngredientsInRecipe, Recipe, SimilarRecipe,
+)
+
+INGREDIENT_WEIGHT = 0.7
+TAG_WEIGHT = 0.3
+TOP_K = 10
+MAX_BATCH_CELLS = 4_000_000
+
+
+class SimilarityIndex:
+    """Разреженная матрица признаков всех рецептов.
+
+    Строка рецепта - нормированный вектор ингредиентов (с весами IDF,
+    чтобы соль и вода почти не влияли на сходство) и нормированный
+    вектор тегов, умноженные на корни из INGREDIENT_WEIGHT и TAG_WEIGHT.
+    Скалярное произведение строк - взвешенная сумма косинусных мер
+    по ингредиентам и по тегам.
+    """
+
+    def __init__(self):
+        self.recipe_ids = np.fromiter(
+            Recipe.objects.order_by("pk").values_list("pk", flat=True),
+            dtype=np.int64,
+        )
+        self.ingredients, self.ingredient_ids = self.load(
+            IngredientsInRecipe.objects.values_list(
+                "recipe_id", "ingredient_id"
+            )
+        )
+        self.tags, self.tag_ids = self.load(
+            Recipe.tags.through.objects.values_list("recipe_id", "tag_id")
+        )
+        self.matrix = self.combine()
+
+    def combine(self):
+        return sparse.hstack(
+            [
+                np.sqrt(INGREDIENT_WEIGHT)
+                * self.normalize(self.weight_by_idf(self.ingredients)),
+                np.sqrt(TAG_WEIGHT) * self.normalize(self.tags),
+            ],
+            format="csr",
+            dtype=np.float32,
+        )
+
+    def load(self, pairs, columns=None):
+        """Матрица рецепт x признак из пар (id рецепта, id признака).
+
+        Возвращает матрицу и id признаков её столбцов: признаки, которых
+        нет в columns, дописываются в конец.
+        """
+        pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+        rows = self.find_rows(pairs[:, 0])
+        known = rows >= 0
+        features = pairs[known, 1]
+        if columns is None:
+            columns = np.empty(0, dtype=np.int64)
+        columns = np.concatenate([columns, np.setdiff1d(features, columns)])
+        order = np.argsort(columns)
+        positions = order[np.searchsorted(columns, features, sorter=order)]
+        matrix = sparse.csr_matrix(
+            (np.ones(len(features)), (rows[known], positions)),
+            shape=(len(self.recipe_ids), len(columns)),
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        return matrix, columns
+
+    def update(self, recipe_ids):
+        """Перечитывает из базы признаки только рецептов recipe_ids.
+
+        Новые рецепты добавляются в матрицу, удалённые убираются из неё.
+        Веса IDF и нормы строк пересчитываются по матрицам в памяти,
+        поэтому результат совпадает с полной сборкой.
+        """
+        recipe_ids = np.unique(np.fromiter(recipe_ids, dtype=np.int64))
+        existing = np.fromiter(
+            Recipe.objects.filter(pk__in=recipe_ids.tolist()).values_list(
+                "pk", flat=True
+            ),
+            dtype=np.int64,
+        )
+        deleted = np.setdiff1d(recipe_ids, existing)
+        self.reindex(
+            np.union1d(np.setdiff1d(self.recipe_ids, deleted), existing)
+        )
+        rows = self.get_rows(existing)
+        ingredients, self.ingredient_ids = self.load(
+            IngredientsInRecipe.objects.filter(
+                recipe_id__in=existing.tolist()
+            ).values_list("recipe_id", "ingredient_id"),
+            self.ingredient_ids,
+        )
+        tags, self.tag_ids = self.load(
+            Recipe.tags.through.objects.filter(
+                recipe_id__in=existing.tolist()
+            ).values_list("recipe_id", "tag_id"),
+            self.tag_ids,
+        )
+        self.ingredients = self.replace_rows(
+            self.ingredients, ingredients, rows
+        )
+        self.tags = self.replace_rows(self.tags, tags, rows)
+        self.matrix = self.combine()
+
+    def reindex(self, recipe_ids):
+        """Переставляет строки матриц под отсортированные recipe_ids.
+
+        Строки новых рецептов пустые.
+        """
+        rows = self.find_rows(recipe_ids)
+
+        def take(matrix):
+            padded = sparse.vstack(
+                [matrix, sparse.csr_matrix((1, matrix.shape[1]))],
+                format="csr",
+            )
+            return padded[np.where(rows >= 0, rows, matrix.shape[0])]
+
+        self.ingredients = take(self.ingredients)
+        self.tags = take(self.tags)
+        self.recipe_ids = recipe_ids
+
+    @staticmethod
+    def replace_rows(matrix, changed, rows):
+        """Матрица, где строки rows взяты из changed."""
+        matrix = matrix.copy()
+        matrix.resize(changed.shape)
+        keep = np.ones(matrix.shape[0])
+        keep[rows] = 0
+        matrix = (sparse.diags(keep) @ matrix + changed).tocsr()
+        matrix.eliminate_zeros()
+        return matrix
+
+    @staticmethod
+    def weight_by_idf(matrix):
+        frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        idf = np.log((1 + matrix.shape[0]) / (1 + frequency)) + 1
+        return matrix @ sparse.diags(idf)
+
+    @staticmethod
+    def normalize(matrix):
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)))
+        norms = norms.ravel()
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms) @ matrix
+
+    def find_rows(self, recipe_ids):
+        """Номера строк рецептов recipe_ids, -1 для неизвестных."""
+        rows = np.searchsorted(self.recipe_ids, recipe_ids)
+        known = rows < len(self.recipe_ids)
+        known[known] = self.recipe_ids[rows[known]] == recipe_ids[known]
+        return np.where(known, rows, -1)
+
+    def get_rows(self, recipe_ids):
+        recipe_ids = np.unique(np.fromiter(recipe_ids, dtype=np.int64))
+        rows = self.find_rows(recipe_ids)
+        return rows[rows >= 0]
+
+    def get_batches(self, rows):
+        size = max(1, MAX_BATCH_CELLS // max(len(self.recipe_ids), 1))
+        for start in range(0, len(rows), size):
+            end = start + size
+            yield rows[start:end]
+
+    def get_neighbours(self, rows):
+        """Top-k соседей строк rows: массивы (строки, сходства)."""
+        scores = (self.matrix[rows] @ self.matrix.T).toarray()
+        scores[np.arange(len(rows)), rows] = 0
+        k = min(TOP_K, len(self.recipe_ids) - 1)
+        if k <= 0:
+            return np.empty((len(rows), 0), dtype=np.int64), scores[:, :0]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        return top, np.take_along_axis(top_scores, order, axis=1)
+
+    def save(self, rows):
+        """Пересчитывает и сохраняет похожие рецепты для строк rows."""
+        saved = 0
+        for batch in self.get_batches(rows):
+            top, scores = self.get_neighbours(batch)
+            neighbours = [
+                SimilarRecipe(
+                    recipe_id=int(self.recipe_ids[row]),
+                    similar_id=int(self.recipe_ids[similar]),
+                    score=float(score),
+                    position=position,
+                )
+                for row, similar_rows, row_scores in zip(batch, top, scores)
+                for position, (similar, score) in enumerate(
+                    zip(similar_rows, row_scores), start=1
+                )
+                if score > 0
+            ]
+            with transaction.atomic():
+                SimilarRecipe.objects.filter(
+                    recipe_id__in=self.recipe_ids[batch].tolist()
+                ).delete()
+                SimilarRecipe.objects.bulk_create(neighbours)
+            saved += len(batch)
+        return saved
+
+    def get_affected(self, rows):
+        """Строки рецептов, чьи списки могут измениться вместе с rows.
+
+        Это сами rows, рецепты, в чьих списках они уже есть, и рецепты,
+        для которых сходство с ними выше худшего соседа в списке (или
+        список ещё не заполнен).
+        """
+        recipe_ids = self.recipe_ids[rows].tolist()
+        affected = set(recipe_ids) | set(
+            SimilarRecipe.objects.filter(
+                similar_id__in=recipe_ids
+            ).values_list("recipe_id", flat=True)
+        )
+        best = np.zeros(len(self.recipe_ids), dtype=np.float32)
+        for batch in self.get_batches(rows):
+            scores = (self.matrix @ self.matrix[batch].T).toarray()
+            scores[batch, np.arange(len(batch))] = 0
+            best = np.maximum(best, scores.max(axis=1))
+        candidates = {
+            int(self.recipe_ids[row]): float(best[row])
+            for row in np.flatnonzero(best > 0)
+        }
+        lists = (
+            SimilarRecipe.objects.filter(recipe_id__in=list(candidates))
+            .values("recipe_id")
+            .annotate(worst=Min("score"), size=Count("pk"))
+            .values_list("recipe_id", "worst", "size")
+        )
+        worst = {
+            recipe_id: value if size >= TOP_K else 0
+            for recipe_id, value, size in lists
+        }
+        affected |= {
+            recipe_id
+            for recipe_id, score in candidates.items()
+            if score > worst.get(recipe_id, 0)
+        }
+        return self.get_rows(affected)
+
+
+class SimilarityCache:
+    """Матрица признаков в памяти процесса обработчика задач.
+
+    Изменения рецептов применяются к матрице на месте, из базы читаются
+    только признаки изменённых рецептов. Каждое обновление увеличивает
+    версию CatalogVersion.SIMILAR: если её меняли и другие процессы,
+    их изменений в матрице нет, и она собирается заново. Полная сборка
+    также выполняется периодической задачей recipes.build_similar.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+
+    def invalidate(self):
+        self._index = None
+
+    def build(self):
+        """Собирает матрицу и пересчитывает списки всех рецептов."""
+        with self._lock:
+            self._index = None
+            self._version = CatalogVersion.get(CatalogVersion.SIMILAR)
+            index = SimilarityIndex()
+            self._index = index
+            return index.save(np.arange(len(index.recipe_ids)))
+
+    def refresh(self, recipe_ids):
+        """Обновляет списки, которые зависят от рецептов recipe_ids."""
+        CatalogVersion.bump(CatalogVersion.SIMILAR)
+        version = CatalogVersion.get(CatalogVersion.SIMILAR)
+        with self._lock:
+            index, self._index = self._index, None
+            if index is None or self._version != version - 1:
+                index = SimilarityIndex()
+            else:
+                index.update(recipe_ids)
+            self._index, self._version = index, version
+            return index.save(index.get_affected(index.get_rows(recipe_ids)))
+
+
+similarity_cache = SimilarityCache()
+
+
+def build_similar_recipes():
+    """Пересчитывает похожие рецепты для всех рецептов."""
+    return similarity_cache.build()
+
+
+def refresh_similar_recipes(recipe_ids):
+    """Обновляет похожие рецепты после изменения рецептов recipe_ids."""
+    return similarity_cache.refresh(recipe_ids)
+
+
+def schedule_similar_refresh(recipe_ids):
+    """Ставит обновление похожих рецептов в очередь фоновых задач."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        enqueue(
+            "recipes.refresh_similar",
+            {"recipe_ids": recipe_ids},
+            key="recipe-similar:{recipe_ids}",
+        )
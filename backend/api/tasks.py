@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+
+from jobs.queue import task
+from users.models import User
+
+from .feed import fan_out_recipe
+from .images import process_recipe_image
+from .importers import RecipeImporter
+from .similar import build_similar_recipes, refresh_similar_recipes
+from .trending import rank_recipes
+
+
+@task("recipes.process_image", max_attempts=3)
+def process_recipe_image_task(recipe_id):
+    process_recipe_image(recipe_id)
+
+
+@task("recipes.fan_out", max_attempts=5)
+def fan_out_recipe_task(recipe_id):
+    fan_out_recipe(recipe_id)
+
+
+@task("recipes.rank_trending", every=timedelta(hours=1))
+def rank_trending_task():
+    rank_recipes()
+
+
+@task("recipes.refresh_similar", max_attempts=3)
+def refresh_similar_task(recipe_ids):
+    refresh_similar_recipes(recipe_ids)
+
+
+@task("recipes.build_similar", every=timedelta(days=1))
+def build_similar_task():
+    build_similar_recipes()
+
+
+@task("recipes.import", max_attempts=1)
+def import_recipes_task(author_id, path, start_line=0):
+    """Импортирует загруженный NDJSON-файл и удаляет его."""
+    try:
+        author = User.objects.get(pk=author_id)
+        with default_storage.open(path, "rb") as file:
+            report = RecipeImporter(author).run(file, start_line)
+    finally:
+        default_storage.delete(path)
+    return report.as_dict()
@@ -0,0 +1,113 @@
+import base64
+import hashlib
+import io
+import shutil
+import tempfile
+
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.catalog import catalog_snapshots
+from api.pantry import pantry_index
+from api.search import ingredient_index
+from api.similar import similarity_cache
+from jobs.queue import claim, run_job
+from recipes.models import Ingredient, IngredientsInRecipe, Recipe, Tag
+from users.models import User
+
+
+def image_bytes(size=(4, 4), color="red", mode="RGB"):
+    """Содержимое PNG-файла с изображением, залитым цветом color."""
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def make_image(size=(4, 4), color="red"):
+    """Изображение PNG в base64, как его присылает фронтенд."""
+    encoded = base64.b64encode(image_bytes(size, color)).decode()
+    return f"data:image/png;base64,{encoded}"
+
+
+class FoodgramTestCase(APITestCase):
+    """Общая основа тестов API.
+
+    Кеш и индексы в памяти процесса переживают откат транзакции теста,
+    поэтому перед каждым тестом они сбрасываются.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        catalog_snapshots.clear()
+        ingredient_index.invalidate()
+        pantry_index.invalidate()
+        similarity_cache.invalidate()
+
+    def use_temp_media(self):
+        """Сохраняет файлы теста во временный каталог MEDIA_ROOT."""
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        return media
+
+    @staticmethod
+    def create_user(username, **kwargs):
+        kwargs.setdefault("email", f"{username}@example.com")
+        kwargs.setdefault("first_name", username.title())
+        kwargs.setdefault("last_name", "Тестов")
+        return User.objects.create_user(
+            username=username, password="Pa55-word-42", **kwargs
+        )
+
+    @staticmethod
+    def create_tag(slug, **kwargs):
+        kwargs.setdefault("name", slug.title())
+        kwargs.setdefault(
+            "color", "#" + hashlib.md5(slug.encode()).hexdigest()[:6]
+        )
+        return Tag.objects.create(slug=slug, **kwargs)
+
+    @staticmethod
+    def create_ingredient(name, measurement_unit="г"):
+        return Ingredient.objects.create(
+            name=name, measurement_unit=measurement_unit
+        )
+
+    @staticmethod
+    def create_recipe(author, name="Рецепт", tags=(), ingredients=(), **kw):
+        """Рецепт с тегами tags и ингредиентами {ингредиент: количество}."""
+        kw.setdefault("text", "Описание")
+        kw.setdefault("cooking_time", 10)
+        recipe = Recipe.objects.create(author=author, name=name, **kw)
+        recipe.tags.set(tags)
+        IngredientsInRecipe.objects.bulk_create(
+            IngredientsInRecipe(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in dict(ingredients).items()
+        )
+        return recipe
+
+    @staticmethod
+    def run_jobs():
+        """Выполняет готовые фоновые задачи в текущем потоке."""
+        processed = 0
+        while (job := claim()) is not None:
+            run_job(job)
+            processed += 1
+        return processed
+
+    def count_queries(self, url, **params):
+        """Число SQL-запросов, которые выполняет GET-запрос к url."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return len(queries)
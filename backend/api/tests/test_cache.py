@@ -0,0 +1,101 @@
+from recipes.models import CacheGeneration, Favorite
+
+from .base import FoodgramTestCase
+
+
+class RecipeResponseCacheTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user("author")
+        self.other = self.create_user("other")
+        self.breakfast = self.create_tag("breakfast")
+        self.dinner = self.create_tag("dinner")
+        self.recipe = self.create_recipe(
+            self.author, "Омлет", tags=[self.breakfast]
+        )
+        self.other_recipe = self.create_recipe(
+            self.other, "Суп", tags=[self.dinner]
+        )
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertCached(self, url, expected):
+        self.assertEqual(self.get(url)["X-Cache"], expected, url)
+
+    def test_list_and_detail_are_cached(self):
+        for url in ("/api/recipes/", f"/api/recipes/{self.recipe.pk}/"):
+            self.assertCached(url, "MISS")
+            self.assertCached(url, "HIT")
+
+    def test_query_is_normalized(self):
+        self.get("/api/recipes/?tags=dinner&tags=breakfast&limit=6")
+        self.assertCached(
+            "/api/recipes/?limit=6&tags=breakfast&tags=dinner", "HIT"
+        )
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.client.force_authenticate(self.author)
+        self.assertNotIn("X-Cache", self.get("/api/recipes/"))
+
+    def test_recipe_change_evicts_only_matching_entries(self):
+        author_list = f"/api/recipes/?author={self.author.pk}"
+        other_list = f"/api/recipes/?author={self.other.pk}"
+        dinner_list = "/api/recipes/?tags=dinner"
+        detail = f"/api/recipes/{self.recipe.pk}/"
+        for url in (author_list, other_list, dinner_list, detail):
+            self.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = "Омлет с сыром"
+            self.recipe.save()
+        self.assertCached(author_list, "MISS")
+        self.assertCached(detail, "MISS")
+        self.assertCached(other_list, "HIT")
+        self.assertCached(dinner_list, "HIT")
+        self.assertEqual(self.get(detail).data["name"], "Омлет с сыром")
+
+    def test_tag_change_evicts_lists_with_tag(self):
+        dinner_list = "/api/recipes/?tags=dinner"
+        self.get(dinner_list)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.tags.add(self.dinner)
+        response = self.get(dinner_list)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["count"], 2)
+
+    def test_generations_are_shared_through_database(self):
+        url = "/api/recipes/"
+        self.get(url)
+        # Так сброс видит процесс, который сам его не выполнял.
+        CacheGeneration.bump_many(["recipes:all"])
+        self.assertCached(url, "MISS")
+
+    def test_hit_returns_current_counters(self):
+        detail = f"/api/recipes/{self.recipe.pk}/"
+        self.get(detail)
+        self.get("/api/recipes/")
+        Favorite.objects.add(self.other, [self.recipe.pk])
+        response = self.get(detail)
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.data["favorites_count"], 1)
+        response = self.get("/api/recipes/")
+        self.assertEqual(response["X-Cache"], "HIT")
+        counts = {
+            item["id"]: item["favorites_count"]
+            for item in response.data["results"]
+        }
+        self.assertEqual(
+            counts, {self.recipe.pk: 1, self.other_recipe.pk: 0}
+        )
+
+    def test_stats(self):
+        self.get("/api/recipes/")
+        self.get("/api/recipes/")
+        admin = self.create_user("admin", is_staff=True)
+        self.client.force_authenticate(admin)
+        stats = self.get("/api/recipes/cache_stats/").data
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
@@ -0,0 +1,127 @@
+from recipes.models import IngredientsInRecipe, Recipe
+
+from .base import FoodgramTestCase, make_image
+
+
+class RecipeCardTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_temp_media()
+        self.author = self.create_user("author")
+        self.client.force_authenticate(self.author)
+        self.breakfast = self.create_tag("breakfast")
+        self.dinner = self.create_tag("dinner")
+        self.eggs = self.create_ingredient("Яйца", "шт")
+        self.milk = self.create_ingredient("Молоко", "мл")
+
+    def payload(self, **overrides):
+        data = {
+            "name": "Омлет",
+            "text": "Взбить и пожарить",
+            "cooking_time": 10,
+            "image": make_image(),
+            "tags": [self.breakfast.pk],
+            "ingredients": [
+                {"id": self.eggs.pk, "amount": 3},
+                {"id": self.milk.pk, "amount": 50},
+            ],
+        }
+        data.update(overrides)
+        return data
+
+    def create(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/recipes/", self.payload(), format="json"
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        return Recipe.objects.get(pk=response.data["id"])
+
+    def card(self, recipe):
+        recipe.refresh_from_db(fields=["card"])
+        return recipe.card
+
+    def amounts(self, recipe):
+        return {
+            item["name"]: item["amount"]
+            for item in self.card(recipe)["ingredients"]
+        }
+
+    def test_card_is_built_on_create(self):
+        recipe = self.create()
+        card = self.card(recipe)
+        self.assertEqual(card["name"], "Омлет")
+        self.assertEqual([tag["slug"] for tag in card["tags"]], ["breakfast"])
+        self.assertEqual(self.amounts(recipe), {"Яйца": 3, "Молоко": 50})
+
+    def test_card_is_refreshed_on_update(self):
+        recipe = self.create()
+        payload = self.payload(
+            name="Омлет с молоком",
+            tags=[self.dinner.pk],
+            ingredients=[{"id": self.milk.pk, "amount": 100}],
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/recipes/{recipe.pk}/", payload, format="json"
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["name"], "Омлет с молоком")
+        card = self.card(recipe)
+        self.assertEqual(card["name"], "Омлет с молоком")
+        self.assertEqual([tag["slug"] for tag in card["tags"]], ["dinner"])
+        self.assertEqual(self.amounts(recipe), {"Молоко": 100})
+
+    def test_card_follows_model_changes(self):
+        # Так рецепт меняется в админке: обычными save() и delete().
+        recipe = self.create()
+        row = IngredientsInRecipe.objects.get(
+            recipe=recipe, ingredient=self.eggs
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            row.amount = 4
+            row.save()
+        self.assertEqual(self.amounts(recipe), {"Яйца": 4, "Молоко": 50})
+        with self.captureOnCommitCallbacks(execute=True):
+            row.delete()
+        self.assertEqual(self.amounts(recipe), {"Молоко": 50})
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(self.dinner)
+        self.assertEqual(len(self.card(recipe)["tags"]), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dinner.recipes.clear()
+        self.assertEqual(len(self.card(recipe)["tags"]), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.cooking_time = 25
+            recipe.save()
+        self.assertEqual(self.card(recipe)["cooking_time"], 25)
+
+    def test_card_follows_catalog_changes(self):
+        recipe = self.create()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.eggs.name = "Яйца куриные"
+            self.eggs.save()
+            self.breakfast.name = "Завтраки"
+            self.breakfast.save()
+        self.assertIn("Яйца куриные", self.amounts(recipe))
+        self.assertEqual(self.card(recipe)["tags"][0]["name"], "Завтраки")
+
+    def test_list_is_served_from_cards(self):
+        recipe = self.create()
+        card = dict(self.card(recipe), name="Из карточки")
+        Recipe.objects.filter(pk=recipe.pk).update(card=card)
+        response = self.client.get("/api/recipes/")
+        self.assertEqual(response.data["results"][0]["name"], "Из карточки")
+        self.assertTrue(response.data["results"][0]["author"]["username"])
+
+    def test_rolled_back_changes_keep_card(self):
+        recipe = self.create()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.patch(
+                f"/api/recipes/{recipe.pk}/",
+                self.payload(ingredients=[]),
+                format="json",
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.card(recipe)["name"], "Омлет")
@@ -0,0 +1,92 @@
+import time
+from unittest import mock
+
+from django.db.models import F
+
+from api.catalog import catalog_snapshots
+from recipes.models import CatalogVersion, Ingredient
+
+from .base import FoodgramTestCase
+
+
+class CatalogSnapshotTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tag = self.create_tag("breakfast")
+        self.salt = self.create_ingredient("Соль")
+
+    def test_tags(self):
+        response = self.client.get("/api/tags/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    "id": self.tag.pk,
+                    "name": "Breakfast",
+                    "slug": "breakfast",
+                    "color": self.tag.color,
+                }
+            ],
+        )
+        self.assertTrue(response["ETag"])
+
+    def test_not_modified(self):
+        for url in ("/api/tags/", "/api/ingredients/"):
+            etag = self.client.get(url)["ETag"]
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response["ETag"], etag)
+            self.assertEqual(response.content, b"")
+
+    def test_tag_change_bumps_version(self):
+        etag = self.client.get("/api/tags/")["ETag"]
+        version = CatalogVersion.get(CatalogVersion.TAGS)
+        self.tag.name = "Завтрак"
+        self.tag.save()
+        self.assertEqual(CatalogVersion.get(CatalogVersion.TAGS), version + 1)
+        response = self.client.get("/api/tags/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()[0]["name"], "Завтрак")
+
+    def test_ingredient_changes_bump_version(self):
+        etag = self.client.get("/api/ingredients/")["ETag"]
+        pepper = self.create_ingredient("Перец")
+        response = self.client.get("/api/ingredients/")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()), 2)
+        etag = response["ETag"]
+        pepper.delete()
+        response = self.client.get("/api/ingredients/")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()), 1)
+
+    def test_snapshots_depend_on_query(self):
+        self.create_ingredient("Сахар")
+        all_items = self.client.get("/api/ingredients/")
+        filtered = self.client.get("/api/ingredients/", {"name": "сах"})
+        self.assertNotEqual(all_items["ETag"], filtered["ETag"])
+        self.assertEqual(
+            [item["name"] for item in filtered.json()], ["Сахар"]
+        )
+
+    def test_version_is_cached_between_keystrokes(self):
+        self.client.get("/api/ingredients/", {"name": "с"})
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/ingredients/", {"name": "со"})
+        self.assertEqual(response.json()[0]["name"], "Соль")
+
+    def test_changes_from_other_processes_are_seen_after_ttl(self):
+        etag = self.client.get("/api/ingredients/")["ETag"]
+        # Другой процесс меняет справочник: сигналы здесь не приходят.
+        Ingredient.objects.bulk_create([Ingredient(name="Перец")])
+        CatalogVersion.objects.filter(
+            catalog=CatalogVersion.INGREDIENTS
+        ).update(version=F("version") + 1)
+        self.assertEqual(self.client.get("/api/ingredients/")["ETag"], etag)
+        later = time.monotonic() + catalog_snapshots.version_ttl + 1
+        with mock.patch("api.catalog.time.monotonic", return_value=later):
+            response = self.client.get("/api/ingredients/")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()), 2)
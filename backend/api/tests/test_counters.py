@@ -0,0 +1,97 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe, User
+
+from .base import FoodgramTestCase
+
+
+class CountersTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user("author")
+        self.reader = self.create_user("reader")
+        self.recipe = self.create_recipe(self.author)
+
+    def test_user_lists_change_counters(self):
+        Favorite.objects.add(self.reader, [self.recipe.pk])
+        ShoppingCart.objects.add(self.reader, [self.recipe.pk])
+        ShoppingCart.objects.add(self.author, [self.recipe.pk])
+        Favorite.objects.remove(self.reader, [self.recipe.pk])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+        self.assertEqual(self.recipe.shopping_cart_count, 2)
+
+    def test_subscriptions_change_counters(self):
+        Subscribe.objects.create(user=self.reader, author=self.author)
+        self.author.refresh_from_db()
+        self.reader.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertEqual(self.reader.following_count, 1)
+        Subscribe.objects.filter(user=self.reader).delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+
+    def test_full_save_keeps_recipe_counters(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        Favorite.objects.add(self.reader, [self.recipe.pk])
+        stale.name = "Новое название"
+        stale.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, "Новое название")
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_full_save_keeps_worker_image(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(image="recipes/a.jpg")
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        variants = {"source": "recipes/b.jpg", "jpeg": {}}
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image="recipes/b.jpg", image_variants=variants
+        )
+        stale.text = "Другое описание"
+        stale.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, "recipes/b.jpg")
+        self.assertEqual(self.recipe.image_variants, variants)
+
+        stale.image = "recipes/c.jpg"
+        stale.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, "recipes/c.jpg")
+
+    def test_set_password_keeps_user_counters(self):
+        stale = User.objects.get(pk=self.author.pk)
+        User.objects.filter(pk=self.author.pk).update(
+            followers_count=F("followers_count") + 5
+        )
+        self.client.force_authenticate(stale)
+        response = self.client.post(
+            "/api/users/set_password/",
+            {
+                "current_password": "Pa55-word-42",
+                "new_password": "N3w-pa55-word",
+            },
+        )
+        self.assertEqual(response.status_code, 204)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 5)
+        self.assertTrue(self.author.check_password("N3w-pa55-word"))
+
+    def test_reconcile_counters(self):
+        Favorite.objects.add(self.reader, [self.recipe.pk])
+        Subscribe.objects.create(user=self.reader, author=self.author)
+        out = StringIO()
+        call_command("reconcile_counters", "--check", stdout=out)
+        self.assertIn("Расхождений найдено: 0", out.getvalue())
+
+        Recipe.objects.update(favorites_count=7)
+        User.objects.update(recipes_count=0)
+        call_command("reconcile_counters", stdout=StringIO())
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(self.author.recipes_count, 1)
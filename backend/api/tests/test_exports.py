@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+import os
+from unittest import skipUnless
+
+from fontTools.ttLib import TTFont
+from pypdf import PdfReader
+
+from django.conf import settings
+
+from .base import FoodgramTestCase
+
+URL = "/api/recipes/download_shopping_cart/"
+
+
+class ShoppingListExportTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("buyer")
+        self.client.force_authenticate(self.user)
+        potato = self.create_ingredient("Картофель", "г")
+        salt = self.create_ingredient("Соль", "щепотка")
+        milk = self.create_ingredient("Молоко", "мл")
+        first = self.create_recipe(
+            self.user, "Пюре", ingredients={potato: 500, milk: 100, salt: 1}
+        )
+        second = self.create_recipe(
+            self.user, "Драники", ingredients={potato: 300, salt: 2}
+        )
+        for recipe in (first, second):
+            self.client.post(f"/api/recipes/{recipe.pk}/shopping_cart/")
+
+    def download(self, fmt):
+        response = self.client.get(URL, {"format": fmt})
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_txt(self):
+        lines = self.download("txt").decode().splitlines()
+        self.assertEqual(
+            lines[2:],
+            [
+                "Картофель (г) - 800",
+                "Молоко (мл) - 100",
+                "Соль (щепотка) - 3",
+            ],
+        )
+
+    def test_csv(self):
+        content = self.download("csv").decode("utf-8-sig")
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(
+            rows[0], ["Ингредиент", "Единица измерения", "Количество"]
+        )
+        self.assertEqual(rows[1], ["Картофель", "г", "800"])
+        self.assertEqual(len(rows), 4)
+
+    def test_json(self):
+        data = json.loads(self.download("json"))
+        self.assertEqual(
+            [item["name"] for item in data["items"]],
+            ["Картофель", "Молоко", "Соль"],
+        )
+        self.assertEqual(
+            data["items"][0]["amounts"],
+            [{"measurement_unit": "г", "amount": 800}],
+        )
+
+    def test_empty_cart(self):
+        self.client.force_authenticate(self.create_user("empty"))
+        response = self.client.get(URL, {"format": "txt"})
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(
+    os.path.exists(settings.SHOPPING_LIST_FONT), "Нет шрифта для PDF."
+)
+class ShoppingListPDFTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("buyer")
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self, count):
+        ingredients = {
+            self.create_ingredient(f"Ингредиент №{index:03d}", "г"): index + 1
+            for index in range(count)
+        }
+        recipe = self.create_recipe(self.user, ingredients=ingredients)
+        self.client.post(f"/api/recipes/{recipe.pk}/shopping_cart/")
+
+    def download(self):
+        response = self.client.get(URL, {"format": "pdf"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        return b"".join(response.streaming_content)
+
+    def test_cyrillic_text(self):
+        self.fill_cart(3)
+        reader = PdfReader(io.BytesIO(self.download()))
+        text = reader.pages[0].extract_text()
+        self.assertIn("Список покупок Buyer Тестов:", text)
+        for index in range(3):
+            self.assertIn(f"Ингредиент №{index:03d} (г) - {index + 1}", text)
+
+    def test_many_pages(self):
+        self.fill_cart(120)
+        reader = PdfReader(io.BytesIO(self.download()))
+        self.assertGreater(len(reader.pages), 2)
+        text = "".join(page.extract_text() for page in reader.pages)
+        self.assertIn("Ингредиент №119 (г) - 120", text)
+
+    def test_font_is_subset(self):
+        self.fill_cart(3)
+        reader = PdfReader(io.BytesIO(self.download()))
+        font = reader.pages[0]["/Resources"]["/Font"]["/F1"]
+        descendant = font["/DescendantFonts"][0].get_object()
+        descriptor = descendant["/FontDescriptor"]
+        self.assertRegex(font["/BaseFont"], r"^/[A-Z]{6}\+")
+        data = descriptor["/FontFile2"].get_data()
+        self.assertLess(
+            len(data), os.path.getsize(settings.SHOPPING_LIST_FONT) // 5
+        )
+        # Номера глифов сохраняются, пустыми остаются неиспользованные.
+        embedded = TTFont(io.BytesIO(data))
+        original = TTFont(settings.SHOPPING_LIST_FONT)
+        cmap = original.getBestCmap()
+
+        def contours(char):
+            glyph_id = original.getGlyphID(cmap[ord(char)])
+            name = embedded.getGlyphOrder()[glyph_id]
+            return embedded["glyf"][name].numberOfContours
+
+        for char in "Ингредиент":
+            self.assertNotEqual(contours(char), 0)
+        self.assertEqual(contours("Ж"), 0)
@@ -0,0 +1,132 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+
+from api.feed import fan_out_recipe
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscribe
+
+from .base import FoodgramTestCase
+
+URL = "/api/recipes/feed/"
+
+
+class FeedTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reader = self.create_user("reader")
+        self.author = self.create_user("author")
+        self.stranger = self.create_user("stranger")
+        self.client.force_authenticate(self.reader)
+
+    def publish(self, author, name, hours_ago=0):
+        recipe = self.create_recipe(author, name)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            pub_date=timezone.now() - timedelta(hours=hours_ago)
+        )
+        # Раскладка берёт дату публикации из базы.
+        self.run_jobs()
+        return recipe
+
+    def subscribe(self, author):
+        response = self.client.post(f"/api/users/{author.pk}/subscribe/")
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def feed(self, url=URL):
+        """Имена рецептов ленты по всем страницам."""
+        names = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            names += [item["name"] for item in response.data["results"]]
+            url = response.data["next"]
+        return names
+
+    def entries(self, user=None):
+        return set(
+            FeedEntry.objects.filter(user=user or self.reader).values_list(
+                "recipe__name", flat=True
+            )
+        )
+
+    def test_new_recipe_is_fanned_out(self):
+        self.subscribe(self.author)
+        self.publish(self.author, "Щи")
+        self.publish(self.stranger, "Борщ")
+        self.assertEqual(self.entries(), {"Щи"})
+        self.assertEqual(self.feed(), ["Щи"])
+
+    def test_follow_adds_existing_recipes(self):
+        self.publish(self.author, "Щи", hours_ago=2)
+        self.publish(self.author, "Каша", hours_ago=1)
+        self.publish(self.stranger, "Борщ")
+        self.assertEqual(self.feed(), [])
+        self.subscribe(self.author)
+        self.assertEqual(self.feed(), ["Каша", "Щи"])
+
+    def test_unsubscribe_removes_recipes(self):
+        self.subscribe(self.author)
+        self.subscribe(self.stranger)
+        self.publish(self.author, "Щи")
+        self.publish(self.stranger, "Борщ")
+        response = self.client.delete(
+            f"/api/users/{self.author.pk}/subscribe/"
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.feed(), ["Борщ"])
+
+    def test_deleted_recipe_leaves_feed(self):
+        self.subscribe(self.author)
+        recipe = self.publish(self.author, "Щи")
+        recipe.delete()
+        self.assertEqual(self.entries(), set())
+        self.assertEqual(self.feed(), [])
+
+    def test_fan_out_is_idempotent(self):
+        self.subscribe(self.author)
+        other = self.create_user("other")
+        Subscribe.objects.create(user=other, author=self.author)
+        recipe = self.publish(self.author, "Щи")
+        self.assertEqual(fan_out_recipe(recipe.pk, batch_size=1), 2)
+        self.assertEqual(FeedEntry.objects.count(), 2)
+        self.assertEqual(self.entries(other), {"Щи"})
+
+    def test_cursor_pages(self):
+        self.subscribe(self.author)
+        for index in range(5):
+            self.publish(self.author, f"Рецепт {index}", hours_ago=index)
+        response = self.client.get(URL, {"limit": 2})
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+        self.assertEqual(
+            self.feed(f"{URL}?limit=2"),
+            [f"Рецепт {index}" for index in range(5)],
+        )
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(URL).status_code, 401)
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_large_author_is_merged_on_read(self):
+        self.subscribe(self.author)
+        self.subscribe(self.stranger)
+        Subscribe.objects.create(
+            user=self.create_user("fan"), author=self.author
+        )
+        self.publish(self.author, "Щи", hours_ago=3)
+        self.publish(self.stranger, "Борщ", hours_ago=2)
+        self.publish(self.author, "Каша", hours_ago=1)
+        self.assertEqual(self.entries(), {"Борщ"})
+        self.assertEqual(self.feed(f"{URL}?limit=1"), ["Каша", "Борщ", "Щи"])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_author_becoming_large_is_not_duplicated(self):
+        self.subscribe(self.author)
+        self.publish(self.author, "Щи")
+        self.assertEqual(self.entries(), {"Щи"})
+        Subscribe.objects.create(
+            user=self.create_user("fan"), author=self.author
+        )
+        self.assertEqual(self.feed(), ["Щи"])
@@ -0,0 +1,190 @@
+import os
+from unittest import mock
+
+from PIL import Image
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from api.images import (
+    check_upload, get_formats, load_image, needs_processing,
+    process_recipe_image,
+)
+from recipes.models import Recipe
+
+from .base import FoodgramTestCase, image_bytes, make_image
+
+
+class RecipeImageTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = self.use_temp_media()
+        self.author = self.create_user("author")
+        self.client.force_authenticate(self.author)
+        self.tag = self.create_tag("breakfast")
+        self.eggs = self.create_ingredient("Яйца", "шт")
+
+    def create(self, image):
+        payload = {
+            "name": "Омлет",
+            "text": "Взбить и пожарить",
+            "cooking_time": 10,
+            "image": image,
+            "tags": [self.tag.pk],
+            "ingredients": [{"id": self.eggs.pk, "amount": 3}],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/recipes/", payload, format="json"
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        return Recipe.objects.get(pk=response.data["id"])
+
+    def media_files(self):
+        return {
+            os.path.relpath(os.path.join(root, name), self.media)
+            for root, _, names in os.walk(self.media)
+            for name in names
+        }
+
+    def test_variants_are_built_in_background(self):
+        recipe = self.create(make_image((800, 600)))
+        self.assertTrue(needs_processing(recipe))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_jobs()
+        recipe.refresh_from_db()
+        self.assertFalse(needs_processing(recipe))
+        variants = recipe.image_variants
+        self.assertEqual(variants["source"], recipe.image.name)
+        self.assertTrue(recipe.image.name.endswith(".jpg"))
+        self.assertEqual(set(variants) - {"source"}, set(get_formats()))
+        self.assertEqual(set(variants["jpeg"]), {"320", "640", "800"})
+        with recipe.image.storage.open(variants["jpeg"]["320"]) as file:
+            self.assertEqual(Image.open(file).size, (320, 240))
+
+        response = self.client.get(f"/api/recipes/{recipe.pk}/")
+        url = response.data["image_variants"]["jpeg"]["640"]
+        self.assertTrue(url.startswith("http://testserver/"))
+        self.assertTrue(url.endswith(variants["jpeg"]["640"]))
+
+    def test_small_image_is_not_upscaled(self):
+        recipe = self.create(make_image((100, 50)))
+        self.assertTrue(process_recipe_image(recipe.pk))
+        recipe.refresh_from_db()
+        self.assertEqual(list(recipe.image_variants["jpeg"]), ["100"])
+
+    def test_transparency_is_flattened(self):
+        data = image_bytes((40, 40), (0, 0, 0, 0), mode="RGBA")
+        recipe = self.create(make_image())
+        with recipe.image.storage.open(recipe.image.name, "wb") as file:
+            file.write(data)
+        self.assertTrue(process_recipe_image(recipe.pk))
+        recipe.refresh_from_db()
+        with recipe.image.open() as file:
+            image = Image.open(file)
+            self.assertEqual(image.mode, "RGB")
+            self.assertEqual(image.getpixel((0, 0)), (255, 255, 255))
+
+    def test_replaced_image_removes_old_files(self):
+        recipe = self.create(make_image((400, 300)))
+        process_recipe_image(recipe.pk)
+        recipe.refresh_from_db()
+        old_files = self.media_files()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/recipes/{recipe.pk}/",
+                {"image": make_image((400, 300), "blue")},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.run_jobs()
+        self.assertEqual(self.media_files() & old_files, set())
+        recipe.refresh_from_db()
+        self.assertEqual(
+            self.media_files(),
+            {recipe.image.name}
+            | {
+                name
+                for fmt in get_formats()
+                for name in recipe.image_variants[fmt].values()
+            },
+        )
+
+    def test_image_changed_during_processing(self):
+        recipe = self.create(make_image((400, 300)))
+        before = self.media_files()
+        with mock.patch(
+            "api.images.load_image",
+            side_effect=self.replace_image(recipe),
+        ):
+            self.assertFalse(process_recipe_image(recipe.pk))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, "recipes/replaced.png")
+        self.assertIsNone(recipe.image_variants)
+        self.assertEqual(self.media_files(), before)
+
+    def replace_image(self, recipe):
+        def load(storage, name):
+            image = load_image(storage, name)
+            Recipe.objects.filter(pk=recipe.pk).update(
+                image="recipes/replaced.png"
+            )
+            return image
+
+        return load
+
+    def test_unreadable_image_is_skipped(self):
+        recipe = self.create(make_image())
+        with recipe.image.storage.open(recipe.image.name, "wb") as file:
+            file.write(b"not an image")
+        self.assertFalse(process_recipe_image(recipe.pk))
+
+
+class CheckUploadTests(FoodgramTestCase):
+    def upload(self, size=(40, 30)):
+        return SimpleUploadedFile(
+            "image.png", image_bytes(size), content_type="image/png"
+        )
+
+    def test_valid_image(self):
+        file = self.upload()
+        self.assertIsNone(check_upload(file))
+        self.assertEqual(file.tell(), 0)
+
+    def test_too_many_pixels(self):
+        with mock.patch("api.images.MAX_UPLOAD_PIXELS", 1000):
+            self.assertIn("Разрешение", check_upload(self.upload()))
+            self.assertIsNone(check_upload(self.upload((20, 20))))
+
+    def test_too_many_bytes(self):
+        with mock.patch("api.images.MAX_UPLOAD_BYTES", 10):
+            self.assertIn("Размер", check_upload(self.upload()))
+
+    def test_not_an_image(self):
+        file = SimpleUploadedFile("image.png", b"text")
+        self.assertIsNone(check_upload(file))
+
+    def test_large_image_is_rejected_by_api(self):
+        user = self.create_user("author")
+        self.client.force_authenticate(user)
+        payload = {
+            "name": "Омлет",
+            "text": "Взбить",
+            "cooking_time": 10,
+            "image": make_image((40, 30)),
+            "tags": [self.create_tag("breakfast").pk],
+            "ingredients": [
+                {"id": self.create_ingredient("Яйца").pk, "amount": 1}
+            ],
+        }
+        with mock.patch("api.images.MAX_UPLOAD_PIXELS", 1000):
+            response = self.client.post(
+                "/api/recipes/", payload, format="json"
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("image", response.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_decompression_bomb(self):
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 100):
+            self.assertIn("Разрешение", check_upload(self.upload()))
@@ -0,0 +1,164 @@
+import json
+import os
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError
+
+from api.importers import RecipeImporter
+from jobs.models import Job
+from recipes.models import Recipe
+
+from .base import FoodgramTestCase, make_image
+
+URL = "/api/recipes/import/"
+
+
+class ImportTestCase(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = self.use_temp_media()
+        self.admin = self.create_user("admin", is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.tag = self.create_tag("dinner")
+        self.ingredient = self.create_ingredient("Рис")
+
+    def make_line(self, name, **overrides):
+        data = {
+            "name": name,
+            "text": "Описание",
+            "cooking_time": 15,
+            "image": make_image(),
+            "tags": [self.tag.pk],
+            "ingredients": [{"id": self.ingredient.pk, "amount": 200}],
+        }
+        data.update(overrides)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class RecipeImportTests(ImportTestCase):
+    def upload(self, lines, **params):
+        body = "\n".join(lines).encode()
+        query = "&".join(f"{key}={value}" for key, value in params.items())
+        return self.client.post(
+            f"{URL}?{query}", body, content_type="application/x-ndjson"
+        )
+
+    def media_files(self):
+        return [
+            os.path.join(root, name)
+            for root, _, names in os.walk(self.media)
+            for name in names
+        ]
+
+    def test_import_is_queued(self):
+        response = self.upload(
+            [self.make_line("Плов"), "{", self.make_line("Ризотто")]
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], Job.QUEUED)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(len(self.media_files()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_jobs()
+        status = self.client.get(response["Location"])
+        self.assertEqual(status.status_code, 200)
+        self.assertEqual(status.data["status"], Job.DONE)
+        result = status.data["result"]
+        self.assertEqual(result["read"], 3)
+        self.assertEqual(result["imported"], 2)
+        self.assertEqual(result["errors"][0]["line"], 2)
+        self.assertEqual(
+            set(Recipe.objects.values_list("name", flat=True)),
+            {"Плов", "Ризотто"},
+        )
+        self.admin.refresh_from_db()
+        self.assertEqual(self.admin.recipes_count, 2)
+        # Загруженный файл удалён, остались изображения рецептов.
+        self.assertTrue(
+            all("imports" not in path for path in self.media_files())
+        )
+
+    def test_import_from_line(self):
+        self.upload(
+            [self.make_line("Плов"), self.make_line("Ризотто")], start=1
+        )
+        self.run_jobs()
+        self.assertEqual(
+            list(Recipe.objects.values_list("name", flat=True)), ["Ризотто"]
+        )
+
+    def test_import_requires_admin(self):
+        self.client.force_authenticate(self.create_user("cook"))
+        response = self.upload([self.make_line("Плов")])
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Job.objects.exists())
+
+    def test_invalid_start(self):
+        response = self.upload([self.make_line("Плов")], start="x")
+        self.assertEqual(response.status_code, 400)
+
+    def test_status_of_other_admin_import(self):
+        response = self.upload([self.make_line("Плов")])
+        self.client.force_authenticate(
+            self.create_user("other", is_staff=True)
+        )
+        self.assertEqual(
+            self.client.get(response["Location"]).status_code, 404
+        )
+
+    def test_images_are_deleted_when_batch_fails(self):
+        lines = [self.make_line("Плов"), self.make_line("Ризотто")]
+        importer = RecipeImporter(self.admin)
+        with mock.patch.object(
+            RecipeImporter, "save_batch", side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                importer.run(lines)
+        self.assertEqual(self.media_files(), [])
+        self.assertFalse(Recipe.objects.exists())
+
+
+class ImportRecipesCommandTests(ImportTestCase):
+    def write(self, lines):
+        path = os.path.join(self.media, "recipes.ndjson")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        return path
+
+    def call(self, path, *args):
+        out = StringIO()
+        call_command(
+            "import_recipes",
+            path,
+            "--author",
+            self.admin.email,
+            "--batch-size",
+            "1",
+            *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_checkpoint_and_resume(self):
+        path = self.write([self.make_line("Плов"), self.make_line("Ризотто")])
+        output = self.call(path)
+        self.assertIn("импортировано 2", output)
+        with open(f"{path}.checkpoint", encoding="utf-8") as file:
+            self.assertEqual(json.load(file), {"last_line": 2})
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(self.make_line("Каша") + "\n")
+        self.call(path, "--resume")
+        self.assertEqual(
+            sorted(Recipe.objects.values_list("name", flat=True)),
+            ["Каша", "Плов", "Ризотто"],
+        )
+
+    def test_errors_file(self):
+        path = self.write([self.make_line("Плов"), "[]"])
+        errors = os.path.join(self.media, "errors.ndjson")
+        self.call(path, "--errors", errors)
+        with open(errors, encoding="utf-8") as file:
+            self.assertEqual(json.loads(file.readline())["line"], 2)
@@ -0,0 +1,71 @@
+from api.search import ingredient_index
+
+from .base import FoodgramTestCase
+
+
+class IngredientSearchTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user("author")
+        self.rare = self.create_ingredient("Мука ржаная")
+        self.popular = self.create_ingredient("Мука пшеничная")
+        self.milk = self.create_ingredient("Молоко")
+        self.hedgehog = self.create_ingredient("Ёжевика")
+        for index in range(3):
+            self.create_recipe(
+                self.author,
+                f"Блины {index}",
+                ingredients={self.popular: 200, self.milk: 300},
+            )
+
+    def search(self, **params):
+        response = self.client.get("/api/ingredients/", params)
+        self.assertEqual(response.status_code, 200)
+        return [item["name"] for item in response.json()]
+
+    def test_prefix_ranked_by_popularity(self):
+        self.assertEqual(
+            self.search(name="мук"), ["Мука пшеничная", "Мука ржаная"]
+        )
+
+    def test_case_and_yo_are_ignored(self):
+        self.assertEqual(self.search(name="МУКА Р"), ["Мука ржаная"])
+        self.assertEqual(self.search(name="еж"), ["Ёжевика"])
+        self.assertEqual(self.search(name="Ёж"), ["Ёжевика"])
+
+    def test_limit(self):
+        # При равной популярности порядок - по названию.
+        self.assertEqual(
+            self.search(name="м", limit=2), ["Молоко", "Мука пшеничная"]
+        )
+
+    def test_no_matches(self):
+        self.assertEqual(self.search(name="соль"), [])
+
+    def test_without_name(self):
+        self.assertEqual(len(self.search()), 4)
+
+    def test_payload(self):
+        response = self.client.get("/api/ingredients/", {"name": "мол"})
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    "id": self.milk.pk,
+                    "name": "Молоко",
+                    "measurement_unit": "г",
+                }
+            ],
+        )
+
+    def test_index_follows_catalog_changes(self):
+        self.search(name="мук")
+        self.create_ingredient("Мускатный орех")
+        self.assertIn("Мускатный орех", self.search(name="му"))
+        self.rare.delete()
+        self.assertNotIn("Мука ржаная", self.search(name="му"))
+
+    def test_index_is_reused(self):
+        ingredient_index.search("мук")
+        with self.assertNumQueries(0):
+            ingredient_index.search("мол")
@@ -0,0 +1,100 @@
+import json
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from api.parsers import LimitedUploadHandler
+from recipes.models import Recipe
+
+from .base import FoodgramTestCase, image_bytes
+
+URL = "/api/recipes/"
+
+
+class RecipeMultipartTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_temp_media()
+        self.author = self.create_user("author")
+        self.client.force_authenticate(self.author)
+        self.tag = self.create_tag("breakfast")
+        self.eggs = self.create_ingredient("Яйца", "шт")
+
+    def payload(self, **overrides):
+        data = {
+            "name": "Омлет",
+            "text": "Взбить и пожарить",
+            "cooking_time": 10,
+            "tags": [self.tag.pk],
+            "ingredients": [{"id": self.eggs.pk, "amount": 3}],
+        }
+        data.update(overrides)
+        return data
+
+    def image(self, size=(40, 30)):
+        return SimpleUploadedFile(
+            "photo.png", image_bytes(size), content_type="image/png"
+        )
+
+    def post(self, url=URL, method="post", **parts):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url, parts, format="multipart")
+
+    def test_create_with_file(self):
+        response = self.post(
+            data=json.dumps(self.payload()), image=self.image()
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get(pk=response.data["id"])
+        self.assertEqual(recipe.ingredients.get().pk, self.eggs.pk)
+        with recipe.image.open() as file:
+            self.assertEqual(file.read(), image_bytes((40, 30)))
+
+    def test_update_image_only(self):
+        recipe = self.create_recipe(self.author, ingredients={self.eggs: 1})
+        recipe.tags.add(self.tag)
+        response = self.post(
+            f"{URL}{recipe.pk}/",
+            method="patch",
+            data=json.dumps({}),
+            image=self.image((20, 20)),
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        recipe.refresh_from_db()
+        with recipe.image.open() as file:
+            self.assertEqual(file.read(), image_bytes((20, 20)))
+
+    def test_missing_image(self):
+        response = self.post(data=json.dumps(self.payload()))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("image", response.data)
+
+    def test_invalid_json(self):
+        response = self.post(data="{", image=self.image())
+        self.assertEqual(response.status_code, 400)
+        response = self.post(data="[]", image=self.image())
+        self.assertEqual(response.status_code, 400)
+
+    def test_file_is_not_an_image(self):
+        response = self.post(
+            data=json.dumps(self.payload()),
+            image=SimpleUploadedFile("photo.png", b"text"),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("image", response.data)
+
+    def test_file_too_large(self):
+        with mock.patch.object(LimitedUploadHandler, "max_size", 50):
+            response = self.post(
+                data=json.dumps(self.payload()), image=self.image()
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_resolution_too_large(self):
+        with mock.patch("api.images.MAX_UPLOAD_PIXELS", 1000):
+            response = self.post(
+                data=json.dumps(self.payload()), image=self.image()
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("image", response.data)
@@ -0,0 +1,229 @@
+import base64
+import json
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.utils import timezone
+
+from api.pagination import PageLimitPagination
+from recipes.models import Recipe
+
+from .base import FoodgramTestCase
+
+
+def make_cursor(position, reverse=False):
+    payload = json.dumps({"p": position, "r": reverse}).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+class CursorPaginationTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user("author")
+        self.other = self.create_user("other")
+        self.tag = self.create_tag("breakfast")
+        now = timezone.now()
+        self.recipes = []
+        for index in range(7):
+            recipe = self.create_recipe(
+                self.author if index % 2 else self.other,
+                f"Рецепт {index}",
+                tags=[self.tag] if index % 3 else [],
+            )
+            self.recipes.append(recipe)
+        # Два рецепта с одинаковой датой проверяют сортировку по id.
+        for index, recipe in enumerate(self.recipes):
+            pub_date = now - timedelta(hours=min(index, 5))
+            Recipe.objects.filter(pk=recipe.pk).update(pub_date=pub_date)
+        self.client.force_authenticate(self.author)
+
+    def expected(self, **filters):
+        return list(
+            Recipe.objects.filter(**filters)
+            .order_by("-pub_date", "-id")
+            .values_list("pk", flat=True)
+        )
+
+    def walk(self, url):
+        """Идёт по ссылкам next и возвращает id и ответы страниц."""
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertNotIn("count", response.data)
+            ids += [item["id"] for item in response.data["results"]]
+            pages.append(response)
+            url = response.data["next"]
+        return ids, pages
+
+    def test_cursor_walks_all_recipes_in_order(self):
+        ids, pages = self.walk("/api/recipes/?cursor=&limit=3")
+        self.assertEqual(ids, self.expected())
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0].data["previous"])
+
+    def test_previous_link_returns_previous_page(self):
+        _, pages = self.walk("/api/recipes/?cursor=&limit=3")
+        response = self.client.get(pages[2].data["previous"])
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [item["id"] for item in pages[1].data["results"]],
+        )
+
+    def test_cursor_with_filters(self):
+        ids, _ = self.walk(
+            f"/api/recipes/?cursor=&limit=2&tags=breakfast"
+            f"&author={self.author.pk}"
+        )
+        self.assertEqual(
+            ids, self.expected(tags=self.tag, author=self.author)
+        )
+
+    def test_cursor_with_favorites_filter(self):
+        favorites = self.recipes[1:4]
+        for recipe in favorites:
+            self.client.post(f"/api/recipes/{recipe.pk}/favorite/")
+        ids, _ = self.walk("/api/recipes/?cursor=&limit=2&is_favorited=1")
+        self.assertEqual(ids, self.expected(favorites__user=self.author))
+
+    def test_page_links_do_not_carry_page_param(self):
+        response = self.client.get("/api/recipes/?cursor=&limit=3&page=2")
+        query = parse_qs(urlparse(response.data["next"]).query)
+        self.assertNotIn("page", query)
+
+    def test_page_number_contract_is_kept(self):
+        response = self.client.get("/api/recipes/?page=3&limit=3")
+        self.assertEqual(response.data["count"], 7)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNone(response.data["next"])
+
+    def test_limit_is_clamped(self):
+        for index in range(5):
+            self.create_recipe(self.author, f"Ещё рецепт {index}")
+        with mock.patch.object(PageLimitPagination, "max_page_size", 10):
+            response = self.client.get("/api/recipes/?limit=1000")
+            self.assertEqual(len(response.data["results"]), 10)
+            ids, pages = self.walk("/api/recipes/?cursor=&limit=1000")
+        self.assertEqual(len(pages[0].data["results"]), 10)
+        self.assertEqual(ids, self.expected())
+
+    def test_invalid_cursors_return_404(self):
+        pub_date = timezone.now().isoformat()
+        cursors = [
+            "не-base64",
+            base64.urlsafe_b64encode(b"[1, 2]").decode(),
+            make_cursor([pub_date]),
+            make_cursor([pub_date, "abc"]),
+            make_cursor([pub_date, [1]]),
+            make_cursor([pub_date, None]),
+            make_cursor([pub_date, 2**70]),
+            make_cursor(["вчера", 1]),
+            make_cursor([12, 1]),
+        ]
+        for cursor in cursors:
+            response = self.client.get("/api/recipes/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+    def test_invalid_trending_cursor_returns_404(self):
+        response = self.client.get(
+            "/api/recipes/",
+            {"ordering": "trending", "cursor": make_cursor(["x", 1])},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_subscriptions_cursor(self):
+        authors = [self.create_user(f"chef{index}") for index in range(5)]
+        for author in authors:
+            self.client.post(f"/api/users/{author.pk}/subscribe/")
+        ids, _ = self.walk("/api/users/subscriptions/?cursor=&limit=2")
+        self.assertEqual(ids, [author.pk for author in authors])
+        response = self.client.get(
+            "/api/users/subscriptions/", {"cursor": make_cursor(["x"])}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class CountModeTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user("author")
+        self.tag = self.create_tag("lunch")
+        for index in range(5):
+            self.create_recipe(
+                self.author,
+                f"Рецепт {index}",
+                tags=[self.tag] if index % 2 else [],
+            )
+
+    def test_countless_pages(self):
+        response = self.client.get("/api/recipes/?count=none&limit=2")
+        self.assertIsNone(response.data["count"])
+        self.assertEqual(len(response.data["results"]), 2)
+        ids = [item["id"] for item in response.data["results"]]
+        url = response.data["next"]
+        while url:
+            response = self.client.get(url)
+            self.assertIsNone(response.data["count"])
+            ids += [item["id"] for item in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_countless_last_page_returns_404(self):
+        response = self.client.get("/api/recipes/?count=none&page=last")
+        self.assertEqual(response.status_code, 404)
+
+    def test_countless_page_out_of_range_returns_404(self):
+        response = self.client.get("/api/recipes/?count=none&page=4&limit=2")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get("/api/recipes/?count=none&page=abc")
+        self.assertEqual(response.status_code, 404)
+
+    def test_exact_count_by_default(self):
+        # Ответы анонимам кешируются, подсчёт проверяется без кеша.
+        self.client.force_authenticate(self.author)
+        self.client.get("/api/recipes/?limit=2")
+        self.create_recipe(self.author, "Новый рецепт")
+        response = self.client.get("/api/recipes/?limit=2")
+        self.assertEqual(response.data["count"], 6)
+
+    def test_estimated_count_is_cached(self):
+        response = self.client.get("/api/recipes/?count=estimate&limit=2")
+        self.assertEqual(response.data["count"], 5)
+        self.create_recipe(self.author, "Новый рецепт")
+        response = self.client.get(
+            "/api/recipes/?count=estimate&limit=2&page=2"
+        )
+        self.assertEqual(response.data["count"], 5)
+
+    def test_filtered_count_is_never_estimated(self):
+        self.client.get("/api/recipes/?count=estimate")
+        self.create_recipe(self.author, "Новый рецепт", tags=[self.tag])
+        response = self.client.get(
+            "/api/recipes/", {"count": "estimate", "tags": "lunch"}
+        )
+        self.assertEqual(response.data["count"], 3)
+        response = self.client.get(
+            "/api/recipes/",
+            {"count": "estimate", "author": self.author.pk},
+        )
+        self.assertEqual(response.data["count"], 6)
+
+    def test_last_page_with_estimated_count(self):
+        response = self.client.get(
+            "/api/recipes/?count=estimate&limit=2&page=last"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_unknown_count_mode_is_ignored(self):
+        response = self.client.get("/api/recipes/?count=fast")
+        self.assertEqual(response.data["count"], 5)
+
+    def test_users_list_count(self):
+        self.create_user("reader")
+        response = self.client.get("/api/users/")
+        self.assertEqual(response.data["count"], 2)
+        response = self.client.get("/api/users/?count=none")
+        self.assertIsNone(response.data["count"])
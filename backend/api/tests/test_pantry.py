@@ -0,0 +1,156 @@
+from unittest import mock
+
+from api.pantry import pantry_index
+from recipes.models import CatalogVersion, IngredientsInRecipe
+
+from .base import FoodgramTestCase
+
+URL = "/api/recipes/pantry/"
+
+
+class PantrySearchTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        pantry_index.invalidate()
+        self.addCleanup(pantry_index.invalidate)
+        self.author = self.create_user("author")
+        self.dinner = self.create_tag("dinner")
+        self.breakfast = self.create_tag("breakfast")
+        self.eggs = self.create_ingredient("Яйца")
+        self.milk = self.create_ingredient("Молоко")
+        self.flour = self.create_ingredient("Мука")
+        self.sugar = self.create_ingredient("Сахар")
+        self.butter = self.create_ingredient("Масло")
+        self.omelette = self.create_recipe(
+            self.author,
+            "Омлет",
+            tags=[self.breakfast],
+            ingredients={self.eggs: 3, self.milk: 50},
+        )
+        self.pancakes = self.create_recipe(
+            self.author,
+            "Блины",
+            tags=[self.breakfast],
+            ingredients={self.eggs: 2, self.milk: 500, self.flour: 200},
+        )
+        self.cake = self.create_recipe(
+            self.author,
+            "Торт",
+            tags=[self.dinner],
+            ingredients={
+                self.eggs: 4,
+                self.flour: 300,
+                self.sugar: 200,
+                self.butter: 100,
+            },
+        )
+
+    def search(self, *ingredients, **params):
+        response = self.client.get(
+            URL,
+            {
+                "ingredients": ",".join(
+                    str(ingredient.pk) for ingredient in ingredients
+                ),
+                **params,
+            },
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return [
+            (item["name"], item["missing_ingredients"])
+            for item in response.data["results"]
+        ]
+
+    def test_covered_recipes_first(self):
+        self.assertEqual(
+            self.search(self.eggs, self.milk),
+            [("Омлет", 0), ("Блины", 1)],
+        )
+
+    def test_more_matches_rank_higher(self):
+        self.assertEqual(
+            self.search(self.eggs, self.flour, self.sugar),
+            [("Торт", 1), ("Блины", 1), ("Омлет", 1)],
+        )
+
+    def test_too_many_missing(self):
+        self.assertEqual(self.search(self.sugar), [])
+
+    def test_unknown_ingredient(self):
+        response = self.client.get(URL, {"ingredients": "999999"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"], [])
+
+    def test_tags_filter(self):
+        self.assertEqual(
+            self.search(self.eggs, self.flour, tags="dinner"), [("Торт", 2)]
+        )
+        response = self.client.get(
+            URL,
+            {
+                "ingredients": f"{self.eggs.pk},{self.milk.pk}",
+                "tags": ["dinner", "breakfast"],
+            },
+        )
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_repeated_params(self):
+        response = self.client.get(
+            f"{URL}?ingredients={self.eggs.pk}&ingredients={self.milk.pk}"
+        )
+        self.assertEqual(response.data["results"][0]["name"], "Омлет")
+
+    def test_invalid_ingredients(self):
+        for value in ("", "abc", f"{self.eggs.pk},x"):
+            response = self.client.get(URL, {"ingredients": value})
+            self.assertEqual(response.status_code, 400, value)
+        self.assertEqual(self.client.get(URL).status_code, 400)
+
+    def test_pagination(self):
+        response = self.client.get(
+            URL,
+            {
+                "ingredients": f"{self.eggs.pk},{self.flour.pk}",
+                "limit": 1,
+                "page": 2,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNotNone(response.data["next"])
+        self.assertIsNotNone(response.data["previous"])
+
+    def test_changes_are_applied_in_place(self):
+        self.search(self.eggs)
+        with mock.patch.object(pantry_index, "build") as build:
+            with self.captureOnCommitCallbacks(execute=True):
+                IngredientsInRecipe.objects.filter(
+                    recipe=self.pancakes, ingredient=self.flour
+                ).delete()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.cake.tags.add(self.breakfast)
+            with self.captureOnCommitCallbacks(execute=True):
+                tea = self.create_recipe(
+                    self.author, "Чай", tags=[self.breakfast]
+                )
+                IngredientsInRecipe.objects.create(
+                    recipe=tea, ingredient=self.sugar, amount=10
+                )
+            with self.captureOnCommitCallbacks(execute=True):
+                self.omelette.delete()
+            self.assertEqual(self.search(self.eggs, self.milk), [("Блины", 0)])
+            self.assertEqual(
+                self.search(self.sugar, tags="breakfast"), [("Чай", 0)]
+            )
+            self.assertEqual(
+                self.search(self.eggs, self.flour, self.sugar, self.butter),
+                [("Торт", 0), ("Чай", 0), ("Блины", 1)],
+            )
+        build.assert_not_called()
+
+    def test_other_process_changes_rebuild_index(self):
+        self.search(self.eggs)
+        # Изменение в другом процессе: версия сдвинута, индекс не тронут.
+        IngredientsInRecipe.objects.filter(recipe=self.omelette).delete()
+        CatalogVersion.bump(CatalogVersion.RECIPES)
+        self.assertEqual(self.search(self.eggs, self.milk), [("Блины", 1)])
@@ -0,0 +1,97 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import IngredientsInRecipe, Recipe
+
+from .base import FoodgramTestCase, make_image
+
+
+class RecipeCreateTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_temp_media()
+        self.author = self.create_user("author")
+        self.client.force_authenticate(self.author)
+        self.tags = [self.create_tag(slug) for slug in ("soup", "lunch")]
+        self.ingredients = [
+            self.create_ingredient(f"Продукт {index}") for index in range(12)
+        ]
+
+    def amounts(self, count):
+        return {
+            ingredient.pk: index + 1
+            for index, ingredient in enumerate(self.ingredients[:count])
+        }
+
+    def payload(self, count=2, **overrides):
+        data = {
+            "name": "Суп",
+            "text": "Сварить",
+            "cooking_time": 30,
+            "image": make_image(),
+            "tags": [tag.pk for tag in self.tags],
+            "ingredients": [
+                {"id": pk, "amount": amount}
+                for pk, amount in self.amounts(count).items()
+            ],
+        }
+        data.update(overrides)
+        return data
+
+    def post(self, data):
+        return self.client.post("/api/recipes/", data, format="json")
+
+    def test_create(self):
+        response = self.post(self.payload(count=3))
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get(pk=response.data["id"])
+        self.assertEqual(recipe.author, self.author)
+        self.assertEqual(
+            set(recipe.tags.values_list("slug", flat=True)), {"soup", "lunch"}
+        )
+        self.assertEqual(
+            dict(
+                IngredientsInRecipe.objects.filter(recipe=recipe).values_list(
+                    "ingredient_id", "amount"
+                )
+            ),
+            self.amounts(3),
+        )
+        self.assertEqual(len(response.data["ingredients"]), 3)
+
+    def test_invalid_tags(self):
+        unknown = max(tag.pk for tag in self.tags) + 1
+        for tags in ([], [unknown], ["abc"], [True], "soup"):
+            response = self.post(self.payload(tags=tags))
+            self.assertEqual(response.status_code, 400, tags)
+            self.assertIn("tags", response.data)
+        response = self.post(self.payload(tags=[self.tags[0].pk] * 2))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_invalid_ingredients(self):
+        first = self.ingredients[0].pk
+        cases = (
+            [],
+            [{"id": first, "amount": 1}, {"id": first, "amount": 2}],
+            [{"id": first, "amount": 0}],
+        )
+        for ingredients in cases:
+            response = self.post(self.payload(ingredients=ingredients))
+            self.assertEqual(response.status_code, 400, ingredients)
+        missing = self.ingredients[-1].pk + 1
+        response = self.post(
+            self.payload(ingredients=[{"id": missing, "amount": 1}])
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_queries_do_not_grow_with_ingredients(self):
+        counts = []
+        for count in (2, 12):
+            data = self.payload(count=count)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(data)
+            self.assertEqual(response.status_code, 201, response.data)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
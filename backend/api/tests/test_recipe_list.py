@@ -0,0 +1,134 @@
+from django.core.cache import cache
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+from .base import FoodgramTestCase
+
+
+class RecipeListTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("reader")
+        self.author = self.create_user("author")
+        self.tag = self.create_tag("soup")
+        self.beet = self.create_ingredient("Свёкла")
+        self.client.force_authenticate(self.user)
+
+    def add_recipes(self, count):
+        return [
+            self.create_recipe(
+                self.author,
+                f"Борщ {index}",
+                tags=[self.tag],
+                ingredients={self.beet: 100 + index},
+            )
+            for index in range(count)
+        ]
+
+    def get_results(self, url="/api/recipes/"):
+        return {
+            item["id"]: item
+            for item in self.client.get(url).data["results"]
+        }
+
+    def test_user_flags(self):
+        favorite, in_cart, plain = self.add_recipes(3)
+        Favorite.objects.create(user=self.user, recipe=favorite)
+        ShoppingCart.objects.create(user=self.user, recipe=in_cart)
+        Favorite.objects.create(user=self.author, recipe=plain)
+        results = self.get_results()
+        flags = {
+            pk: (item["is_favorited"], item["is_in_shopping_cart"])
+            for pk, item in results.items()
+        }
+        self.assertEqual(
+            flags,
+            {
+                favorite.pk: (True, False),
+                in_cart.pk: (False, True),
+                plain.pk: (False, False),
+            },
+        )
+        detail = self.client.get(f"/api/recipes/{favorite.pk}/").data
+        self.assertTrue(detail["is_favorited"])
+
+    def test_anonymous_flags(self):
+        recipe = self.add_recipes(1)[0]
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        self.client.force_authenticate(None)
+        item = self.get_results()[recipe.pk]
+        self.assertFalse(item["is_favorited"])
+        self.assertFalse(item["is_in_shopping_cart"])
+
+    def test_flag_filters(self):
+        favorite, in_cart, _ = self.add_recipes(3)
+        Favorite.objects.create(user=self.user, recipe=favorite)
+        ShoppingCart.objects.create(user=self.user, recipe=in_cart)
+        self.assertEqual(
+            list(self.get_results("/api/recipes/?is_favorited=1")),
+            [favorite.pk],
+        )
+        self.assertEqual(
+            list(self.get_results("/api/recipes/?is_in_shopping_cart=1")),
+            [in_cart.pk],
+        )
+
+    def test_queries_do_not_grow_with_page_size(self):
+        # Рецепты без карточек сериализуются полностью.
+        for recipe in self.add_recipes(2):
+            Favorite.objects.create(user=self.user, recipe=recipe)
+        Recipe.objects.update(card=None)
+        expected = self.count_queries("/api/recipes/")
+        for recipe in self.add_recipes(5):
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        Recipe.objects.update(card=None)
+        # Общее количество кешируется, сравниваются запросы без него.
+        cache.clear()
+        self.assertEqual(self.count_queries("/api/recipes/"), expected)
+
+
+class RecipeIngredientsTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user("author")
+        self.client.force_authenticate(self.author)
+        self.salt = self.create_ingredient("Соль", "г")
+        self.water = self.create_ingredient("Вода", "мл")
+        self.recipe = self.create_recipe(
+            self.author,
+            "Рассол",
+            ingredients={self.salt: 30, self.water: 1000},
+        )
+        Recipe.objects.update(card=None)
+
+    def test_ingredient_amounts(self):
+        expected = [
+            {
+                "id": self.water.pk,
+                "name": "Вода",
+                "measurement_unit": "мл",
+                "amount": 1000,
+            },
+            {
+                "id": self.salt.pk,
+                "name": "Соль",
+                "measurement_unit": "г",
+                "amount": 30,
+            },
+        ]
+        detail = self.client.get(f"/api/recipes/{self.recipe.pk}/").data
+        self.assertEqual(detail["ingredients"], expected)
+        results = self.client.get("/api/recipes/").data["results"]
+        self.assertEqual(results[0]["ingredients"], expected)
+
+    def test_queries_do_not_grow_with_ingredients(self):
+        expected = self.count_queries("/api/recipes/")
+        for index in range(4):
+            ingredients = {
+                self.create_ingredient(f"Специя {index}-{number}"): number
+                for number in range(1, 6)
+            }
+            self.create_recipe(self.author, ingredients=ingredients)
+        Recipe.objects.update(card=None)
+        cache.clear()
+        self.assertEqual(self.count_queries("/api/recipes/"), expected)
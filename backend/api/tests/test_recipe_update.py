@@ -0,0 +1,103 @@
+from unittest import mock
+
+from api.serializers import CreateRecipeSerializer
+from recipes.models import Recipe, ShoppingListQuerySet
+
+from .base import FoodgramTestCase
+
+
+class RecipeUpdateTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user("author")
+        self.breakfast = self.create_tag("breakfast")
+        self.dinner = self.create_tag("dinner")
+        self.egg = self.create_ingredient("Яйцо", "шт")
+        self.milk = self.create_ingredient("Молоко", "мл")
+        self.recipe = self.create_recipe(
+            self.author,
+            "Омлет",
+            tags=[self.breakfast],
+            ingredients={self.egg: 2, self.milk: 50},
+        )
+        self.client.force_authenticate(self.author)
+
+    def test_patch_applies_diff(self):
+        response = self.client.patch(
+            f"/api/recipes/{self.recipe.pk}/",
+            {
+                "name": "Омлет с молоком",
+                "tags": [self.dinner.pk],
+                "ingredients": [{"id": self.milk.pk, "amount": 100}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["name"], "Омлет с молоком")
+        self.assertEqual(
+            [tag["slug"] for tag in response.data["tags"]], ["dinner"]
+        )
+        self.assertEqual(
+            [
+                (item["id"], item["amount"])
+                for item in response.data["ingredients"]
+            ],
+            [(self.milk.pk, 100)],
+        )
+
+    def test_update_keeps_concurrent_changes(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            text="Изменено параллельно", image="recipes/new.jpg"
+        )
+        serializer = CreateRecipeSerializer(
+            stale, data={"cooking_time": 25}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.cooking_time, 25)
+        self.assertEqual(self.recipe.text, "Изменено параллельно")
+        self.assertEqual(self.recipe.image.name, "recipes/new.jpg")
+
+    def test_update_rejects_duplicate_ingredients(self):
+        response = self.client.patch(
+            f"/api/recipes/{self.recipe.pk}/",
+            {
+                "ingredients": [
+                    {"id": self.egg.pk, "amount": 1},
+                    {"id": self.egg.pk, "amount": 2},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.recipe.recipeingredient.count(), 2)
+
+    def test_only_author_can_update(self):
+        self.client.force_authenticate(self.create_user("stranger"))
+        response = self.client.patch(
+            f"/api/recipes/{self.recipe.pk}/", {"name": "Чужой"}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_removed_ingredients_are_refreshed_once(self):
+        salt = self.create_ingredient("Соль")
+        self.recipe.recipeingredient.create(ingredient=salt, amount=1)
+        with mock.patch.object(
+            ShoppingListQuerySet, "refresh_recipe", autospec=True
+        ) as refresh, mock.patch(
+            "api.signals.schedule_card_refresh"
+        ) as signal_refresh:
+            response = self.client.patch(
+                f"/api/recipes/{self.recipe.pk}/",
+                {"ingredients": [{"id": self.egg.pk, "amount": 3}]},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        refresh.assert_called_once()
+        self.assertEqual(
+            set(refresh.call_args.args[2]),
+            {self.egg.pk, self.milk.pk, salt.pk},
+        )
+        signal_refresh.assert_not_called()
@@ -0,0 +1,190 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+
+from recipes.models import IngredientsInRecipe, ShoppingListItem
+
+from .base import FoodgramTestCase
+
+
+class ShoppingListTotalsTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("buyer")
+        self.client.force_authenticate(self.user)
+        self.potato = self.create_ingredient("Картофель", "г")
+        self.salt = self.create_ingredient("Соль", "г")
+        self.milk = self.create_ingredient("Молоко", "мл")
+        self.puree = self.create_recipe(
+            self.user,
+            "Пюре",
+            ingredients={self.potato: 500, self.milk: 100, self.salt: 1},
+        )
+        self.pancakes = self.create_recipe(
+            self.user, "Драники", ingredients={self.potato: 300, self.salt: 2}
+        )
+
+    def totals(self, user=None):
+        return dict(
+            ShoppingListItem.objects.filter(
+                user=user or self.user
+            ).values_list("ingredient__name", "amount")
+        )
+
+    def toggle(self, recipe, method="post"):
+        url = f"/api/recipes/{recipe.pk}/shopping_cart/"
+        return getattr(self.client, method)(url)
+
+    def test_cart_changes_update_totals(self):
+        self.toggle(self.puree)
+        self.assertEqual(
+            self.totals(), {"Картофель": 500, "Молоко": 100, "Соль": 1}
+        )
+        self.toggle(self.pancakes)
+        self.assertEqual(
+            self.totals(), {"Картофель": 800, "Молоко": 100, "Соль": 3}
+        )
+        self.toggle(self.puree, "delete")
+        self.assertEqual(self.totals(), {"Картофель": 300, "Соль": 2})
+        self.toggle(self.pancakes, "delete")
+        self.assertEqual(self.totals(), {})
+
+    def test_repeated_add_is_not_counted(self):
+        self.toggle(self.puree)
+        response = self.toggle(self.puree)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.totals()["Картофель"], 500)
+
+    def test_totals_are_per_user(self):
+        self.toggle(self.puree)
+        other = self.create_user("other")
+        self.client.force_authenticate(other)
+        self.toggle(self.pancakes)
+        self.assertEqual(
+            self.totals(), {"Картофель": 500, "Молоко": 100, "Соль": 1}
+        )
+        self.assertEqual(self.totals(other), {"Картофель": 300, "Соль": 2})
+
+    def test_recipe_ingredient_changes(self):
+        self.toggle(self.puree)
+        self.toggle(self.pancakes)
+        row = IngredientsInRecipe.objects.get(
+            recipe=self.pancakes, ingredient=self.potato
+        )
+        row.amount = 400
+        row.save()
+        self.assertEqual(self.totals()["Картофель"], 900)
+        row.ingredient = self.milk
+        row.save()
+        self.assertEqual(
+            self.totals(), {"Картофель": 500, "Молоко": 500, "Соль": 3}
+        )
+        IngredientsInRecipe.objects.filter(
+            recipe=self.puree, ingredient=self.potato
+        ).delete()
+        self.assertEqual(self.totals(), {"Молоко": 500, "Соль": 3})
+
+    def test_recipe_update_through_api(self):
+        tag = self.create_tag("lunch")
+        self.pancakes.tags.add(tag)
+        self.toggle(self.puree)
+        self.toggle(self.pancakes)
+        response = self.client.patch(
+            f"/api/recipes/{self.pancakes.pk}/",
+            {
+                "tags": [tag.pk],
+                "ingredients": [
+                    {"id": self.potato.pk, "amount": 600},
+                    {"id": self.milk.pk, "amount": 50},
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            self.totals(), {"Картофель": 1100, "Молоко": 150, "Соль": 1}
+        )
+
+    def test_recipe_deletion(self):
+        self.toggle(self.puree)
+        self.toggle(self.pancakes)
+        self.puree.delete()
+        self.assertEqual(self.totals(), {"Картофель": 300, "Соль": 2})
+
+    def test_matches_totals(self):
+        self.toggle(self.puree)
+        self.toggle(self.pancakes)
+        expected = {
+            (row["user_id"], row["ingredient_id"]): row["total"]
+            for row in ShoppingListItem.objects.get_totals()
+        }
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in (
+                ShoppingListItem.objects.values_list(
+                    "user_id", "ingredient_id", "amount"
+                )
+            )
+        }
+        self.assertEqual(stored, expected)
+
+
+class RebuildShoppingListsTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("buyer")
+        self.client.force_authenticate(self.user)
+        self.potato = self.create_ingredient("Картофель", "г")
+        self.salt = self.create_ingredient("Соль", "г")
+        recipe = self.create_recipe(
+            self.user, ingredients={self.potato: 500, self.salt: 1}
+        )
+        self.client.post(f"/api/recipes/{recipe.pk}/shopping_cart/")
+
+    def call(self, *args):
+        out = StringIO()
+        call_command("rebuild_shopping_lists", *args, stdout=out)
+        return out.getvalue()
+
+    def break_totals(self):
+        ShoppingListItem.objects.filter(ingredient=self.potato).update(
+            amount=1
+        )
+        ShoppingListItem.objects.filter(ingredient=self.salt).delete()
+
+    def test_check_without_drift(self):
+        self.assertIn("Расхождений нет", self.call("--check"))
+
+    def test_check_reports_drift(self):
+        self.break_totals()
+        with self.assertRaisesMessage(CommandError, "Расхождений: 2."):
+            self.call("--check")
+        item = ShoppingListItem.objects.get(ingredient=self.potato)
+        self.assertEqual(item.amount, 1)
+
+    def test_rebuild(self):
+        self.break_totals()
+        output = self.call("--batch-size", "1")
+        self.assertIn("Исправлено расхождений: 2", output)
+        self.assertEqual(
+            dict(
+                ShoppingListItem.objects.values_list("ingredient", "amount")
+            ),
+            {self.potato.pk: 500, self.salt.pk: 1},
+        )
+        self.assertIn("Расхождений нет", self.call("--check"))
+
+    def test_rebuild_single_user(self):
+        self.break_totals()
+        other = self.create_user("other")
+        ShoppingListItem.objects.create(
+            user=other, ingredient=self.salt, amount=7
+        )
+        self.call("--user", str(self.user.pk))
+        self.assertEqual(ShoppingListItem.objects.get(user=other).amount, 7)
+        self.assertEqual(
+            ShoppingListItem.objects.get(
+                user=self.user, ingredient=self.potato
+            ).amount,
+            500,
+        )
@@ -0,0 +1,158 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+
+from api.similar import (
+    SimilarityIndex, build_similar_recipes, refresh_similar_recipes,
+)
+from recipes.models import CatalogVersion, IngredientsInRecipe, SimilarRecipe
+
+from .base import FoodgramTestCase
+
+
+class SimilarRecipesTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user("author")
+        self.dinner = self.create_tag("dinner")
+        self.breakfast = self.create_tag("breakfast")
+        self.rice = self.create_ingredient("Рис")
+        self.chicken = self.create_ingredient("Курица")
+        self.beef = self.create_ingredient("Говядина")
+        self.salt = self.create_ingredient("Соль")
+        self.pilaf = self.create_recipe(
+            self.author,
+            "Плов",
+            tags=[self.dinner],
+            ingredients={self.rice: 300, self.chicken: 500, self.salt: 5},
+        )
+        self.risotto = self.create_recipe(
+            self.author,
+            "Ризотто",
+            tags=[self.dinner],
+            ingredients={self.rice: 200, self.chicken: 300},
+        )
+        self.steak = self.create_recipe(
+            self.author,
+            "Стейк",
+            tags=[self.breakfast],
+            ingredients={self.beef: 400, self.salt: 3},
+        )
+        self.tea = self.create_recipe(self.author, "Чай")
+        # Списки из сигналов создания не нужны: их строят сами тесты.
+        self.run_jobs()
+        SimilarRecipe.objects.all().delete()
+
+    def similar(self, recipe):
+        response = self.client.get(f"/api/recipes/{recipe.pk}/similar/")
+        self.assertEqual(response.status_code, 200)
+        return [item["name"] for item in response.data]
+
+    def snapshot(self):
+        return {
+            (row.recipe_id, row.similar_id, row.position): round(row.score, 5)
+            for row in SimilarRecipe.objects.all()
+        }
+
+    def test_build(self):
+        self.assertEqual(build_similar_recipes(), 4)
+        self.assertEqual(self.similar(self.pilaf), ["Ризотто", "Стейк"])
+        self.assertEqual(self.similar(self.risotto), ["Плов"])
+        self.assertEqual(self.similar(self.steak), ["Плов"])
+        self.assertEqual(self.similar(self.tea), [])
+        scores = SimilarRecipe.objects.values_list("score", flat=True)
+        self.assertTrue(all(0 < score <= 1.0001 for score in scores))
+
+    def test_tags_and_ingredients_are_weighted(self):
+        build_similar_recipes()
+        pilaf = dict(
+            SimilarRecipe.objects.filter(recipe=self.pilaf).values_list(
+                "similar__name", "score"
+            )
+        )
+        self.assertGreater(pilaf["Ризотто"], 0.3)
+        self.assertLess(pilaf["Стейк"], 0.3)
+
+    def test_top_k(self):
+        for index in range(4):
+            self.create_recipe(
+                self.author,
+                f"Плов {index}",
+                tags=[self.dinner],
+                ingredients={self.rice: 1, self.chicken: 1},
+            )
+        with mock.patch("api.similar.TOP_K", 3):
+            build_similar_recipes()
+        positions = list(
+            SimilarRecipe.objects.filter(recipe=self.pilaf)
+            .order_by("position")
+            .values_list("position", flat=True)
+        )
+        self.assertEqual(positions, [1, 2, 3])
+
+    def test_refresh_matches_full_build(self):
+        build_similar_recipes()
+        rice_salad = self.create_recipe(
+            self.author,
+            "Салат с рисом",
+            tags=[self.breakfast],
+            ingredients={self.rice: 100, self.beef: 100},
+        )
+        IngredientsInRecipe.objects.filter(
+            recipe=self.steak, ingredient=self.salt
+        ).delete()
+        refresh_similar_recipes([rice_salad.pk, self.steak.pk])
+        refreshed = self.snapshot()
+        build_similar_recipes()
+        self.assertEqual(refreshed, self.snapshot())
+        self.assertIn("Салат с рисом", self.similar(self.steak))
+
+    def test_refresh_reads_only_changed_recipes(self):
+        build_similar_recipes()
+        rice_salad = self.create_recipe(
+            self.author,
+            "Салат с рисом",
+            tags=[self.dinner],
+            ingredients={self.rice: 100, self.salt: 1},
+        )
+        tea_id = self.tea.pk
+        self.tea.delete()
+        with mock.patch(
+            "api.similar.SimilarityIndex", wraps=SimilarityIndex
+        ) as index_class:
+            refresh_similar_recipes([rice_salad.pk, tea_id])
+        index_class.assert_not_called()
+        refreshed = self.snapshot()
+        build_similar_recipes()
+        self.assertEqual(refreshed, self.snapshot())
+
+    def test_changes_from_other_processes_rebuild_matrix(self):
+        build_similar_recipes()
+        CatalogVersion.bump(CatalogVersion.SIMILAR)
+        with mock.patch(
+            "api.similar.SimilarityIndex", wraps=SimilarityIndex
+        ) as index_class:
+            refresh_similar_recipes([self.tea.pk])
+        index_class.assert_called_once()
+
+    def test_changes_are_refreshed_in_background(self):
+        build_similar_recipes()
+        self.assertEqual(self.similar(self.tea), [])
+        self.tea.tags.add(self.dinner)
+        self.run_jobs()
+        self.assertEqual(set(self.similar(self.tea)), {"Ризотто", "Плов"})
+
+    def test_missing_recipe(self):
+        for pk in ("0", "abc"):
+            response = self.client.get(f"/api/recipes/{pk}/similar/")
+            self.assertEqual(response.status_code, 404, pk)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("build_similar_recipes", stdout=out)
+        self.assertIn("Обновлено списков похожих рецептов: 4", out.getvalue())
+        call_command(
+            "build_similar_recipes", "--recipe", str(self.tea.pk), stdout=out
+        )
+        self.assertIn("рецептов: 1", out.getvalue())
@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from api.loaders import SubscriptionsLoader
+from recipes.models import Recipe
+from users.models import Subscribe
+
+from .base import FoodgramTestCase
+
+
+class IsSubscribedTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("reader")
+        self.followed = self.create_user("followed")
+        self.other = self.create_user("other")
+        Subscribe.objects.create(user=self.user, author=self.followed)
+        self.client.force_authenticate(self.user)
+
+    def test_users_list(self):
+        response = self.client.get("/api/users/")
+        flags = {
+            item["id"]: item["is_subscribed"]
+            for item in response.data["results"]
+        }
+        self.assertEqual(
+            flags,
+            {
+                self.user.pk: False,
+                self.followed.pk: True,
+                self.other.pk: False,
+            },
+        )
+
+    def test_user_detail_and_me(self):
+        response = self.client.get(f"/api/users/{self.followed.pk}/")
+        self.assertTrue(response.data["is_subscribed"])
+        response = self.client.get("/api/users/me/")
+        self.assertFalse(response.data["is_subscribed"])
+
+    def test_anonymous(self):
+        self.create_recipe(self.followed, "Щи")
+        self.client.force_authenticate(None)
+        response = self.client.get("/api/recipes/")
+        author = response.data["results"][0]["author"]
+        self.assertFalse(author["is_subscribed"])
+
+    def test_recipe_authors(self):
+        self.create_recipe(self.followed, "Щи")
+        self.create_recipe(self.other, "Уха")
+        response = self.client.get("/api/recipes/")
+        flags = {
+            item["author"]["id"]: item["author"]["is_subscribed"]
+            for item in response.data["results"]
+        }
+        self.assertEqual(flags, {self.followed.pk: True, self.other.pk: False})
+
+    def test_subscribe_response_sees_new_subscription(self):
+        response = self.client.post(f"/api/users/{self.other.pk}/subscribe/")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data["is_subscribed"])
+
+    def test_subscriptions_are_loaded_once(self):
+        for index in range(3):
+            author = self.create_user(f"chef{index}")
+            self.create_recipe(author, f"Рецепт {index}")
+        expected = self.count_queries("/api/users/")
+        for index in range(3, 8):
+            author = self.create_user(f"chef{index}")
+            Subscribe.objects.create(user=self.user, author=author)
+            self.create_recipe(author, f"Рецепт {index}")
+        cache.clear()
+        self.assertEqual(self.count_queries("/api/users/"), expected)
+
+    def test_loader_is_request_scoped(self):
+        request = self.client.get("/api/users/me/").wsgi_request
+        loader = SubscriptionsLoader.for_request(request)
+        self.assertIs(SubscriptionsLoader.for_request(request), loader)
+        with self.assertNumQueries(1):
+            self.assertTrue(loader.is_subscribed(self.followed.pk))
+            self.assertFalse(loader.is_subscribed(self.other.pk))
+
+
+class SubscriptionPreviewTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("reader")
+        self.client.force_authenticate(self.user)
+
+    def follow(self, username, recipes):
+        author = self.create_user(username)
+        now = timezone.now()
+        created = []
+        for index in range(recipes):
+            recipe = self.create_recipe(author, f"{username} {index}")
+            # pub_date заполняется при создании, поэтому задаётся UPDATE.
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(hours=recipes - index)
+            )
+            created.append(recipe)
+        Subscribe.objects.create(user=self.user, author=author)
+        return author, created
+
+    def test_recipes_limit(self):
+        author, recipes = self.follow("chef", 4)
+        self.follow("cook", 1)
+        self.follow("idle", 0)
+        response = self.client.get(
+            "/api/users/subscriptions/", {"recipes_limit": 2}
+        )
+        self.assertEqual(response.status_code, 200)
+        results = {item["username"]: item for item in response.data["results"]}
+        chef = results["chef"]
+        self.assertEqual(chef["recipes_count"], 4)
+        self.assertTrue(chef["is_subscribed"])
+        self.assertEqual(
+            [recipe["id"] for recipe in chef["recipes"]],
+            [recipe.pk for recipe in reversed(recipes)][:2],
+        )
+        self.assertEqual(
+            set(chef["recipes"][0]),
+            {"id", "name", "image", "image_variants", "cooking_time"},
+        )
+        self.assertEqual(len(results["cook"]["recipes"]), 1)
+        self.assertEqual(results["idle"]["recipes"], [])
+
+    def test_without_limit(self):
+        self.follow("chef", 4)
+        response = self.client.get("/api/users/subscriptions/")
+        self.assertEqual(len(response.data["results"][0]["recipes"]), 4)
+
+    def test_queries_do_not_grow_with_authors(self):
+        self.follow("chef", 3)
+        params = {"recipes_limit": 2}
+        expected = self.count_queries("/api/users/subscriptions/", **params)
+        for index in range(4):
+            self.follow(f"cook{index}", 3)
+        self.assertEqual(
+            self.count_queries("/api/users/subscriptions/", **params), expected
+        )
@@ -0,0 +1,168 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.trending import HALF_LIFE_DAYS, WINDOW_DAYS, rank_recipes
+from recipes.models import RecipeDailyStats, RecipeRank
+
+from .base import FoodgramTestCase
+
+TODAY = date(2024, 3, 15)
+
+
+class TrendingTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user("author")
+        self.soup = self.create_recipe(self.author, "Щи")
+        self.porridge = self.create_recipe(self.author, "Каша")
+        self.salad = self.create_recipe(self.author, "Салат")
+
+    def add_stats(self, recipe, days_ago=0, favorites=0, shopping_carts=0):
+        RecipeDailyStats.objects.create(
+            recipe=recipe,
+            day=TODAY - timedelta(days=days_ago),
+            favorites=favorites,
+            shopping_carts=shopping_carts,
+        )
+
+    def ranking(self):
+        return list(
+            RecipeRank.objects.order_by("position").values_list(
+                "recipe__name", flat=True
+            )
+        )
+
+    def trending(self):
+        response = self.client.get("/api/recipes/", {"ordering": "trending"})
+        self.assertEqual(response.status_code, 200)
+        return [item["name"] for item in response.data["results"]]
+
+    def test_toggles_record_stats(self):
+        user = self.create_user("cook")
+        self.client.force_authenticate(user)
+        self.client.post(f"/api/recipes/{self.soup.pk}/favorite/")
+        self.client.post(f"/api/recipes/{self.soup.pk}/shopping_cart/")
+        self.client.post(f"/api/recipes/{self.porridge.pk}/favorite/")
+        self.client.force_authenticate(self.author)
+        self.client.post(f"/api/recipes/{self.soup.pk}/favorite/")
+        self.assertEqual(
+            set(
+                RecipeDailyStats.objects.values_list(
+                    "recipe__name", "favorites", "shopping_carts"
+                )
+            ),
+            {("Щи", 2, 1), ("Каша", 1, 0)},
+        )
+
+    def test_removal_is_not_counted(self):
+        self.client.force_authenticate(self.author)
+        self.client.post(f"/api/recipes/{self.soup.pk}/favorite/")
+        self.client.delete(f"/api/recipes/{self.soup.pk}/favorite/")
+        self.client.post(f"/api/recipes/{self.soup.pk}/favorite/")
+        stats = RecipeDailyStats.objects.get()
+        self.assertEqual(stats.favorites, 2)
+
+    def test_weights_and_decay(self):
+        self.add_stats(self.soup, favorites=3)
+        self.add_stats(self.porridge, shopping_carts=2)
+        self.add_stats(self.salad, days_ago=HALF_LIFE_DAYS, favorites=8)
+        self.assertEqual(rank_recipes(TODAY), 3)
+        scores = dict(
+            RecipeRank.objects.values_list("recipe__name", "score")
+        )
+        self.assertEqual(scores, {"Щи": 3.0, "Каша": 4.0, "Салат": 4.0})
+        # При равной оценке выше более новый рецепт.
+        self.assertEqual(self.ranking(), ["Салат", "Каша", "Щи"])
+
+    def test_old_stats_are_dropped(self):
+        self.add_stats(self.soup, days_ago=WINDOW_DAYS, favorites=100)
+        self.add_stats(self.porridge, days_ago=WINDOW_DAYS - 1, favorites=1)
+        rank_recipes(TODAY)
+        self.assertEqual(self.ranking(), ["Каша"])
+        self.assertEqual(
+            list(RecipeDailyStats.objects.values_list("recipe", flat=True)),
+            [self.porridge.pk],
+        )
+
+    def test_ranking_is_replaced(self):
+        self.add_stats(self.soup, favorites=1)
+        rank_recipes(TODAY)
+        RecipeDailyStats.objects.all().delete()
+        self.add_stats(self.salad, favorites=1)
+        rank_recipes(TODAY)
+        self.assertEqual(self.ranking(), ["Салат"])
+
+    def test_trending_ordering(self):
+        self.add_stats(self.soup, favorites=1)
+        self.add_stats(self.porridge, favorites=5)
+        self.assertEqual(self.trending(), ["Салат", "Каша", "Щи"])
+        with self.captureOnCommitCallbacks(execute=True):
+            rank_recipes(TODAY)
+        # Без статистики рецепты идут в конце, новые первыми.
+        self.assertEqual(self.trending(), ["Каша", "Щи", "Салат"])
+
+    def test_trending_cursor(self):
+        for index in range(4):
+            recipe = self.create_recipe(self.author, f"Рецепт {index}")
+            self.add_stats(recipe, favorites=index + 1)
+        rank_recipes(TODAY)
+        names, url = [], "/api/recipes/?ordering=trending&cursor=&limit=2"
+        while url:
+            response = self.client.get(url)
+            names += [item["name"] for item in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(
+            names,
+            ["Рецепт 3", "Рецепт 2", "Рецепт 1", "Рецепт 0"]
+            + ["Салат", "Каша", "Щи"],
+        )
+
+    def test_trending_pages(self):
+        for index in range(3):
+            recipe = self.create_recipe(self.author, f"Рецепт {index}")
+            self.add_stats(recipe, favorites=index + 1)
+        rank_recipes(TODAY)
+        names = []
+        for page in range(1, 4):
+            response = self.client.get(
+                "/api/recipes/",
+                {"ordering": "trending", "limit": 2, "page": page},
+            )
+            self.assertEqual(response.data["count"], 6)
+            names += [item["name"] for item in response.data["results"]]
+        self.assertEqual(
+            names,
+            ["Рецепт 2", "Рецепт 1", "Рецепт 0", "Салат", "Каша", "Щи"],
+        )
+
+    def test_trending_with_filters(self):
+        lunch = self.create_tag("lunch")
+        other = self.create_user("other")
+        for recipe in (self.soup, self.salad):
+            recipe.tags.add(lunch)
+        foreign = self.create_recipe(other, "Суп", tags=[lunch])
+        self.add_stats(self.salad, favorites=2)
+        self.add_stats(foreign, favorites=5)
+        rank_recipes(TODAY)
+        response = self.client.get(
+            "/api/recipes/",
+            {
+                "ordering": "trending",
+                "tags": "lunch",
+                "author": self.author.pk,
+            },
+        )
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            [item["name"] for item in response.data["results"]],
+            ["Салат", "Щи"],
+        )
+
+    def test_command(self):
+        RecipeDailyStats.objects.add_events("favorites", [self.soup.pk])
+        out = StringIO()
+        call_command("rank_trending", stdout=out)
+        self.assertIn("Рецептов в рейтинге: 1", out.getvalue())
+        self.assertEqual(self.ranking(), ["Щи"])
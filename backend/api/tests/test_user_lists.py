@@ -0,0 +1,142 @@
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+from .base import FoodgramTestCase
+
+
+class UserListToggleTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("reader")
+        self.author = self.create_user("author")
+        self.recipe = self.create_recipe(self.author, "Солянка")
+        self.client.force_authenticate(self.user)
+
+    def counters(self):
+        return Recipe.objects.values_list(
+            "favorites_count", "shopping_cart_count"
+        ).get(pk=self.recipe.pk)
+
+    def test_favorite(self):
+        url = f"/api/recipes/{self.recipe.pk}/favorite/"
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["id"], self.recipe.pk)
+        self.assertEqual(response.data["name"], "Солянка")
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.counters(), (1, 0))
+        self.assertTrue(
+            Favorite.objects.filter(
+                user=self.user, recipe=self.recipe
+            ).exists()
+        )
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_shopping_cart(self):
+        url = f"/api/recipes/{self.recipe.pk}/shopping_cart/"
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.counters(), (0, 1))
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_missing_recipe(self):
+        url = f"/api/recipes/{self.recipe.pk + 1}/favorite/"
+        self.assertEqual(self.client.post(url).status_code, 404)
+        # Удаление отсутствующего рецепта, как и раньше, - ошибка 400.
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        for method in (self.client.post, self.client.delete):
+            response = method("/api/recipes/abc/favorite/")
+            self.assertEqual(response.status_code, 404)
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(f"/api/recipes/{self.recipe.pk}/favorite/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.counters(), (0, 0))
+
+
+class UserListBulkTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user("reader")
+        author = self.create_user("author")
+        self.recipes = [
+            self.create_recipe(author, f"Рецепт {index}") for index in range(4)
+        ]
+        self.ids = [recipe.pk for recipe in self.recipes]
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, name, **data):
+        return self.client.post(f"/api/recipes/{name}/", data, format="json")
+
+    def listed(self, model):
+        return sorted(
+            model.objects.filter(user=self.user).values_list(
+                "recipe_id", flat=True
+            )
+        )
+
+    def test_add_and_remove(self):
+        response = self.bulk("favorite", add=self.ids[:3])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"added": self.ids[:3], "removed": []})
+        response = self.bulk(
+            "favorite",
+            add=self.ids[2:] + [self.ids[-1] + 100],
+            remove=[self.ids[0]],
+        )
+        self.assertEqual(
+            response.data, {"added": [self.ids[3]], "removed": [self.ids[0]]}
+        )
+        self.assertEqual(self.listed(Favorite), self.ids[1:])
+        self.assertEqual(
+            list(
+                Recipe.objects.order_by("pk").values_list(
+                    "favorites_count", flat=True
+                )
+            ),
+            [0, 1, 1, 1],
+        )
+
+    def test_repeated_add_is_idempotent(self):
+        self.bulk("shopping_cart", add=self.ids)
+        response = self.bulk("shopping_cart", add=self.ids)
+        self.assertEqual(response.data, {"added": [], "removed": []})
+        self.assertEqual(
+            set(Recipe.objects.values_list("shopping_cart_count", flat=True)),
+            {1},
+        )
+
+    def test_copy_from(self):
+        self.bulk("favorite", add=self.ids[:2])
+        self.bulk("shopping_cart", add=self.ids[1:3])
+        response = self.bulk("shopping_cart", copy_from="favorite")
+        self.assertEqual(response.data["added"], [self.ids[0]])
+        self.assertEqual(self.listed(ShoppingCart), self.ids[:3])
+        self.assertEqual(self.listed(Favorite), self.ids[:2])
+
+    def test_move_from(self):
+        self.bulk("shopping_cart", add=self.ids[:2])
+        response = self.bulk("favorite", move_from="shopping_cart")
+        self.assertEqual(response.data["added"], self.ids[:2])
+        self.assertEqual(self.listed(Favorite), self.ids[:2])
+        self.assertEqual(self.listed(ShoppingCart), [])
+        self.assertEqual(
+            set(Recipe.objects.values_list("shopping_cart_count", flat=True)),
+            {0},
+        )
+
+    def test_invalid_requests(self):
+        cases = (
+            {"add": ["x"]},
+            {"add": [0]},
+            {"copy_from": "favorite"},
+            {"copy_from": "shopping_cart", "move_from": "shopping_cart"},
+            {"move_from": "likes"},
+        )
+        for data in cases:
+            response = self.bulk("favorite", **data)
+            self.assertEqual(response.status_code, 400, data)
+        self.assertEqual(self.listed(Favorite), [])
@@ -0,0 +1,57 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.models import RecipeDailyStats, RecipeRank
+
+from .cache import recipe_cache
+
+FAVORITE_WEIGHT = 1.0
+SHOPPING_CART_WEIGHT = 2.0
+HALF_LIFE_DAYS = 3
+WINDOW_DAYS = 30
+
+
+def get_scores(today):
+    """Оценки рецептов по дневной статистике за WINDOW_DAYS дней.
+
+    Вклад дня уменьшается вдвое каждые HALF_LIFE_DAYS дней.
+    """
+    since = today - timedelta(days=WINDOW_DAYS)
+    rows = RecipeDailyStats.objects.filter(day__gt=since).values_list(
+        "recipe_id", "day", "favorites", "shopping_carts"
+    )
+    scores = defaultdict(float)
+    for recipe_id, day, favorites, shopping_carts in rows.iterator():
+        decay = 0.5 ** ((today - day).days / HALF_LIFE_DAYS)
+        scores[recipe_id] += decay * (
+            favorites * FAVORITE_WEIGHT + shopping_carts * SHOPPING_CART_WEIGHT
+        )
+    return scores
+
+
+def rank_recipes(today=None, batch_size=1000):
+    """Пересчитывает рейтинг популярных рецептов.
+
+    Рейтинг заменяется целиком в одной транзакции, статистика старше
+    окна удаляется. Возвращает число рецептов в рейтинге.
+    """
+    today = today or timezone.localdate()
+    scores = get_scores(today)
+    ranking = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    with transaction.atomic():
+        RecipeRank.objects.all().delete()
+        RecipeRank.objects.bulk_create(
+            [
+                RecipeRank(recipe_id=recipe_id, score=score, position=index)
+                for index, (recipe_id, score) in enumerate(ranking, start=1)
+            ],
+            batch_size=batch_size,
+        )
+        RecipeDailyStats.objects.filter(
+            day__lte=today - timedelta(days=WINDOW_DAYS)
+        ).delete()
+        transaction.on_commit(lambda: recipe_cache.invalidate(["trending"]))
+    return len(ranking)
@@ -1,25 +1,53 @@
+import uuid
+from functools import partial
+
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.parsers import FormParser, JSONParser
+from rest_framework.permissions import (
+    SAFE_METHODS, IsAdminUser, IsAuthenticated,
+)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from django.db.models import Count, Sum
-from django.http import HttpResponse
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import (
+    Exists, F, OuterRef, Value, Window, prefetch_related_objects,
+)
+from django.db.models.functions import RowNumber
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
+from jobs.models import Job
+from jobs.queue import enqueue
 from recipes.models import (
-    Favorite, Ingredient, IngredientsInRecipe, Recipe, ShoppingCart, Tag,
+    CatalogVersion, Favorite, Ingredient, Recipe, ShoppingCart, SimilarRecipe,
+    Tag,
 )
 from users.models import Subscribe, User
 
-from .filters import IngredientFilter, RecipeFilter
+from .cache import recipe_cache
+from .cards import RECIPE_CARD_PREFETCH
+from .catalog import catalog_response
+from .exports import ShoppingListExport
+from .feed import get_feed
+from .filters import RecipeFilter
+from .loaders import SubscriptionsLoader
+from .pagination import FeedPagination
+from .pantry import pantry_index
+from .parsers import RecipeMultiPartParser
 from .permissions import IsOwnerOrAdminOrReadOnly
+from .renderers import CSVRenderer, PDFRenderer, TextRenderer
+from .search import ingredient_index
 from .serializers import (
-    CreateRecipeSerializer, GetRecipeSerializer, IngredientSerializer,
-    RecipeSerializer, SubscriptionsSerializer, TagSerializer, UserSerializer,
+    BulkUserRecipesSerializer, CreateRecipeSerializer, GetRecipeSerializer,
+    IngredientSerializer, RecipeSerializer, SubscriptionsSerializer,
+    TagSerializer, UserSerializer,
 )
 
 
@@ -28,8 +56,16 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsOwnerOrAdminOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name", "")
+        limit = request.query_params.get("limit")
+        limit = int(limit) if limit and limit.isdigit() else None
+        return catalog_response(
+            request,
+            CatalogVersion.INGREDIENTS,
+            lambda version: ingredient_index.search(name, limit, version),
+        )
 
 
 class TagViewSet(ReadOnlyModelViewSet):
@@ -38,14 +74,71 @@ class TagViewSet(ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     permission_classes = (IsOwnerOrAdminOrReadOnly,)
 
+    def list(self, request, *args, **kwargs):
+        return catalog_response(
+            request,
+            CatalogVersion.TAGS,
+            lambda version: self.get_serializer(
+                self.get_queryset(), many=True
+            ).data,
+        )
+
 
 class RecipeViewSet(ModelViewSet):
-    queryset = Recipe.objects.select_related("author").prefetch_related(
-        "tags", "ingredients"
-    )
+    queryset = Recipe.objects.select_related("author")
     permission_classes = (IsOwnerOrAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    parser_classes = (JSONParser, FormParser, RecipeMultiPartParser)
+
+    @property
+    def cursor_ordering(self):
+        if self.request.query_params.get("ordering") == "trending":
+            return ("trending_position", "-id")
+        return ("-pub_date", "-id")
+
+    def list(self, request, *args, **kwargs):
+        get_response = partial(super().list, request, *args, **kwargs)
+        if request.user.is_anonymous:
+            return recipe_cache.list_response(request, get_response)
+        return get_response()
+
+    def retrieve(self, request, *args, **kwargs):
+        get_response = partial(super().retrieve, request, *args, **kwargs)
+        if request.user.is_anonymous:
+            return recipe_cache.detail_response(
+                request, kwargs["pk"], get_response
+            )
+        return get_response()
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self.prefetch_cards(page)
+        return page
+
+    @staticmethod
+    def prefetch_cards(recipes):
+        prefetch_related_objects(
+            [recipe for recipe in recipes if not recipe.card],
+            *RECIPE_CARD_PREFETCH,
+        )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False), is_in_shopping_cart=Value(False)
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+        )
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -55,118 +148,291 @@ class RecipeViewSet(ModelViewSet):
             return GetRecipeSerializer
         return CreateRecipeSerializer
 
-    @action(
-        detail=True,
-        methods=("post", "delete"),
-        permission_classes=(IsAuthenticated,),
-    )
-    def favorite(self, request, pk):
+    user_lists = {"favorite": Favorite, "shopping_cart": ShoppingCart}
+
+    def change_user_list(self, request, pk, model, exists, missing):
+        if not str(pk).isdigit():
+            raise Http404
+        pk = int(pk)
         if request.method == "POST":
-            recipe = get_object_or_404(Recipe, id=pk)
-            obj, created = Favorite.objects.get_or_create(
-                user=request.user, recipe=recipe
-            )
-            if created:
-                serializer = RecipeSerializer(recipe)
+            if model.objects.add(request.user, [pk]):
+                recipe = Recipe.objects.get(pk=pk)
                 return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
+                    RecipeSerializer(recipe).data,
+                    status=status.HTTP_201_CREATED,
                 )
+            if not Recipe.objects.filter(pk=pk).exists():
+                raise Http404
             return Response(
-                {"Ошибка": "Рецепт уже есть в избранном"},
-                status=status.HTTP_400_BAD_REQUEST,
+                {"Ошибка": exists}, status=status.HTTP_400_BAD_REQUEST
             )
-
-        obj = Favorite.objects.filter(
-            user=request.user, recipe__id=pk
-        ).delete()
-
-        if obj[0] > 0:
+        if model.objects.remove(request.user, [pk]):
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
-            {"Ошибка": "Рецепта нет в избранном"},
-            status=status.HTTP_400_BAD_REQUEST,
+            {"Ошибка": missing}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def change_user_list_bulk(self, request, name):
+        serializer = BulkUserRecipesSerializer(
+            data=request.data, context={"target": name}
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        model, user = self.user_lists[name], request.user
+        added, removed = set(), set()
+        with transaction.atomic():
+            removed.update(model.objects.remove(user, data["remove"]))
+            added.update(model.objects.add(user, data["add"]))
+            if "copy_from" in data:
+                source = self.user_lists[data["copy_from"]]
+                added.update(model.objects.add(user, (), source=source))
+            if "move_from" in data:
+                source = self.user_lists[data["move_from"]]
+                moved = source.objects.remove(user)
+                added.update(model.objects.add(user, moved))
+        return Response(
+            {"added": sorted(added), "removed": sorted(removed - added)}
+        )
+
+    @action(
+        detail=True,
+        methods=("post", "delete"),
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite(self, request, pk):
+        return self.change_user_list(
+            request,
+            pk,
+            Favorite,
+            "Рецепт уже есть в избранном",
+            "Рецепта нет в избранном",
         )
 
+    @action(
+        detail=False,
+        methods=("post",),
+        permission_classes=(IsAuthenticated,),
+        url_path="favorite",
+    )
+    def favorite_bulk(self, request):
+        return self.change_user_list_bulk(request, "favorite")
+
     @action(
         detail=True,
         methods=("post", "delete"),
         permission_classes=(IsAuthenticated,),
     )
     def shopping_cart(self, request, pk):
-        if request.method == "POST":
-            recipe = get_object_or_404(Recipe, id=pk)
-            obj, created = ShoppingCart.objects.get_or_create(
-                user=request.user, recipe=recipe
-            )
-            if created:
-                serializer = RecipeSerializer(recipe)
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
-                )
+        return self.change_user_list(
+            request,
+            pk,
+            ShoppingCart,
+            "Рецепт уже есть в списке покупок",
+            "Рецепта нет в списке покупок",
+        )
+
+    @action(
+        detail=False,
+        methods=("post",),
+        permission_classes=(IsAuthenticated,),
+        url_path="shopping_cart",
+    )
+    def shopping_cart_bulk(self, request):
+        return self.change_user_list_bulk(request, "shopping_cart")
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        entries = self.paginator.paginate_queryset(
+            get_feed(request.user), request, self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [entry.recipe_id for entry in entries]
+        )
+        page = [
+            recipes[entry.recipe_id]
+            for entry in entries
+            if entry.recipe_id in recipes
+        ]
+        self.prefetch_cards(page)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False)
+    def pantry(self, request):
+        ingredient_ids = [
+            value
+            for values in request.query_params.getlist("ingredients")
+            for value in values.split(",")
+        ]
+        if not ingredient_ids or not all(
+            value.strip().isdigit() for value in ingredient_ids
+        ):
             return Response(
-                {"Ошибка": "Рецепт уже есть в списке покупок"},
+                {"ingredients": "Ожидался список id ингредиентов."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        obj = ShoppingCart.objects.filter(
-            user=request.user, recipe__id=pk
-        ).delete()
+        matches = pantry_index.search(
+            [int(value) for value in ingredient_ids],
+            request.query_params.getlist("tags"),
+            CatalogVersion.get(CatalogVersion.RECIPES),
+        )
+        # Страницы по номеру: курсор здесь не поддерживается.
+        page = self.paginator.paginate_queryset(matches, request)
+        missing = dict(page)
+        recipes = self.get_queryset().in_bulk(list(missing))
+        page = [recipes[pk] for pk in missing if pk in recipes]
+        self.prefetch_cards(page)
+        data = self.get_serializer(page, many=True).data
+        for item in data:
+            item["missing_ingredients"] = missing[item["id"]]
+        return self.get_paginated_response(data)
 
-        if obj[0] > 0:
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(
-            {"Ошибка": "Рецепта нет в списке покупок"},
-            status=status.HTTP_400_BAD_REQUEST,
+    @action(detail=True)
+    def similar(self, request, pk):
+        if not str(pk).isdigit():
+            raise Http404
+        neighbours = (
+            SimilarRecipe.objects.filter(recipe_id=pk)
+            .select_related("similar")
+            .order_by("position")
+        )
+        recipes = [neighbour.similar for neighbour in neighbours]
+        if not recipes and not Recipe.objects.filter(pk=pk).exists():
+            raise Http404
+        serializer = RecipeSerializer(
+            recipes, many=True, context=self.get_serializer_context()
         )
+        return Response(serializer.data)
 
-    @action(detail=False, permission_classes=(IsAuthenticated,))
-    def download_shopping_cart(self, request):
-        user = request.user
-        shopping_cart = user.shopping_cart.all()
-        if not shopping_cart:
+    @action(detail=False, permission_classes=(IsAdminUser,))
+    def cache_stats(self, request):
+        return Response(recipe_cache.get_stats())
+
+    @action(
+        detail=False,
+        methods=("post",),
+        permission_classes=(IsAdminUser,),
+        url_path="import",
+    )
+    def import_recipes(self, request):
+        start = request.query_params.get("start", "0")
+        if not start.isdigit():
             return Response(
-                "Список покупок пуст.", status=status.HTTP_400_BAD_REQUEST
+                {"start": "Ожидался номер строки."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        ingredients = (
-            IngredientsInRecipe.objects.filter(
-                recipe__shopping_cart__user=user
+        if request.stream is None:
+            return Response(
+                {"detail": "Файл не передан."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            .values("ingredient__name", "ingredient__measurement_unit")
-            .annotate(amount=Sum("amount"))
+        path = default_storage.save(
+            f"imports/{uuid.uuid4().hex}.ndjson", File(request.stream)
+        )
+        (job,) = enqueue(
+            "recipes.import",
+            {
+                "author_id": request.user.pk,
+                "path": path,
+                "start_line": int(start),
+            },
+        )
+        location = self.reverse_action(
+            "import-status", kwargs={"job_id": job.pk}
+        )
+        return Response(
+            self.get_import_status(job),
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": location},
         )
 
-        response = HttpResponse(
-            self.generate_shopping_file(ingredients, user),
-            content_type="text/plain",
+    @staticmethod
+    def get_import_status(job):
+        data = {"job": job.pk, "status": job.status, "result": job.result}
+        if job.status == Job.FAILED:
+            data["error"] = job.last_error.strip().splitlines()[-1]
+        return data
+
+    @action(
+        detail=False,
+        permission_classes=(IsAdminUser,),
+        url_path=r"import/(?P<job_id>\d+)",
+        url_name="import-status",
+    )
+    def import_status(self, request, job_id):
+        job = get_object_or_404(
+            Job,
+            pk=job_id,
+            name="recipes.import",
+            kwargs__author_id=request.user.pk,
         )
-        response["Content-Disposition"] = "attachment; filename='shoplist.txt'"
-        return response
+        return Response(self.get_import_status(job))
 
-    def generate_shopping_file(self, ingredients, user):
-        content = f"Список покупок {user.get_full_name()}:\n\n"
-        for ingredient in ingredients:
-            name = ingredient.get("ingredient__name")
-            units = ingredient.get("ingredient__measurement_unit")
-            amount = ingredient.get("amount")
-            content += f"{name} ({units}) - {amount}\n"
-        return content
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            TextRenderer,
+            JSONRenderer,
+            CSVRenderer,
+            PDFRenderer,
+        ),
+    )
+    def download_shopping_cart(self, request):
+        if not request.user.shopping_cart.exists():
+            return Response(
+                "Список покупок пуст.", status=status.HTTP_400_BAD_REQUEST
+            )
+        fmt = request.accepted_renderer.format
+        export = ShoppingListExport(request.user)
+        response = StreamingHttpResponse(
+            export.render(fmt), content_type=export.content_types[fmt]
+        )
+        response[
+            "Content-Disposition"
+        ] = f"attachment; filename='shoplist.{fmt}'"
+        return response
 
 
 class UserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    cursor_ordering = ("id",)
 
     @action(detail=False, permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(following__user=user).annotate(
-            recipes_count=Count("recipes")
-        )
+        queryset = User.objects.filter(following__user=user).order_by("id")
         paginated_queryset = self.paginate_queryset(queryset)
+        self.attach_recipes(
+            paginated_queryset, request.query_params.get("recipes_limit")
+        )
         serializer = SubscriptionsSerializer(
             paginated_queryset, many=True, context={"request": request}
         )
         return self.get_paginated_response(serializer.data)
 
+    def attach_recipes(self, authors, limit):
+        """Загружает превью рецептов всех авторов страницы одним запросом."""
+        recipes = Recipe.objects.filter(author__in=authors).annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F("author_id"),
+                order_by=F("pub_date").desc(),
+            )
+        )
+        if limit:
+            recipes = recipes.filter(row_number__lte=int(limit))
+        by_author = {author.pk: [] for author in authors}
+        for recipe in recipes.order_by("author_id", "row_number"):
+            by_author[recipe.author_id].append(recipe)
+        for author in authors:
+            author.preview_recipes = by_author[author.pk]
+
     @action(
         detail=True,
         methods=("post", "delete"),
@@ -180,7 +446,9 @@ class UserViewSet(UserViewSet):
                 author, data=request.data, context={"request": request}
             )
             serializer.is_valid(raise_exception=True)
-            Subscribe.objects.create(user=request.user, author=author)
+            with transaction.atomic():
+                Subscribe.objects.create(user=request.user, author=author)
+            SubscriptionsLoader.for_request(request).reset()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         subscription = Subscribe.objects.filter(
@@ -8,3 +8,78 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class ManagedFieldsMixin:
+    """Поля, которые save() уже сохранённого объекта не перезаписывает.
+
+    managed_fields - счётчики и поля, которые меняются запросами UPDATE
+    (F()-выражения, фоновые задачи). Полный save() объекта, прочитанного
+    раньше такого изменения, вернул бы в них старые значения, поэтому
+    они исключаются из update_fields. Поля tracked_fields сохраняются,
+    только если изменились после загрузки объекта.
+    """
+
+    managed_fields = ()
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded()
+        return instance
+
+    def get_tracked_value(self, field):
+        value = field.value_from_object(self)
+        if not getattr(value, "_committed", True):
+            return None
+        return field.get_prep_value(value)
+
+    def remember_loaded(self):
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            name: self.get_tracked_value(self._meta.get_field(name))
+            for name in self.tracked_fields
+            if self._meta.get_field(name).attname not in deferred
+        }
+
+    def get_save_fields(self):
+        """Поля для UPDATE при save() без update_fields."""
+        deferred = self.get_deferred_fields()
+        loaded = getattr(self, "_loaded_values", {})
+        fields = []
+        for field in self._meta.concrete_fields:
+            if (
+                field.primary_key
+                or field.attname in deferred
+                or field.name in self.managed_fields
+            ):
+                continue
+            if field.name in loaded and (
+                self.get_tracked_value(field) == loaded[field.name]
+            ):
+                continue
+            fields.append(field.name)
+        return fields
+
+    def save(
+        self,
+        force_insert=False,
+        force_update=False,
+        using=None,
+        update_fields=None,
+    ):
+        adding = self._state.adding
+        if update_fields is None and not force_insert and not adding:
+            update_fields = self.get_save_fields()
+        super().save(
+            force_insert=force_insert,
+            force_update=force_update,
+            using=using,
+            update_fields=update_fields,
+        )
+        self.remember_loaded()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.remember_loaded()
@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     "users.apps.UsersConfig",
     "api.apps.ApiConfig",
     "recipes.apps.RecipesConfig",
+    "jobs.apps.JobsConfig",
 ]
 
 MIDDLEWARE = [
@@ -106,7 +107,7 @@ REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
     ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.PageLimitPagination",
     "PAGE_SIZE": 6,
 }
 
@@ -155,3 +156,12 @@ CORS_URLS_REGEX = r'^/api/.*$'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+SHOPPING_LIST_FONT = os.getenv(
+    "SHOPPING_LIST_FONT",
+    default="/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+
+# Авторы, у которых подписчиков больше этого числа, не раскладывают
+# рецепты по лентам: их рецепты подмешиваются в ленту при чтении.
+FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", default=10000))
@@ -0,0 +1,20 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        "pk",
+        "name",
+        "status",
+        "run_at",
+        "attempts",
+        "finished_at",
+    )
+    list_display_links = ("name",)
+    list_filter = ("status", "name")
+    search_fields = ("name", "key")
+    readonly_fields = ("locked_at", "finished_at", "last_error", "result")
+    empty_value_display = "-пусто-"
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.3 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("jobs", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="result",
+            field=models.JSONField(
+                blank=True, null=True, verbose_name="Результат"
+            ),
+        ),
+    ]
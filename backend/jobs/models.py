@@ -0,0 +1,104 @@
+from django.db import models
+
+from core.models import CreatedModel
+
+
+class Job(CreatedModel):
+    """Модель фоновых задач.
+
+    Описывается следующими полями:
+
+    name - Имя зарегистрированной задачи.
+    kwargs - Именованные аргументы задачи.
+    key - Ключ дедупликации: в очереди не может быть двух ожидающих
+    задач с одинаковым ключом.
+    status - Состояние задачи.
+    run_at - Время, не раньше которого задачу можно выполнить.
+    attempts - Число сделанных попыток.
+    max_attempts - Предельное число попыток.
+    locked_at - Время, когда задачу взял обработчик.
+    finished_at - Время завершения.
+    last_error - Текст последней ошибки.
+    result - Значение, которое вернула задача.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (QUEUED, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Выполнена"),
+        (FAILED, "Ошибка"),
+    )
+
+    name = models.CharField(
+        "Задача",
+        max_length=255,
+    )
+    kwargs = models.JSONField(
+        "Аргументы",
+        default=dict,
+        blank=True,
+    )
+    key = models.CharField(
+        "Ключ дедупликации",
+        max_length=255,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        "Состояние",
+        max_length=16,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    run_at = models.DateTimeField(
+        "Выполнить после",
+    )
+    attempts = models.PositiveIntegerField(
+        "Попыток",
+        default=0,
+    )
+    max_attempts = models.PositiveIntegerField(
+        "Предел попыток",
+        default=5,
+    )
+    locked_at = models.DateTimeField(
+        "Взята в работу",
+        null=True,
+        blank=True,
+    )
+    finished_at = models.DateTimeField(
+        "Завершена",
+        null=True,
+        blank=True,
+    )
+    last_error = models.TextField(
+        "Последняя ошибка",
+        blank=True,
+    )
+    result = models.JSONField(
+        "Результат",
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=["status", "run_at"], name="job_status_run_at")
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["key"],
+                condition=models.Q(status="queued"),
+                name="uq_queued_job_key",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
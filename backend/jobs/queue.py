@@ -0,0 +1,287 @@
+import random
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import (
+    DatabaseError, IntegrityError, close_old_connections, connections,
+    transaction,
+)
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+BACKOFF_BASE = 10
+BACKOFF_MAX = 3600
+LOCK_TIMEOUT = timedelta(minutes=15)
+HEARTBEAT_INTERVAL = LOCK_TIMEOUT / 5
+
+registry = {}
+
+
+class Task:
+    """Зарегистрированная фоновая задача."""
+
+    def __init__(self, func, name, max_attempts=5, every=None):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.every = every
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+
+def task(name=None, max_attempts=5, every=None):
+    """Регистрирует функцию как фоновую задачу.
+
+    every - интервал (timedelta) для периодических задач: следующий
+    запуск ставится в очередь после завершения предыдущего, успешного
+    или нет.
+    """
+
+    def decorator(func):
+        registered = Task(
+            func,
+            name or f"{func.__module__}.{func.__name__}",
+            max_attempts,
+            every,
+        )
+        registry[registered.name] = registered
+        return registered
+
+    return decorator
+
+
+def enqueue(name, *kwargs_list, key=None, delay=None):
+    """Ставит задачи name с аргументами из kwargs_list в очередь.
+
+    Запись добавляется в текущей транзакции, поэтому обработчик увидит
+    задачу только после её фиксации, а при откате задача исчезнет.
+    key - шаблон ключа дедупликации, например "recipe:{recipe_id}":
+    задача не добавляется, если в очереди уже ждёт задача с тем же
+    ключом. Возвращает список задач; при key на PostgreSQL их pk
+    не заполняются.
+    """
+    registered = registry.get(name)
+    max_attempts = registered.max_attempts if registered else 5
+    run_at = timezone.now() + (delay or timedelta())
+    return Job.objects.bulk_create(
+        [
+            Job(
+                name=name,
+                kwargs=kwargs,
+                key=key.format(**kwargs) if key else None,
+                run_at=run_at,
+                max_attempts=max_attempts,
+            )
+            for kwargs in kwargs_list or [{}]
+        ],
+        ignore_conflicts=key is not None,
+    )
+
+
+def schedule_periodic():
+    """Ставит в очередь периодические задачи, которых там ещё нет."""
+    for registered in registry.values():
+        if registered.every is not None:
+            enqueue(registered.name, key=f"periodic:{registered.name}")
+
+
+def claim():
+    """Берёт в работу одну готовую задачу или возвращает None.
+
+    На PostgreSQL строки, заблокированные другими обработчиками,
+    пропускаются (SKIP LOCKED); захват подтверждается условным
+    UPDATE, поэтому на SQLite задачу тоже получит только один поток.
+    Задачи, зависшие в работе дольше LOCK_TIMEOUT, берутся повторно.
+    """
+    now = timezone.now()
+    ready = Q(status=Job.QUEUED, run_at__lte=now) | Q(
+        status=Job.RUNNING, locked_at__lt=now - LOCK_TIMEOUT
+    )
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(ready)
+            .order_by("run_at", "pk")
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = Job.objects.filter(
+            pk=job.pk, status=job.status, attempts=job.attempts
+        ).update(
+            status=Job.RUNNING, locked_at=now, attempts=F("attempts") + 1
+        )
+    if not claimed:
+        return None
+    job.status, job.locked_at = Job.RUNNING, now
+    job.attempts += 1
+    return job
+
+
+def get_backoff(attempts):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def owned(job):
+    """Запись задачи job, пока она закреплена за этим обработчиком.
+
+    Если задачу посчитали зависшей и взял другой обработчик, число
+    попыток уже другое и запрос не найдёт строк.
+    """
+    return Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, attempts=job.attempts
+    )
+
+
+class Heartbeat:
+    """Продлевает захват задачи, пока она выполняется.
+
+    Раз в interval секунд отдельный поток обновляет locked_at, поэтому
+    задача, которая работает дольше LOCK_TIMEOUT, не считается зависшей
+    и не берётся повторно. Поток держит своё соединение с базой
+    и закрывает его при остановке.
+    """
+
+    def __init__(self, job, interval=HEARTBEAT_INTERVAL):
+        self.job = job
+        self.interval = interval.total_seconds()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stopped.set()
+        self.thread.join()
+
+    def beat(self):
+        now = timezone.now()
+        if owned(self.job).update(locked_at=now):
+            self.job.locked_at = now
+            return True
+        return False
+
+    def loop(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    if not self.beat():
+                        break
+                except DatabaseError:
+                    # Повторим при следующем ударе, до LOCK_TIMEOUT
+                    # ещё далеко.
+                    close_old_connections()
+        finally:
+            connections.close_all()
+
+
+def run_job(job):
+    """Выполняет задачу и записывает результат.
+
+    При ошибке задача возвращается в очередь с экспоненциальной
+    задержкой, пока не исчерпан max_attempts. Итог и возвращённое
+    задачей значение записываются, только если задачу не взял повторно
+    другой обработчик.
+    """
+    registered = registry.get(job.name)
+    try:
+        if registered is None:
+            raise LookupError(f"Задача {job.name} не зарегистрирована.")
+        with Heartbeat(job):
+            result = registered(**job.kwargs)
+    except Exception:
+        fail_job(job, traceback.format_exc())
+        succeeded = False
+    else:
+        now = timezone.now()
+        owned(job).update(status=Job.DONE, finished_at=now, result=result)
+        succeeded = True
+    if registered is not None and registered.every is not None:
+        # Если задача вернулась в очередь для повтора, ключ уже занят
+        # и следующий запуск не добавится.
+        enqueue(
+            registered.name,
+            key=f"periodic:{registered.name}",
+            delay=registered.every,
+        )
+    return succeeded
+
+
+def fail_job(job, error):
+    now = timezone.now()
+    jobs = owned(job)
+    if job.attempts < job.max_attempts:
+        try:
+            with transaction.atomic():
+                jobs.update(
+                    status=Job.QUEUED,
+                    run_at=now + get_backoff(job.attempts),
+                    locked_at=None,
+                    last_error=error,
+                )
+            return
+        except IntegrityError:
+            # В очереди уже ждёт задача с тем же ключом, она и выполнит
+            # работу.
+            pass
+    jobs.update(status=Job.FAILED, finished_at=now, last_error=error)
+
+
+class Worker:
+    """Обработчик очереди: concurrency потоков выбирают и выполняют задачи.
+
+    Если once, потоки завершаются, как только готовых задач не остаётся.
+    """
+
+    def __init__(self, concurrency=1, poll_interval=1.0, once=False):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.once = once
+        self.stopping = threading.Event()
+        self.processed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def run(self):
+        schedule_periodic()
+        threads = [
+            threading.Thread(target=self.loop, daemon=True)
+            for _ in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(self.poll_interval)
+
+    def loop(self):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    job = claim()
+                except DatabaseError:
+                    # База временно недоступна или заблокирована.
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                if job is None:
+                    if self.once:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                succeeded = run_job(job)
+                with self._lock:
+                    self.processed += 1
+                    self.failed += not succeeded
+        finally:
+            connections.close_all()
@@ -0,0 +1,14 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Job
+from .queue import task
+
+
+@task("jobs.purge", every=timedelta(days=1))
+def purge_jobs(days=7):
+    """Удаляет выполненные задачи старше days дней."""
+    Job.objects.filter(
+        status=Job.DONE, finished_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
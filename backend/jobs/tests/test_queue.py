@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import LOCK_TIMEOUT, Heartbeat, claim, enqueue, run_job, task
+
+calls = []
+
+
+@task("tests.record")
+def record(value):
+    calls.append(value)
+
+
+@task("tests.broken", max_attempts=2)
+def broken():
+    raise RuntimeError("Сломалось")
+
+
+@task("tests.periodic_broken", max_attempts=1, every=timedelta(hours=1))
+def periodic_broken():
+    raise RuntimeError("Сломалось")
+
+
+@task("tests.periodic", every=timedelta(hours=1))
+def periodic():
+    calls.append("periodic")
+
+
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_run_job(self):
+        enqueue("tests.record", {"value": 1}, {"value": 2})
+        for _ in range(2):
+            self.assertTrue(run_job(claim()))
+        self.assertIsNone(claim())
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 2)
+
+    def test_enqueue_deduplicates_queued_jobs_by_key(self):
+        for value in (1, 2):
+            enqueue("tests.record", {"value": value}, key="record")
+        self.assertEqual(Job.objects.count(), 1)
+        run_job(claim())
+        enqueue("tests.record", {"value": 3}, key="record")
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_delayed_job_is_not_claimed(self):
+        enqueue("tests.record", {"value": 1}, delay=timedelta(minutes=5))
+        self.assertIsNone(claim())
+
+    def test_failed_job_is_retried_with_backoff(self):
+        enqueue("tests.broken")
+        self.assertFalse(run_job(claim()))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("Сломалось", job.last_error)
+        Job.objects.update(run_at=timezone.now())
+        self.assertFalse(run_job(claim()))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_unknown_task_fails(self):
+        enqueue("tests.missing")
+        Job.objects.update(max_attempts=1)
+        self.assertFalse(run_job(claim()))
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_stale_job_is_reclaimed(self):
+        enqueue("tests.record", {"value": 1})
+        stale = claim()
+        Job.objects.update(locked_at=timezone.now() - LOCK_TIMEOUT * 2)
+        job = claim()
+        self.assertEqual(job.pk, stale.pk)
+        self.assertEqual(job.attempts, 2)
+
+    def test_heartbeat_keeps_job_claimed(self):
+        enqueue("tests.record", {"value": 1})
+        job = claim()
+        Job.objects.update(locked_at=timezone.now() - LOCK_TIMEOUT * 2)
+        self.assertTrue(Heartbeat(job).beat())
+        self.assertIsNone(claim())
+
+    def test_heartbeat_stops_with_job(self):
+        enqueue("tests.record", {"value": 1})
+        with Heartbeat(claim(), timedelta(milliseconds=10)) as heartbeat:
+            pass
+        self.assertFalse(heartbeat.thread.is_alive())
+
+    def test_reclaimed_job_is_not_finished_by_first_worker(self):
+        enqueue("tests.record", {"value": 1})
+        first = claim()
+        Job.objects.update(locked_at=timezone.now() - LOCK_TIMEOUT * 2)
+        second = claim()
+        self.assertFalse(Heartbeat(first).beat())
+        run_job(first)
+        self.assertEqual(Job.objects.get().status, Job.RUNNING)
+        run_job(second)
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+    def test_periodic_job_is_rescheduled(self):
+        enqueue("tests.periodic", key="periodic:tests.periodic")
+        self.assertTrue(run_job(claim()))
+        job = Job.objects.get(status=Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(minutes=59))
+
+    def test_failed_periodic_job_is_rescheduled(self):
+        key = "periodic:tests.periodic_broken"
+        enqueue("tests.periodic_broken", key=key)
+        self.assertFalse(run_job(claim()))
+        self.assertEqual(
+            list(Job.objects.order_by("pk").values_list("status", flat=True)),
+            [Job.FAILED, Job.QUEUED],
+        )
+        self.assertEqual(Job.objects.filter(key=key).count(), 2)
@@ -1,5 +1,4 @@
 from django.contrib import admin
-from django.db.models import Count
 
 from .models import (
     Favorite, Ingredient, IngredientsInRecipe, Recipe, ShoppingCart, Tag,
@@ -25,7 +24,14 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ("pk", "name", "author", "text", "favorites")
+    list_display = (
+        "pk",
+        "name",
+        "author",
+        "text",
+        "favorites",
+        "shopping_cart_count",
+    )
     list_display_links = ("name",)
     search_fields = (
         "author__username",
@@ -40,12 +46,12 @@ class RecipeAdmin(admin.ModelAdmin):
         queryset = (
             queryset.select_related("author")
             .prefetch_related("tags", "ingredients")
-            .annotate(favorited=Count("favorites"))
         )
         return queryset
 
+    @admin.display(description="В избранном", ordering="favorites_count")
     def favorites(self, obj):
-        return obj.favorited
+        return obj.favorites_count
 
 
 @admin.register(IngredientsInRecipe)
@@ -1,15 +1,101 @@
 import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from recipes.models import Ingredient
+from recipes.models import CatalogVersion, Ingredient
 
 
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        with open("recipes/data/ingredients.csv", encoding="utf-8-sig") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                Ingredient.objects.get_or_create(
-                    name=row[0], measurement_unit=row[1]
-                )
+    help = (
+        "Загружает ингредиенты из CSV (название,единица) или JSON "
+        "(список объектов name/measurement_unit). Уже существующие пары "
+        "название-единица пропускаются."
+    )
+
+    default_path = settings.BASE_DIR / "recipes" / "data" / "ingredients.csv"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default=str(self.default_path),
+            help="Файл .csv или .json.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать, какие ингредиенты будут добавлены.",
+        )
+
+    def read_csv(self, file):
+        for row in csv.reader(file):
+            if len(row) >= 2:
+                yield row[0], row[1]
+
+    def read_json(self, file):
+        for item in json.load(file):
+            yield item["name"], item["measurement_unit"]
+
+    def read_rows(self, path):
+        readers = {".csv": self.read_csv, ".json": self.read_json}
+        reader = readers.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError("Поддерживаются только файлы .csv и .json.")
+        with open(path, encoding="utf-8-sig") as file:
+            for name, unit in reader(file):
+                name, unit = name.strip(), unit.strip()
+                if name and unit:
+                    yield name, unit
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"Файл {path} не найден.")
+        started = time.monotonic()
+        seen = set(Ingredient.objects.values_list("name", "measurement_unit"))
+        existing = len(seen)
+        read = 0
+        new = []
+        for pair in self.read_rows(path):
+            read += 1
+            if pair not in seen:
+                seen.add(pair)
+                new.append(pair)
+
+        if options["dry_run"]:
+            for name, unit in new:
+                self.stdout.write(f"+ {name}, {unit}")
+        else:
+            rows = (
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in new
+            )
+            with transaction.atomic():
+                while True:
+                    batch = list(islice(rows, options["batch_size"]))
+                    if not batch:
+                        break
+                    Ingredient.objects.bulk_create(
+                        batch, ignore_conflicts=True
+                    )
+                if new:
+                    # bulk_create не отправляет сигналы post_save.
+                    CatalogVersion.bump(CatalogVersion.INGREDIENTS)
+
+        elapsed = time.monotonic() - started
+        rate = read / elapsed if elapsed else 0.0
+        action = "будет добавлено" if options["dry_run"] else "добавлено"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Прочитано {read}, уже в базе {existing}, "
+                f"{action} {len(new)} за {elapsed:.3f} с "
+                f"({rate:.0f} строк/с)."
+            )
+        )
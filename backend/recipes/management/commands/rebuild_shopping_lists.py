@@ -0,0 +1,87 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет сводные списки покупок с корзинами и пересобирает их. "
+        "С --check только сообщает о расхождениях."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только найти расхождения, ничего не меняя.",
+        )
+        parser.add_argument(
+            "--user", type=int, action="append", dest="users"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def get_drift(self, users):
+        """Строки (user_id, ingredient_id, сохранено, должно быть)."""
+        totals = ShoppingListItem.objects.get_totals()
+        stored = ShoppingListItem.objects.order_by("user_id", "ingredient_id")
+        if users:
+            totals = totals.filter(user_id__in=users)
+            stored = stored.filter(user_id__in=users)
+        expected = {
+            (row["user_id"], row["ingredient_id"]): row["total"]
+            for row in totals.iterator()
+        }
+        for user_id, ingredient_id, amount in stored.values_list(
+            "user_id", "ingredient_id", "amount"
+        ).iterator():
+            total = expected.pop((user_id, ingredient_id), None)
+            if total != amount:
+                yield user_id, ingredient_id, amount, total
+        for (user_id, ingredient_id), total in expected.items():
+            yield user_id, ingredient_id, None, total
+
+    def rebuild(self, users, batch_size):
+        items = ShoppingListItem.objects.all()
+        totals = ShoppingListItem.objects.get_totals()
+        if users:
+            items = items.filter(user_id__in=users)
+            totals = totals.filter(user_id__in=users)
+        rows = (
+            ShoppingListItem(
+                user_id=row["user_id"],
+                ingredient_id=row["ingredient_id"],
+                amount=row["total"],
+            )
+            for row in totals.iterator()
+        )
+        created = 0
+        with transaction.atomic():
+            items.delete()
+            while batch := list(islice(rows, batch_size)):
+                ShoppingListItem.objects.bulk_create(batch)
+                created += len(batch)
+        return created
+
+    def handle(self, *args, **options):
+        users = options["users"]
+        drift = list(self.get_drift(users))
+        for user_id, ingredient_id, amount, total in drift[:100]:
+            self.stdout.write(
+                f"user={user_id} ingredient={ingredient_id}: "
+                f"сохранено {amount}, должно быть {total}"
+            )
+        if options["check"]:
+            if drift:
+                raise CommandError(f"Расхождений: {len(drift)}.")
+            self.stdout.write(self.style.SUCCESS("Расхождений нет."))
+            return
+        created = self.rebuild(users, options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Исправлено расхождений: {len(drift)}, строк в списках: "
+                f"{created}."
+            )
+        )
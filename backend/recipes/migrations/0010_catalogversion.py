@@ -0,0 +1,36 @@
+# Generated by Django 4.2.3 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0009_alter_ingredientsinrecipe_options"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogVersion",
+            fields=[
+                (
+                    "catalog",
+                    models.CharField(
+                        max_length=32,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Справочник",
+                    ),
+                ),
+                (
+                    "version",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Версия"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Версия справочника",
+                "verbose_name_plural": "Версии справочников",
+            },
+        ),
+    ]
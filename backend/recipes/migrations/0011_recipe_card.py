@@ -0,0 +1,22 @@
+# Generated by Django 4.2.3 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0010_catalogversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="card",
+            field=models.JSONField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Карточка рецепта",
+            ),
+        ),
+    ]
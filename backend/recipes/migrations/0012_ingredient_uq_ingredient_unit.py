@@ -0,0 +1,62 @@
+# Generated by Django 4.2.3 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Оставляет по одному ингредиенту на пару название - единица.
+
+    Строки рецептов переводятся на ингредиент с наименьшим id, а если
+    в рецепте оказалось несколько строк одного ингредиента, они
+    сливаются в одну с суммой количеств.
+    """
+    Ingredient = apps.get_model("recipes", "Ingredient")
+    IngredientsInRecipe = apps.get_model("recipes", "IngredientsInRecipe")
+    groups = (
+        Ingredient.objects.values("name", "measurement_unit")
+        .annotate(keep=models.Min("pk"), total=models.Count("pk"))
+        .filter(total__gt=1)
+    )
+    for group in groups:
+        ids = list(
+            Ingredient.objects.filter(
+                name=group["name"], measurement_unit=group["measurement_unit"]
+            ).values_list("pk", flat=True)
+        )
+        rows = IngredientsInRecipe.objects.filter(ingredient_id__in=ids)
+        merged = (
+            rows.values("recipe_id")
+            .annotate(
+                first=models.Min("pk"),
+                amount=models.Sum("amount"),
+                total=models.Count("pk"),
+            )
+            .filter(total__gt=1)
+        )
+        for row in merged:
+            rows.filter(pk=row["first"]).update(amount=row["amount"])
+            rows.filter(recipe_id=row["recipe_id"]).exclude(
+                pk=row["first"]
+            ).delete()
+        rows.update(ingredient_id=group["keep"])
+        Ingredient.objects.filter(pk__in=ids).exclude(
+            pk=group["keep"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0011_recipe_card"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=("name", "measurement_unit"), name="uq_ingredient_unit"
+            ),
+        ),
+    ]
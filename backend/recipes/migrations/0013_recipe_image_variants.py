@@ -0,0 +1,22 @@
+# Generated by Django 4.2.3 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0012_ingredient_uq_ingredient_unit"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Варианты изображения",
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.3 on 2026-10-18 17:57
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(**{field: models.OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=models.Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Favorite = apps.get_model("recipes", "Favorite")
+    Recipe = apps.get_model("recipes", "Recipe")
+    ShoppingCart = apps.get_model("recipes", "ShoppingCart")
+    Subscribe = apps.get_model("users", "Subscribe")
+    User = apps.get_model("users", "User")
+    Recipe.objects.update(
+        favorites_count=count_of(Favorite, "recipe"),
+        shopping_cart_count=count_of(ShoppingCart, "recipe"),
+    )
+    User.objects.update(
+        recipes_count=count_of(Recipe, "author"),
+        followers_count=count_of(Subscribe, "author"),
+        following_count=count_of(Subscribe, "user"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0015_feedentry"),
+        ("users", "0005_user_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="В избранном"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="shopping_cart_count",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="В корзинах"
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 4.2.3 on 2026-10-18 17:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def fill_daily_stats(apps, schema_editor):
+    RecipeDailyStats = apps.get_model("recipes", "RecipeDailyStats")
+    stats = {}
+    for model_name, field in (
+        ("Favorite", "favorites"),
+        ("ShoppingCart", "shopping_carts"),
+    ):
+        rows = (
+            apps.get_model("recipes", model_name)
+            .objects.annotate(day=TruncDate("pub_date"))
+            .values("recipe_id", "day")
+            .annotate(total=models.Count("pk"))
+            .order_by()
+        )
+        for row in rows.iterator():
+            key = (row["recipe_id"], row["day"])
+            stats.setdefault(key, {})[field] = row["total"]
+    RecipeDailyStats.objects.bulk_create(
+        (
+            RecipeDailyStats(recipe_id=recipe_id, day=day, **counts)
+            for (recipe_id, day), counts in stats.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0016_recipe_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeRank",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rank",
+                        serialize=False,
+                        to="recipes.recipe",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="Оценка")),
+                (
+                    "position",
+                    models.PositiveIntegerField(
+                        unique=True, verbose_name="Место"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Место в рейтинге",
+                "verbose_name_plural": "Рейтинг рецептов",
+                "ordering": ["position"],
+            },
+        ),
+        migrations.CreateModel(
+            name="RecipeDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "favorites",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Добавлений в избранное"
+                    ),
+                ),
+                (
+                    "shopping_carts",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Добавлений в корзину"
+                    ),
+                ),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="recipes.recipe",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Статистика рецепта за день",
+                "verbose_name_plural": "Статистика рецептов по дням",
+                "indexes": [
+                    models.Index(fields=["day"], name="recipe_stats_day_idx")
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="recipedailystats",
+            constraint=models.UniqueConstraint(
+                fields=("recipe", "day"), name="uq_recipe_day"
+            ),
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.3 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0018_similarrecipe"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CacheGeneration",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=255,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Зависимость",
+                    ),
+                ),
+                (
+                    "generation",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Поколение"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Поколение кеша",
+                "verbose_name_plural": "Поколения кеша",
+            },
+        ),
+    ]
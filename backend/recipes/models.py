@@ -1,8 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.utils import timezone
 
-from core.models import CreatedModel
+from core.models import CreatedModel, ManagedFieldsMixin
 
 User = get_user_model()
 
@@ -67,9 +68,14 @@ class Ingredient(models.Model):
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
         ordering = ["name"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"], name="uq_ingredient_unit"
+            )
+        ]
 
 
-class Recipe(CreatedModel):
+class Recipe(ManagedFieldsMixin, CreatedModel):
     """Модель для рецептов.
 
     Описывается следующими полями:
@@ -84,6 +90,14 @@ class Recipe(CreatedModel):
     tags - Теги (можно установить несколько тегов на один рецепт,
     выбор из предустановленных).
     cooking_time - Время приготовления в минутах.
+    card - Не зависящая от пользователя часть представления рецепта в API.
+    image_variants - Уменьшенные копии изображения по форматам и ширине.
+    favorites_count - Сколько раз рецепт добавлен в избранное.
+    shopping_cart_count - Во скольких корзинах лежит рецепт.
+
+    Карточку, варианты изображения и счётчики меняют только запросы
+    UPDATE, а изображение save() записывает, только если его заменили:
+    обработка изображения подменяет файл в фоне.
     """
 
     author = models.ForeignKey(
@@ -119,11 +133,47 @@ class Recipe(CreatedModel):
         "Время приготовления",
         validators=[MinValueValidator(1)],
     )
+    card = models.JSONField(
+        "Карточка рецепта",
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    image_variants = models.JSONField(
+        "Варианты изображения",
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    favorites_count = models.IntegerField(
+        "В избранном",
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.IntegerField(
+        "В корзинах",
+        default=0,
+        editable=False,
+    )
+
+    managed_fields = (
+        "card",
+        "image_variants",
+        "favorites_count",
+        "shopping_cart_count",
+    )
+    tracked_fields = ("image",)
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="recipe_author_date_idx",
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -162,6 +212,103 @@ class IngredientsInRecipe(models.Model):
         verbose_name_plural = "Ингредиенты в рецептах"
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    """Добавление и удаление рецептов в списке пользователя.
+
+    Каждая операция выполняется одним запросом (INSERT ... ON CONFLICT
+    DO NOTHING или DELETE) и возвращает id рецептов, которые
+    действительно были добавлены или удалены. Несуществующие рецепты
+    и уже добавленные записи пропускаются. В той же транзакции меняется
+    счётчик рецептов counter_field модели списка, а добавления
+    учитываются в дневной статистике (поле stats_field).
+    """
+
+    def execute(self, sql, params):
+        connection = connections[self.db]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def change_counter(self, recipe_ids, delta):
+        field = self.model.counter_field
+        if recipe_ids:
+            Recipe.objects.filter(pk__in=recipe_ids).update(
+                **{field: models.F(field) + delta}
+            )
+
+    def record_added(self, recipe_ids):
+        RecipeDailyStats.objects.add_events(
+            self.model.stats_field, recipe_ids
+        )
+
+    def add(self, user, recipe_ids, source=None):
+        """Добавляет рецепты recipe_ids или все рецепты списка source."""
+        qn = connections[self.db].ops.quote_name
+        table = qn(self.model._meta.db_table)
+        if source is not None:
+            condition = "user_id = %s"
+            params = [user.pk, timezone.now(), user.pk]
+            select_from = qn(source._meta.db_table)
+            recipe = "recipe_id"
+        else:
+            recipe_ids = list(recipe_ids)
+            if not recipe_ids:
+                return []
+            placeholders = ", ".join(["%s"] * len(recipe_ids))
+            condition = f"id IN ({placeholders})"
+            params = [user.pk, timezone.now(), *recipe_ids]
+            select_from = qn(Recipe._meta.db_table)
+            recipe = "id"
+        with transaction.atomic(using=self.db):
+            added = self.execute(
+                f"INSERT INTO {table} (user_id, recipe_id, pub_date) "
+                f"SELECT %s, {recipe}, %s FROM {select_from} "
+                f"WHERE {condition} "
+                "ON CONFLICT (user_id, recipe_id) DO NOTHING "
+                "RETURNING recipe_id",
+                params,
+            )
+            self.change_counter(added, 1)
+            self.record_added(added)
+        return added
+
+    def remove(self, user, recipe_ids=None):
+        """Удаляет рецепты recipe_ids (None - все) из списка user."""
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        condition = "user_id = %s"
+        params = [user.pk]
+        if recipe_ids is not None:
+            recipe_ids = list(recipe_ids)
+            if not recipe_ids:
+                return []
+            placeholders = ", ".join(["%s"] * len(recipe_ids))
+            condition += f" AND recipe_id IN ({placeholders})"
+            params += recipe_ids
+        with transaction.atomic(using=self.db):
+            removed = self.execute(
+                f"DELETE FROM {table} WHERE {condition} RETURNING recipe_id",
+                params,
+            )
+            self.change_counter(removed, -1)
+        return removed
+
+
+class ShoppingCartQuerySet(UserRecipeQuerySet):
+    """Изменения корзины сразу отражаются в сводном списке покупок."""
+
+    def add(self, user, recipe_ids, source=None):
+        with transaction.atomic(using=self.db):
+            added = super().add(user, recipe_ids, source)
+            ShoppingListItem.objects.add_recipes(user, added)
+        return added
+
+    def remove(self, user, recipe_ids=None):
+        with transaction.atomic(using=self.db):
+            removed = super().remove(user, recipe_ids)
+            ShoppingListItem.objects.remove_recipes(user, removed)
+        return removed
+
+
 class ShoppingCart(CreatedModel):
     """Модель для корзины.
 
@@ -180,6 +327,10 @@ class ShoppingCart(CreatedModel):
         Recipe, on_delete=models.CASCADE, related_name="shopping_cart"
     )
 
+    objects = ShoppingCartQuerySet.as_manager()
+    counter_field = "shopping_cart_count"
+    stats_field = "shopping_carts"
+
     class Meta:
         verbose_name = "Корзина"
         verbose_name_plural = "Корзины"
@@ -190,6 +341,147 @@ class ShoppingCart(CreatedModel):
         ]
 
 
+class ShoppingListQuerySet(models.QuerySet):
+    """Поддержка сводного списка покупок.
+
+    Добавление и удаление рецепта из корзины меняют итоги на суммы
+    его ингредиентов, изменение ингредиентов рецепта пересчитывает
+    затронутые строки у всех, у кого рецепт в корзине.
+    """
+
+    def execute(self, sql, params):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def get_names(self):
+        qn = connections[self.db].ops.quote_name
+        return (
+            qn(self.model._meta.db_table),
+            qn(IngredientsInRecipe._meta.db_table),
+        )
+
+    def add_recipes(self, user, recipe_ids):
+        """Прибавляет к итогам user ингредиенты рецептов recipe_ids."""
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        table, amounts = self.get_names()
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        self.execute(
+            f"INSERT INTO {table} (user_id, ingredient_id, amount) "
+            f"SELECT %s, ingredient_id, SUM(amount) FROM {amounts} "
+            f"WHERE recipe_id IN ({placeholders}) GROUP BY ingredient_id "
+            "ON CONFLICT (user_id, ingredient_id) DO UPDATE "
+            f"SET amount = {table}.amount + EXCLUDED.amount",
+            [user.pk, *recipe_ids],
+        )
+
+    def remove_recipes(self, user, recipe_ids):
+        """Вычитает из итогов user ингредиенты рецептов recipe_ids."""
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        table, amounts = self.get_names()
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        self.execute(
+            f"UPDATE {table} SET amount = {table}.amount - totals.amount "
+            f"FROM (SELECT ingredient_id, SUM(amount) AS amount "
+            f"FROM {amounts} WHERE recipe_id IN ({placeholders}) "
+            "GROUP BY ingredient_id) AS totals "
+            f"WHERE {table}.user_id = %s "
+            f"AND {table}.ingredient_id = totals.ingredient_id",
+            [*recipe_ids, user.pk],
+        )
+        self.filter(user=user, amount__lte=0).delete()
+
+    def get_totals(self):
+        """Итоги по корзинам, как их считает сводный список."""
+        return (
+            IngredientsInRecipe.objects.annotate(
+                user_id=models.F("recipe__shopping_cart__user")
+            )
+            .filter(user_id__isnull=False)
+            .values("user_id", "ingredient_id")
+            .annotate(total=models.Sum("amount"))
+            .order_by("user_id", "ingredient_id")
+        )
+
+    def refresh_recipe(self, recipe_id, ingredient_ids):
+        """Пересчитывает строки ingredient_ids у корзин с рецептом."""
+        ingredient_ids = list(ingredient_ids)
+        if not ingredient_ids:
+            return
+        users = ShoppingCart.objects.filter(recipe_id=recipe_id).values(
+            "user_id"
+        )
+        totals = self.get_totals().filter(
+            user_id__in=users, ingredient_id__in=ingredient_ids
+        )
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=row["user_id"],
+                    ingredient_id=row["ingredient_id"],
+                    amount=row["total"],
+                )
+                for row in totals
+            ],
+            update_conflicts=True,
+            unique_fields=["user", "ingredient"],
+            update_fields=["amount"],
+        )
+        self.filter(
+            user_id__in=users, ingredient_id__in=ingredient_ids
+        ).exclude(
+            models.Exists(
+                IngredientsInRecipe.objects.filter(
+                    recipe__shopping_cart__user=models.OuterRef("user"),
+                    ingredient=models.OuterRef("ingredient"),
+                )
+            )
+        ).delete()
+
+
+class ShoppingListItem(models.Model):
+    """Модель сводного списка покупок.
+
+    Хранит сумму ингредиента по всем рецептам в корзине пользователя.
+    Описывается следующими полями:
+
+    user - Пользователь.
+    ingredient - Ингредиент.
+    amount - Общее количество.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_list",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    amount = models.IntegerField(
+        "Количество",
+    )
+
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Строка списка покупок"
+        verbose_name_plural = "Списки покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"], name="uq_shopping_list_item"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient}: {self.amount}"
+
+
 class Favorite(CreatedModel):
     """Модель для избранных рецепт.
 
@@ -210,6 +502,10 @@ class Favorite(CreatedModel):
         related_name="favorites",
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+    counter_field = "favorites_count"
+    stats_field = "favorites"
+
     class Meta:
         verbose_name = "Избранный"
         verbose_name_plural = "Избранные"
@@ -219,3 +515,346 @@ class Favorite(CreatedModel):
                 fields=["user", "recipe"], name="user_recipe"
             )
         ]
+
+
+class FeedQuerySet(models.QuerySet):
+    """Поддержка лент подписок."""
+
+    def add_recipe(self, recipe_id, author_id, pub_date, user_ids):
+        """Добавляет рецепт в ленты пользователей user_ids."""
+        return self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for user_id in user_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+    def add_author(self, user, author_id):
+        """Добавляет в ленту user все рецепты автора одним запросом."""
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        recipes = qn(Recipe._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} "
+                "(user_id, recipe_id, author_id, pub_date) "
+                f"SELECT %s, id, author_id, pub_date FROM {recipes} "
+                "WHERE author_id = %s "
+                "ON CONFLICT (user_id, recipe_id) DO NOTHING",
+                [user.pk, author_id],
+            )
+
+    def remove_author(self, user, author_id):
+        """Убирает из ленты user рецепты автора."""
+        return self.filter(user=user, author_id=author_id).delete()
+
+
+class FeedEntry(models.Model):
+    """Модель ленты подписок.
+
+    Рецепты авторов, на которых подписан пользователь, раскладываются
+    по лентам подписчиков при публикации. Дата публикации копируется
+    из рецепта, чтобы страница ленты читалась по одному индексу.
+    Описывается следующими полями:
+
+    user - Подписчик.
+    recipe - Рецепт.
+    author - Автор рецепта.
+    pub_date - Дата публикации рецепта.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    pub_date = models.DateTimeField(
+        "Дата публикации",
+    )
+
+    objects = FeedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Ленты подписок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="uq_feed_user_recipe"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-recipe"],
+                name="feed_user_date_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.recipe_id}"
+
+
+class RecipeStatsQuerySet(models.QuerySet):
+    def add_events(self, field, recipe_ids, day=None):
+        """Прибавляет по событию field за день day к рецептам recipe_ids."""
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        day = day or timezone.localdate()
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        column = qn(field)
+        values = ", ".join(["(%s, %s, %s, %s)"] * len(recipe_ids))
+        params = []
+        for recipe_id in recipe_ids:
+            params += [
+                recipe_id,
+                day,
+                int(field == "favorites"),
+                int(field == "shopping_carts"),
+            ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} "
+                "(recipe_id, day, favorites, shopping_carts) "
+                f"VALUES {values} ON CONFLICT (recipe_id, day) DO UPDATE "
+                f"SET {column} = {table}.{column} + EXCLUDED.{column}",
+                params,
+            )
+
+
+class RecipeDailyStats(models.Model):
+    """Модель дневной статистики рецепта.
+
+    Описывается следующими полями:
+
+    recipe - Рецепт.
+    day - День.
+    favorites - Сколько раз за день рецепт добавили в избранное.
+    shopping_carts - Сколько раз за день рецепт добавили в корзину.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="daily_stats",
+    )
+    day = models.DateField(
+        "День",
+    )
+    favorites = models.PositiveIntegerField(
+        "Добавлений в избранное",
+        default=0,
+    )
+    shopping_carts = models.PositiveIntegerField(
+        "Добавлений в корзину",
+        default=0,
+    )
+
+    objects = RecipeStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Статистика рецепта за день"
+        verbose_name_plural = "Статистика рецептов по дням"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "day"], name="uq_recipe_day"
+            )
+        ]
+        indexes = [models.Index(fields=["day"], name="recipe_stats_day_idx")]
+
+
+class RecipeRank(models.Model):
+    """Модель рейтинга популярных рецептов.
+
+    Пересчитывается периодически по дневной статистике.
+    Описывается следующими полями:
+
+    recipe - Рецепт.
+    score - Оценка популярности с затуханием по времени.
+    position - Место в рейтинге, начиная с 1.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="rank",
+    )
+    score = models.FloatField(
+        "Оценка",
+    )
+    position = models.PositiveIntegerField(
+        "Место",
+        unique=True,
+    )
+
+    class Meta:
+        verbose_name = "Место в рейтинге"
+        verbose_name_plural = "Рейтинг рецептов"
+        ordering = ["position"]
+
+    def __str__(self):
+        return f"{self.position}: {self.recipe_id}"
+
+
+class SimilarRecipe(models.Model):
+    """Модель похожих рецептов.
+
+    Для каждого рецепта хранится до k ближайших по ингредиентам и тегам.
+    Описывается следующими полями:
+
+    recipe - Рецепт.
+    similar - Похожий рецепт.
+    score - Мера сходства от 0 до 1.
+    position - Место в списке похожих, начиная с 1.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="neighbours",
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    score = models.FloatField(
+        "Сходство",
+    )
+    position = models.PositiveSmallIntegerField(
+        "Место",
+    )
+
+    class Meta:
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "position"], name="uq_similar_position"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} -> {self.similar_id}"
+
+
+class CatalogVersion(models.Model):
+    """Модель версий справочников.
+
+    Версия справочника увеличивается при каждом изменении его записей
+    и служит ключом для ETag и кеша ответов API.
+    Описывается следующими полями:
+
+    catalog - Название справочника.
+    version - Номер версии.
+    """
+
+    TAGS = "tags"
+    INGREDIENTS = "ingredients"
+    RECIPES = "recipes"
+    SIMILAR = "similar"
+
+    catalog = models.CharField(
+        "Справочник",
+        max_length=32,
+        primary_key=True,
+    )
+    version = models.PositiveBigIntegerField(
+        "Версия",
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = "Версия справочника"
+        verbose_name_plural = "Версии справочников"
+
+    def __str__(self):
+        return f"{self.catalog}: {self.version}"
+
+    @classmethod
+    def get(cls, catalog):
+        version = (
+            cls.objects.filter(catalog=catalog)
+            .values_list("version", flat=True)
+            .first()
+        )
+        return version or 0
+
+    @classmethod
+    def bump(cls, catalog):
+        updated = cls.objects.filter(catalog=catalog).update(
+            version=models.F("version") + 1
+        )
+        if not updated:
+            cls.objects.get_or_create(catalog=catalog, defaults={"version": 1})
+
+
+class CacheGeneration(models.Model):
+    """Модель поколений кеша ответов API.
+
+    Номер поколения зависимости входит в ключи записей кеша, которые
+    от неё зависят, и увеличивается при изменении данных. Поколения
+    хранятся в базе, поэтому сброс, сделанный обработчиком задач,
+    командой или другим процессом веб-сервера, виден всем процессам.
+    Описывается следующими полями:
+
+    name - Имя зависимости.
+    generation - Номер поколения.
+    """
+
+    name = models.CharField(
+        "Зависимость",
+        max_length=255,
+        primary_key=True,
+    )
+    generation = models.PositiveBigIntegerField(
+        "Поколение",
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = "Поколение кеша"
+        verbose_name_plural = "Поколения кеша"
+
+    def __str__(self):
+        return f"{self.name}: {self.generation}"
+
+    @classmethod
+    def get_many(cls, names):
+        """Словарь {имя: поколение}, для новых имён - 0."""
+        generations = dict.fromkeys(names, 0)
+        generations.update(
+            cls.objects.filter(name__in=names).values_list(
+                "name", "generation"
+            )
+        )
+        return generations
+
+    @classmethod
+    def bump_many(cls, names):
+        names = list(names)
+        cls.objects.bulk_create(
+            [cls(name=name) for name in names], ignore_conflicts=True
+        )
+        cls.objects.filter(name__in=names).update(
+            generation=models.F("generation") + 1
+        )
@@ -0,0 +1,88 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes.models import CatalogVersion, Ingredient
+
+
+class AddIngredientsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        Ingredient.objects.create(name="соль", measurement_unit="г")
+
+    def write(self, name, content):
+        path = self.directory / name
+        path.write_text(content, encoding="utf-8")
+        return str(path)
+
+    def load(self, path, *args):
+        out = StringIO()
+        call_command("add_ingredients", path, *args, stdout=out)
+        return out.getvalue()
+
+    def pairs(self):
+        return set(Ingredient.objects.values_list("name", "measurement_unit"))
+
+    def test_csv(self):
+        path = self.write(
+            "ingredients.csv",
+            "\ufeffсоль,г\nсахар,г\n сахар , г \nмолоко,мл\n\nбез единицы\n",
+        )
+        version = CatalogVersion.get(CatalogVersion.INGREDIENTS)
+        output = self.load(path, "--batch-size", "1")
+        self.assertEqual(
+            self.pairs(), {("соль", "г"), ("сахар", "г"), ("молоко", "мл")}
+        )
+        self.assertIn("добавлено 2", output)
+        self.assertEqual(
+            CatalogVersion.get(CatalogVersion.INGREDIENTS), version + 1
+        )
+
+    def test_json(self):
+        path = self.write(
+            "ingredients.json",
+            json.dumps(
+                [
+                    {"name": "соль", "measurement_unit": "щепотка"},
+                    {"name": "перец", "measurement_unit": "г"},
+                ],
+                ensure_ascii=False,
+            ),
+        )
+        self.load(path)
+        self.assertEqual(
+            self.pairs(),
+            {("соль", "г"), ("соль", "щепотка"), ("перец", "г")},
+        )
+
+    def test_repeated_load_adds_nothing(self):
+        path = self.write("ingredients.csv", "сахар,г\n")
+        self.load(path)
+        version = CatalogVersion.get(CatalogVersion.INGREDIENTS)
+        self.assertIn("добавлено 0", self.load(path))
+        self.assertEqual(Ingredient.objects.count(), 2)
+        self.assertEqual(
+            CatalogVersion.get(CatalogVersion.INGREDIENTS), version
+        )
+
+    def test_dry_run(self):
+        path = self.write("ingredients.csv", "сахар,г\n")
+        output = self.load(path, "--dry-run")
+        self.assertIn("+ сахар, г", output)
+        self.assertEqual(Ingredient.objects.count(), 1)
+
+    def test_bundled_catalog(self):
+        self.load(str(Path(__file__).parents[1] / "data" / "ingredients.csv"))
+        self.assertGreater(Ingredient.objects.count(), 1000)
+
+    def test_bad_files(self):
+        with self.assertRaises(CommandError):
+            self.load(str(self.directory / "missing.csv"))
+        with self.assertRaises(CommandError):
+            self.load(self.write("ingredients.txt", "сахар,г\n"))
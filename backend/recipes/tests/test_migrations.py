@@ -0,0 +1,71 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MergeDuplicateIngredientsTests(TransactionTestCase):
+    before = [
+        ("recipes", "0011_recipe_card"),
+        ("users", "0004_alter_subscribe_options"),
+    ]
+    after = [
+        ("recipes", "0012_ingredient_uq_ingredient_unit"),
+        ("users", "0004_alter_subscribe_options"),
+    ]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_are_merged(self):
+        apps = self.migrate(self.before)
+        User = apps.get_model("users", "User")
+        Ingredient = apps.get_model("recipes", "Ingredient")
+        Recipe = apps.get_model("recipes", "Recipe")
+        IngredientsInRecipe = apps.get_model("recipes", "IngredientsInRecipe")
+        author = User.objects.create(username="author", email="a@a.ru")
+        salt, salt_copy, sugar = (
+            Ingredient.objects.create(name=name, measurement_unit="г")
+            for name in ("соль", "соль", "сахар")
+        )
+        soup, cake = (
+            Recipe.objects.create(
+                author=author, name=name, text="", cooking_time=1
+            )
+            for name in ("Суп", "Торт")
+        )
+        for recipe, ingredient, amount in (
+            (soup, salt, 5),
+            (soup, salt_copy, 3),
+            (cake, salt_copy, 1),
+            (cake, sugar, 200),
+        ):
+            IngredientsInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+
+        apps = self.migrate(self.after)
+        Ingredient = apps.get_model("recipes", "Ingredient")
+        IngredientsInRecipe = apps.get_model("recipes", "IngredientsInRecipe")
+        self.assertEqual(
+            set(Ingredient.objects.values_list("pk", flat=True)),
+            {salt.pk, sugar.pk},
+        )
+        self.assertEqual(
+            set(
+                IngredientsInRecipe.objects.values_list(
+                    "recipe__name", "ingredient_id", "amount"
+                )
+            ),
+            {
+                ("Суп", salt.pk, 8),
+                ("Торт", salt.pk, 1),
+                ("Торт", sugar.pk, 200),
+            },
+        )
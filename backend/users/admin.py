@@ -9,6 +9,9 @@ class UserAdmin(admin.ModelAdmin):
         "first_name",
         "last_name",
         "email",
+        "recipes_count",
+        "followers_count",
+        "following_count",
     )
     search_fields = (
         "first_name",
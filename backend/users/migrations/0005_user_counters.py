@@ -0,0 +1,33 @@
+# Generated by Django 4.2.3 on 2026-10-18 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0004_alter_subscribe_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="followers_count",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="Подписчиков"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="following_count",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="Подписок"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="recipes_count",
+            field=models.IntegerField(
+                default=0, editable=False, verbose_name="Рецептов"
+            ),
+        ),
+    ]
@@ -1,15 +1,27 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from core.models import ManagedFieldsMixin
 
-class User(AbstractUser):
+
+class User(ManagedFieldsMixin, AbstractUser):
     first_name = models.CharField(max_length=255, verbose_name="Имя")
     last_name = models.CharField(max_length=255, verbose_name="Фамилия")
     email = models.EmailField(
         max_length=255, unique=True, verbose_name="Почта"
     )
+    recipes_count = models.IntegerField(
+        default=0, editable=False, verbose_name="Рецептов"
+    )
+    followers_count = models.IntegerField(
+        default=0, editable=False, verbose_name="Подписчиков"
+    )
+    following_count = models.IntegerField(
+        default=0, editable=False, verbose_name="Подписок"
+    )
 
     REQUIRED_FIELDS = ["first_name", "last_name", "email"]
+    managed_fields = ("recipes_count", "followers_count", "following_count")
 
 
 class Subscribe(models.Model):